@@ -12,6 +12,8 @@ class Settings:
     MELI_API_BASE_URL = None
     MELI_API_SITES_URL = None
     DB_URL = None
+    DB_READ_URL = None      # Optional read replica, queries over the persisted trees use it
+    DB_ECHO = False         # SQL statements logging (DB_ECHO=true), off by default since it's verbose
 
     @classmethod
     def load(cls):
@@ -26,6 +28,8 @@ class Settings:
         cls.MELI_API_BASE_URL = os.getenv("MELI_API_BASE_URL")
         cls.MELI_API_SITES_URL = os.getenv("MELI_API_SITES_URL")
         cls.DB_URL = os.getenv("DB_URL")
+        cls.DB_READ_URL = os.getenv("DB_READ_URL")
+        cls.DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
         
         if not all([cls.AUTH_SERVICE_PROTOCOL, cls.AUTH_SERVICE_URL, cls.AUTH_SERVICE_PORT, cls.AUTH_SERVICE_ROUTE, cls.DB_URL]):
             print("[INFO] Environment variables not fully loaded. Falling back to local .env file...")
@@ -44,6 +48,8 @@ class Settings:
                 cls.MELI_API_BASE_URL = os.getenv("MELI_API_BASE_URL")
                 cls.MELI_API_SITES_URL = os.getenv("MELI_API_SITES_URL")
                 cls.DB_URL = os.getenv("DB_URL")
+                cls.DB_READ_URL = os.getenv("DB_READ_URL")
+                cls.DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
 
                 if not all([cls.AUTH_SERVICE_PROTOCOL, cls.AUTH_SERVICE_URL, cls.AUTH_SERVICE_PORT, cls.AUTH_SERVICE_ROUTE, cls.DB_URL]):
                     raise EnvironmentError("[ERROR] Missing one or more required environment variables:" \
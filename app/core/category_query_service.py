@@ -0,0 +1,87 @@
+import base64
+from fastapi import HTTPException
+
+from app.infrastructure.repository.category_repository import CategoryRepository
+
+
+class CategoryQueryService:
+    """
+    Queries over the persisted category trees (meli_categories + meli_category_closure), served
+    by the read replica when configured. Every query is a single indexed query, the paginated ones
+    use keyset cursors (opaque strings) instead of offsets.
+    """
+
+    def __init__(self):
+        self.category_repo = CategoryRepository()
+
+
+    def _site_id(self, category_id: str) -> str:
+        # MeLi category ids start with the site id (e.g. MLU5725)
+        return category_id[:3]
+
+
+    def _encode_cursor(self, *values) -> str:
+        return base64.urlsafe_b64encode("|".join(str(value) for value in values).encode("utf-8")).decode("ascii")
+
+
+    def _decode_cursor(self, cursor: str, *types) -> tuple:
+        """The values of a cursor, converted with types (one per value). 400 if it's not one of ours."""
+        try:
+            values = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+            if len(values) != len(types):
+                raise ValueError(f"{len(values)} values, {len(types)} expected")
+            return tuple(value_type(value) for value_type, value in zip(types, values))
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+    def _check_result(self, result, description: str):
+        if result is None:
+            raise HTTPException(status_code=500, detail=f"Failed to retrieve the {description}.")
+        return result
+
+
+    def get_ancestors(self, category_id: str) -> list[dict]:
+        ancestors = self.category_repo.get_ancestors(self._site_id(category_id), category_id)
+        ancestors = self._check_result(ancestors, f"ancestors of {category_id}")
+        if not ancestors and self.category_repo.get_category(self._site_id(category_id), category_id) is None:
+            raise HTTPException(status_code=404, detail=f"Category {category_id} was not found.")
+        return ancestors
+
+
+    def get_descendants(self, category_id: str, limit: int, cursor: str | None = None,
+                        max_depth: int | None = None) -> dict:
+        """
+        :param max_depth: levels below category_id (1 = children only)
+        """
+        after = self._decode_cursor(cursor, int, str) if cursor else None
+
+        rows = self.category_repo.get_descendants(self._site_id(category_id), category_id, limit, after, max_depth)
+        rows = self._check_result(rows, f"descendants of {category_id}")
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_cursor(rows[-1]["distance"], rows[-1]["category_id"])
+        return {"items": rows, "next_cursor": next_cursor}
+
+
+    def get_siblings(self, category_id: str) -> list[dict]:
+        siblings = self.category_repo.get_siblings(self._site_id(category_id), category_id)
+        siblings = self._check_result(siblings, f"siblings of {category_id}")
+        if not siblings and self.category_repo.get_category(self._site_id(category_id), category_id) is None:
+            raise HTTPException(status_code=404, detail=f"Category {category_id} was not found.")
+        return siblings
+
+
+    def get_categories_at_depth(self, site_id: str, depth: int, limit: int, cursor: str | None = None) -> dict:
+        after_id = self._decode_cursor(cursor, str)[0] if cursor else None
+
+        rows = self.category_repo.get_categories_at_depth(site_id, depth, limit, after_id)
+        rows = self._check_result(rows, f"categories of {site_id} at depth {depth}")
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_cursor(rows[-1]["category_id"])
+        return {"items": rows, "next_cursor": next_cursor}
@@ -1,10 +1,13 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed # as_completed is a function not an alias
-from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED # as_completed is a function not an alias
 from datetime import datetime, timezone, timedelta
+from contextlib import nullcontext
 from fastapi import HTTPException
 from collections import deque
+import heapq
+import itertools
 import json
 import logging
+import threading
 import time
 import os
 
@@ -12,16 +15,48 @@ from app.infrastructure.auth_api import AuthServiceClient
 from app.infrastructure.meli_api import MeliCategoryClient
 from app.core.access_token_service import AccessTokenService
 from app.core.site_service import SiteService
-from app.core.url_resolution_service import UrlResolutionService
+from app.core.category_tree_service import CategoryTreeService
+from app.core.leader_election_service import LeaderElectionService
+from app.core.category_tree_pipeline import CategoryTreePipeline, build_category_node, flatten_category
+from app.core.category_shard_service import CategoryShardService
+from app.core.prefetch_service import PrefetchService
+from app.dependencies.singleton_sites_cache import get_sites_cache
+from app.dependencies.singleton_category_node_cache import get_category_node_cache
+from app.dependencies.singleton_tracer import get_tracer
+from app.dependencies.singleton_profiler import get_profiler
+from app.dependencies.singleton_category_snapshot_store import get_category_snapshot_store
+from app.dependencies.singleton_category_index_registry import get_category_index_registry
+from app.dependencies.singleton_access_tracker import get_access_tracker, get_category_response_cache
+from app.infrastructure.fast_json_response import dumps as encode_json
+from app.dependencies.singleton_tree_history import get_tree_history
+from app.infrastructure.category_columnar import (FORMATS as COLUMNAR_FORMATS, pyarrow_available,
+                                                  write_category_index, read_category_index)
+
+
+def items_priority_score(parent: dict, child_id: str) -> float:
+    """
+    Default score of the priority crawl: a category is as important as its parent's item count
+    (its own count is unknown until it's fetched). Any function with this signature can be used
+    instead (CategoryService.priority_score).
+    """
+    return parent.get("total_items_in_this_category") or 0
 
 
 class CategoryService:
     def __init__(self, auth_service_client: AuthServiceClient = None):
         self.access_token_service = AccessTokenService()
         self.site_service = SiteService()
+        self.category_tree_service = CategoryTreeService()
         self.meli_client = MeliCategoryClient()
-        self.url_resolution_service = UrlResolutionService()
+        self._url_resolution_service = None     # Only needed by the tree builds, see the property
         self.auth_service_client = auth_service_client
+        self.sites_cache = get_sites_cache()
+        self.node_cache = get_category_node_cache()
+        self.snapshot_store = get_category_snapshot_store()
+        self.index_registry = get_category_index_registry()
+        self.access_tracker = get_access_tracker()
+        self.response_cache = get_category_response_cache()
+        self.leader_election = LeaderElectionService()
         self.grace_period = 24
         self.grace_unit = "hours"       # days, seconds, microseconds, milliseconds, minutes, hours, and weeks
         self.access_token = None
@@ -29,13 +64,90 @@ class CategoryService:
         # This dictionary will be an index for containing all the categories without nesting
         # (the tree flattened) which will help in infering the URLs for every category.
         # Once the index (dict) is built, access time will be O(1)
+        # It's built while the tree is built, but only by the thread consuming the results of the
+        # workers (see crawl_categories), so no lock is needed.
         self.category_index = {}
-        # And this lock is for the index, since it will be constructed at the same time the tree
-        # is built, hence the lock, to avoid threading issues.
-        self._index_lock = Lock()
 
         self.logger = logging.getLogger(__name__)
-        self.max_workers = 20           # We could consider increasing this value for faster tree-building
+        # Threads are only the ceiling, the adaptive limiter of the MeLi client decides how many
+        # requests are really in flight (see concurrency_limiter.py)
+        self.max_workers = self.meli_client.api_limiter.max_limit
+
+        # Pipeline mode: the JSON serialization of the tree and the index runs in a process pool
+        # (see category_tree_pipeline.py). Worth it on multi-core machines and large sites.
+        # None for pipeline_workers means one process per core.
+        self.pipeline_mode = False
+        self.pipeline_workers = None
+
+        # Sharded mode: the top-level categories are split into shards crawled by separate
+        # processes (see category_shard_service.py). None means not sharded.
+        self.shard_processes = None
+
+        # Priority mode: the categories under the biggest parents (by items) are fetched first,
+        # instead of level by level, and the partial index is published (as a partial snapshot,
+        # see CategorySnapshotStore) every publish_interval_seconds, so the important part of the
+        # tree is usable early. The complete snapshot and the index JSON only change at the end.
+        # priority_score(parent_node, child_id) -> float, higher goes first (items_priority_score
+        # when None).
+        self.priority_mode = False
+        self.priority_score = None
+        self.publish_interval_seconds = 30
+        self._partial_publisher = None      # Thread publishing the partial index, one at a time
+
+        # Columnar export of the index after every build, next to the JSON dumps:
+        # MELI_COLUMNAR_FORMAT=parquet (analytics) or arrow (fastest to load). Needs pyarrow.
+        # Checked here, a typo or a missing pyarrow is reported at startup (and the export
+        # disabled) instead of failing after every build.
+        self.columnar_format = (os.getenv("MELI_COLUMNAR_FORMAT") or "").lower() or None
+        if self.columnar_format and self.columnar_format not in COLUMNAR_FORMATS:
+            self.logger.error(f"MELI_COLUMNAR_FORMAT={self.columnar_format} is not one of"
+                              f" {', '.join(COLUMNAR_FORMATS)}, the columnar export is disabled.")
+            self.columnar_format = None
+        if self.columnar_format and not pyarrow_available():
+            self.logger.error("MELI_COLUMNAR_FORMAT is set but pyarrow is not installed"
+                              " (pip install pyarrow), the columnar export is disabled.")
+            self.columnar_format = None
+
+        # History of the index of every build (see TreeHistoryStore), next to the JSON dumps that
+        # only keep the last one. MELI_TREE_HISTORY=false disables it.
+        self.tree_history = get_tree_history()
+        self.keep_tree_history = os.getenv("MELI_TREE_HISTORY", "true").lower() in ("1", "true", "yes")
+
+        # Keeps the index of every built (or exported, at warm start) site in this process,
+        # interned (see CategoryIndexRegistry), and serves the nodes from it before the snapshots.
+        # MELI_IN_MEMORY_TREES=true. Memory report: GET /api/v1/crawler/memory
+        self.keep_trees_in_memory = os.getenv("MELI_IN_MEMORY_TREES", "false").lower() in ("1", "true", "yes")
+
+        # Hottest categories prefetched (see PrefetchService) at startup and after each tree
+        # build of their site. MELI_PREFETCH_LIMIT=0 disables it.
+        self.prefetch_limit = int(os.getenv("MELI_PREFETCH_LIMIT", "500"))
+
+        # Tracing of the tree builds (see tracing.py). When trace_dir is set, every build writes
+        # its spans to trace_dir/trace_{site_id}_{timestamp}.jsonl
+        self.tracer = get_tracer()
+        self.trace_dir = os.getenv("MELI_TRACE_DIR")
+
+        # Memory profiling of the tree builds (see profiler.py): with MELI_PROFILE_INTERVAL_SECONDS
+        # set, tracemalloc runs during every build and a snapshot (top allocators, object counts)
+        # is written to app/logs/profiles every that many seconds, and at the end.
+        self.profiler = get_profiler()
+        self.profile_interval_seconds = float(os.getenv("MELI_PROFILE_INTERVAL_SECONDS", "0"))
+
+        # Several workers may share the database (uvicorn --workers N). Only the one holding the
+        # lease refreshes the token or builds the tree of a site, the rest wait for the token up
+        # to token_wait_seconds, and get a 409 for a build already running elsewhere.
+        self.token_wait_seconds = 30
+        self.crawl_lease_seconds = 300
+
+
+    @property
+    def url_resolution_service(self):
+        # CategoryService is created per request, and most requests never resolve URLs, so the
+        # resolver (and its module) is loaded only when a tree is built.
+        if self._url_resolution_service is None:
+            from app.core.url_resolution_service import UrlResolutionService
+            self._url_resolution_service = UrlResolutionService()
+        return self._url_resolution_service
 
 
     def fetch_and_save(self):
@@ -51,23 +163,51 @@ class CategoryService:
         Check if a token exists. If so, checks if it's expired. If expired, fetch a new one
         from meli_auth_service and saves it in the database, and assign it to self.access_token
         variable.
+        When there are several workers, only the one holding the token_refresh lease fetches it,
+        the others wait until it's in the database (see refresh_access_token).
         """
         token_from_db = self.access_token_service.get_access_token()
         if not token_from_db:
             self.logger.info("No access_token found for current session, requesting a new one.")
-            self.access_token = self.fetch_and_save()
+            self.access_token = self.refresh_access_token()
             return self.access_token
         else:
             self.logger.info("Access token found in the database. Checking if still valid.")
             if self.access_token_service.is_existing_access_token_expired():
                 self.logger.info("Access token expired, fetching a new one and save it into database.")
-                self.access_token = self.fetch_and_save()
+                self.access_token = self.refresh_access_token()
             else:
                 self.logger.info("Access token not expired, returning it from database.")
                 self.access_token = token_from_db
 
         return self.access_token
 
+
+    def _valid_token_from_db(self) -> str | None:
+        token_from_db = self.access_token_service.get_access_token()
+        if token_from_db and not self.access_token_service.is_existing_access_token_expired():
+            return token_from_db
+        return None
+
+
+    def refresh_access_token(self) -> str:
+        with self.leader_election.lead("token_refresh") as is_leader:
+            if is_leader:
+                # Another worker may have refreshed it right before we got the lease
+                return self._valid_token_from_db() or self.fetch_and_save()
+
+        self.logger.info("Another worker is refreshing the access token, waiting for it.")
+        deadline = time.monotonic() + self.token_wait_seconds
+        while time.monotonic() < deadline:
+            time.sleep(0.5)
+            token_from_db = self._valid_token_from_db()
+            if token_from_db:
+                return token_from_db
+
+        # The leader died or is stuck, better a duplicated refresh than no token
+        self.logger.warning("Access token not refreshed by the leader in time, fetching it here.")
+        return self.fetch_and_save()
+
     
     def call_api_and_save_sites(self):
         sites = self.meli_client.get_sites(self.get_access_token())
@@ -78,30 +218,15 @@ class CategoryService:
 
     def get_sites(self):
         """
-        Checks for sites stored previously in the database. If found, will check for expiring
-        grace period set. If expired, will call the API for refreshed info and persist them
-        in the database.
-        If there are no sites in the database, will directly make the API call and persist them.
-        """
-        sites = self.site_service.get_sites()
-        if sites:
-            self.logger.info("Sites found in the database, checking age.")
-            latest_updated = max(site["updated_at"] for site in sites)
-            now = datetime.now(timezone.utc)
-            if latest_updated.tzinfo is None:
-                latest_updated = latest_updated.replace(tzinfo=timezone.utc)
-            
-            kwargs = {self.grace_unit: self.grace_period}
-            if now - latest_updated > timedelta(**kwargs):
-                self.logger.info(
-                    f"Sites in database are older than grace_period: {self.grace_period} {self.grace_unit},"
-                    f" calling API and persisting refreshed sites."
-                )
-                return self.call_api_and_save_sites()
-        if not sites:
-            self.logger.info("Sites not found in database, retrieving them via API.")
-            return self.call_api_and_save_sites()
-        return sites
+        Returns the sites from the in-memory cache (see SitesCache). The first call loads them from
+        the database, or from the API if there are none. When they are older than the grace period
+        they are still returned, and refreshed from the API (and persisted) in the background.
+        """
+        return self.sites_cache.get_sites(
+            self.site_service.get_sites,
+            self.call_api_and_save_sites,
+            timedelta(**{self.grace_unit: self.grace_period}),
+        )
     
 
     def get_site_info_by_id(self, site_id: str) -> dict | None:
@@ -114,7 +239,8 @@ class CategoryService:
             'updated_at': datetime.datetime(2025, 12, 4, 19, 7, 13, 956660)
         }
         """
-        site = self.site_service.get_site_info_by_id(site_id)
+        self.get_sites()    # Makes sure the cache is loaded (and revalidated if stale)
+        site = self.sites_cache.get_site(site_id)
         if site is None:
             raise HTTPException(status_code=404, detail=f"Site {site_id} was not found.")
         return site
@@ -130,6 +256,92 @@ class CategoryService:
         return self.meli_client.get_category_info(category_id, self.get_access_token())
 
 
+    def get_category_info_encoded(self, category_id: str) -> bytes:
+        """
+        Same as get_category_info, but already encoded as the JSON response body, from the cache
+        of responses when it's there (prefetched, or requested before). Every call that succeeds
+        is counted by the access tracker, that's what decides what gets prefetched (ids that fail,
+        e.g. 404, would only waste prefetches).
+        """
+        body = self.response_cache.get(category_id)
+        if body is None:
+            body = self._cache_category_info(category_id, self.get_category_info(category_id))
+        self.access_tracker.record(category_id)
+        return body
+
+
+    def prefetch_category(self, category_id: str):
+        """Fetches a category (with the current access token) into the response and node caches."""
+        self._cache_category_info(category_id, self.meli_client.get_category_info(category_id, self.access_token))
+
+
+    def _cache_category_info(self, category_id: str, category_info: dict) -> bytes:
+        body = encode_json(category_info)
+        self.response_cache.put(category_id, body)
+        self.node_cache.put(category_id, build_category_node(category_id, category_info))
+        return body
+
+
+    def get_category_node(self, category_id: str) -> dict:
+        """
+        Returns the node of a category (see build_category_node) from the node cache, or from the
+        last tree built for its site (in memory when kept, else its snapshot, shared by every
+        worker), or fetches it from MeLi and caches it. Never modify the returned node, it's shared.
+        """
+        node = self.node_cache.get(category_id)
+        if node is None:
+            node = self.index_registry.get_category(category_id)
+        if node is None:
+            node = self.snapshot_store.get_category(category_id)
+        if node is None:
+            category_info = self.meli_client.get_category_info(category_id, self.access_token)
+            node = build_category_node(category_id, category_info)
+            self.node_cache.put(category_id, node)
+        return node
+
+
+    def get_category_subtree(self, category_id: str, depth: int = 1) -> dict:
+        """
+        On-demand mode: fetches only the branch of category_id, breadth-first, down to depth levels
+        below it (0 returns only the category). Nodes come from the node cache when possible, so
+        overlapping branches are fetched from MeLi only once per TTL.
+        Nodes at the last level have empty children, but keep their children_ids.
+        """
+        start = time.perf_counter()
+        self.get_access_token()
+        root = {**self.get_category_node(category_id), "children": {}}
+
+        level = [root]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for _ in range(depth):
+                child_ids = [(child_id, node) for node in level for child_id in node["children_ids"]]
+                if not child_ids:
+                    break
+
+                futures_map = {
+                    executor.submit(self.get_category_node, child_id): (child_id, parent)
+                    for child_id, parent in child_ids
+                }
+                fetched = {}
+                for fut in as_completed(futures_map):
+                    child_id, _ = futures_map[fut]
+                    try:
+                        fetched[child_id] = {**fut.result(), "children": {}}
+                    except Exception as exc:
+                        self.logger.critical(f"Failed fetching category {child_id}: {exc}")
+                        raise RuntimeError(f"Failed fetching category {child_id}: {exc}")
+
+                # Attached in the order given by MeLi, not in the order they arrived
+                level = []
+                for child_id, parent in child_ids:
+                    parent["children"][child_id] = fetched[child_id]
+                    level.append(fetched[child_id])
+
+        self.logger.info(f"Subtree of {category_id} (depth {depth}) built in"
+                         f" {(time.perf_counter() - start):.4f} seconds. Cache: {self.node_cache.stats()}")
+        return root
+
+
     def get_category_info_thread_safe(self, category_id: str) -> dict:
         """
         This method is custom-made, its purpose is to return the data in a specific way to make
@@ -140,7 +352,8 @@ class CategoryService:
         This method is made for building the category tree.
         """
         try:
-            category_info = self.meli_client.get_category_info(category_id, self.access_token) # -> dict
+            with self.tracer.span("fetch_category", category_id=category_id):
+                category_info = self.meli_client.get_category_info(category_id, self.access_token) # -> dict
         except Exception as exc:
             self.logger.critical(f"Failed to fetch category info for {category_id}:"
                                  f" {exc}")
@@ -150,42 +363,32 @@ class CategoryService:
 
         # Return the data in a dictionary form. Since this will be called several times using
         # threads, each time a dictionary will be returned, with the key being the category_id.
-        # Threads only return this data, never modifies the shared object.
+        # Threads only return this data, never modifies the shared object (not even the index,
+        # crawl_categories adds it to the index when consuming the result).
         self.logger.debug(f"Calling: {category_id}")
 
-        data = {
-            "id": category_id,
-            "name": category_info.get("name"),
-            "site_id": category_id[:3],
-            "permalink": category_info.get("permalink"),
-            "url": category_info.get("permalink"),
-            "total_items_in_this_category": category_info.get("total_items_in_this_category"),
-            "fragile": category_info.get("settings").get("fragile", False),
-            "path_from_root": category_info.get("path_from_root"),
-
-            # To be filled later
-            "children": {},
-
-            # We retain only the child IDs for recursion
-            "children_ids": [
-                child["id"] for child in category_info.get("children_categories", [])
-            ]
-        }
-
-        # Controlling the index construction with the lock.
-        # And shallow copying the data info (data.copy), otherwise we would get the fully
-        # constructed trees for each category as well.
-        with self.index_lock:
-            flat = data.copy()
-            # break the shared reference to the children dict. And avoid fully trees in the index dict
-            flat["children"] = {}
-            # make children_ids independent (list copy), since the list is also mutable
-            flat["children_ids"] = list(data["children_ids"])
-            self.category_index[category_id] = flat
-        
-        return data
+        return build_category_node(category_id, category_info)
     
 
+    def get_category_info_pipelined(self, category_id: str, pipeline: CategoryTreePipeline) -> dict:
+        """
+        Pipeline mode version of get_category_info_thread_safe. The raw JSON body is fetched and
+        then parsed and normalized by the pipeline, in this same thread (only the serialization runs
+        in the pipeline's process pool). The index is not touched here, it's aggregated after the
+        crawl (sharded by top-level category).
+        """
+        try:
+            with self.tracer.span("fetch_category", category_id=category_id):
+                raw_category_info = self.meli_client.get_category_info_raw(category_id, self.access_token)
+            with self.tracer.span("parse_category", category_id=category_id):
+                return pipeline.parse_category(category_id, raw_category_info)
+        except Exception as exc:
+            self.logger.critical(f"Failed to fetch category info for {category_id}:"
+                                 f" {exc}")
+            raise RuntimeError(f"Critical error building category tree, make sure a retry is"
+                               f" attempted! -> {exc}")
+
+
     def dump_tree_and_index_to_json(self, category_tree, category_index, response_status, site_id):
         # Dumping the tree and index JSON files.
         tree_json_dir = os.path.join("app", "tree")
@@ -194,7 +397,7 @@ class CategoryService:
         file_path_index = os.path.join(tree_json_dir, f"meli_category_index_{site_id}.json")
 
         try:
-            with open(file_path, "w", encoding="utf-8") as f:
+            with open(file_path, "w", encoding="utf-8") as f, self.tracer.span("dump_tree_json"):
                 json.dump(category_tree, f, indent=2, ensure_ascii=False)
             json_op_message = f"JSON file of the tree successfully created: {file_path}"
             self.logger.info(json_op_message)
@@ -204,7 +407,7 @@ class CategoryService:
         
         # Dumping index
         try:
-            with open(file_path_index, "w", encoding="utf-8") as f:
+            with open(file_path_index, "w", encoding="utf-8") as f, self.tracer.span("dump_index_json"):
                 json.dump(category_index, f, indent=2, ensure_ascii=False)
             json_op_message = (f"Index ({len(self.category_index)} items) JSON file successfully"
                                f" created: {file_path_index}")
@@ -213,31 +416,128 @@ class CategoryService:
         except Exception as exc:
             response_status.append(f"Error saving the index JSON file: {exc}")
 
+        return self.record_tree_history(site_id, category_index, response_status)
+
+
+    def dump_serialized_tree_and_index_to_json(self, tree_json: str, index_json: str, index_size: int,
+                                               response_status, site_id):
+        """
+        Same as dump_tree_and_index_to_json, but for the tree and index already serialized
+        (pipeline mode).
+        """
+        tree_json_dir = os.path.join("app", "tree")
+        os.makedirs(tree_json_dir, exist_ok=True)
+        file_path = os.path.join(tree_json_dir, f"meli_category_tree_{site_id}.json")
+        file_path_index = os.path.join(tree_json_dir, f"meli_category_index_{site_id}.json")
+
+        try:
+            with open(file_path, "w", encoding="utf-8") as f, self.tracer.span("dump_tree_json"):
+                f.write(tree_json)
+            json_op_message = f"JSON file of the tree successfully created: {file_path}"
+            self.logger.info(json_op_message)
+            response_status.append(json_op_message)
+        except Exception as exc:
+            response_status.append(f"Error saving the JSON file of the tree: {exc}")
+
+        try:
+            with open(file_path_index, "w", encoding="utf-8") as f, self.tracer.span("dump_index_json"):
+                f.write(index_json)
+            json_op_message = (f"Index ({index_size} items) JSON file successfully"
+                               f" created: {file_path_index}")
+            self.logger.info(json_op_message)
+            response_status.append(json_op_message)
+        except Exception as exc:
+            response_status.append(f"Error saving the index JSON file: {exc}")
+
+        return self.record_tree_history(site_id, self.category_index, response_status)
+
+
+    def record_tree_history(self, site_id: str, category_index: dict[str, dict], response_status: list[str]) -> list[str]:
+        """Adds the index to the history of the site (base or delta, see TreeHistoryStore)."""
+        if not self.keep_tree_history:
+            return response_status
+        try:
+            with self.tracer.span("record_tree_history", categories=len(category_index)):
+                version = self.tree_history.record(site_id, category_index)
+            message = f"Tree history of {site_id}: {version['kind']} {version['file']} ({version['bytes']} bytes)."
+        except Exception as exc:
+            message = f"Error recording the tree history: {exc}"
+        self.logger.info(message)
+        response_status.append(message)
         return response_status
 
 
-    def build_category_tree(self, site_id: str):
+    def crawl_categories(self, top_level_ids: list[str], fetch_category, build_index: bool = True) -> dict:
         """
-        This one uses BFS to build the tree. And returns info about tree creation time and JSON file
-        creation.
+        BFS over the categories, level by level, starting from the top-level ones.
+        fetch_category(category_id) -> node, it's called from the worker threads.
+        Returns the category tree.
+
+        The workers only return their node, this thread is the single consumer that attaches it to
+        the tree and (if build_index) adds its flat copy to self.category_index. That's why the
+        index needs no lock.
         """
-        start = time.perf_counter()
-        self.get_site_info_by_id(site_id)
-        top_level_categories = self.meli_client.get_top_level_categories(self.get_access_token(), site_id)
         category_tree = {}
-        
-        queue = deque((cat["id"], category_tree) for cat in top_level_categories)
+        queue = deque((cid, category_tree) for cid in top_level_ids)
+        level = 0
 
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor, self.tracer.span("crawl"):
             while queue:
-                futures_map = {
-                    executor.submit(self.get_category_info_thread_safe, cid): (cid, parent)
-                    for cid, parent in list(queue)           
-                }
-                queue.clear()
-
-                for fut in as_completed(futures_map):
-                    cid, parent_container = futures_map[fut]
+                with self.tracer.span("bfs_level", level=level, categories=len(queue)):
+                    traced_fetch = self.tracer.wrap(fetch_category)
+                    futures_map = {
+                        executor.submit(traced_fetch, cid): (cid, parent)
+                        for cid, parent in list(queue)
+                    }
+                    queue.clear()
+
+                    for fut in as_completed(futures_map):
+                        cid, parent_container = futures_map[fut]
+                        try:
+                            data = fut.result()
+                        except Exception as exc:
+                            self.logger.critical(f"Failed fetching category {cid}: {exc}")
+                            raise RuntimeError(f"Failed fetching category {cid}: {exc}")
+
+                        parent_container[cid] = data
+                        if build_index:
+                            # break the shared reference to the children dict and the children_ids list
+                            self.category_index[cid] = flatten_category(data)
+
+                        for child_id in data["children_ids"]:
+                            queue.append((child_id, data["children"]))
+                level += 1
+
+        return category_tree
+
+
+    def crawl_categories_prioritized(self, top_level_ids: list[str], fetch_category, site_id: str) -> dict:
+        """
+        Priority version of crawl_categories: the frontier is a heap ordered by the score of each
+        pending category (see items_priority_score), top-level ones first. Only max_workers fetches
+        are in flight at a time, so the next one submitted is always the best pending one.
+        The index is built the same way (single consumer), and published every
+        publish_interval_seconds while the crawl runs (see publish_partial_index), in the
+        background so the consumer never waits for it.
+        Returns the category tree.
+        """
+        score = self.priority_score or items_priority_score
+        sequence = itertools.count()    # ties keep the order in which categories were found
+        category_tree = {}
+        frontier = [(float("-inf"), next(sequence), cid, category_tree) for cid in top_level_ids]
+        in_flight = {}
+        last_publish = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor, self.tracer.span("crawl", mode="priority"):
+            traced_fetch = self.tracer.wrap(fetch_category)
+            while frontier or in_flight:
+                while frontier and len(in_flight) < self.max_workers:
+                    _, _, cid, parent_container = heapq.heappop(frontier)
+                    in_flight[executor.submit(traced_fetch, cid)] = (cid, parent_container)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    cid, parent_container = in_flight.pop(fut)
                     try:
                         data = fut.result()
                     except Exception as exc:
@@ -245,9 +545,166 @@ class CategoryService:
                         raise RuntimeError(f"Failed fetching category {cid}: {exc}")
 
                     parent_container[cid] = data
-
+                    self.category_index[cid] = flatten_category(data)
                     for child_id in data["children_ids"]:
-                        queue.append((child_id, data["children"]))
+                        heapq.heappush(frontier, (-score(data, child_id), next(sequence), child_id, data["children"]))
+
+                if time.monotonic() - last_publish >= self.publish_interval_seconds:
+                    # Skipped while the previous publish is still writing, a big index takes a while
+                    if self._partial_publisher is None or not self._partial_publisher.is_alive():
+                        self._partial_publisher = threading.Thread(
+                            target=self.publish_partial_index, args=(site_id,), name="publish-partial", daemon=True)
+                        self._partial_publisher.start()
+                    last_publish = time.monotonic()
+
+        if self._partial_publisher is not None:
+            self._partial_publisher.join()
+        return category_tree
+
+
+    def publish_partial_index(self, site_id: str):
+        """
+        Publishes the index built so far as the partial snapshot of site_id, while the crawl goes
+        on (see CategorySnapshotStore). The current snapshot and the index JSON are left alone
+        until the build finishes, a failed crawl never replaces them with a truncated index.
+        Runs in its own thread: the copy is taken there, the crawl only adds entries meanwhile.
+        """
+        try:
+            category_index = dict(self.category_index)
+            self.snapshot_store.publish(site_id, category_index, partial=True)
+            self.logger.info(f"Partial index of {site_id} published ({len(category_index)} categories).")
+        except Exception as exc:
+            # The crawl goes on, the next publish (or the final one) may succeed
+            self.logger.error(f"Error publishing the partial index of {site_id}: {exc}")
+
+
+    def build_category_tree(self, site_id: str, pipeline_mode: bool | None = None):
+        """
+        This one uses BFS to build the tree. And returns info about tree creation time and JSON file
+        creation.
+        Dispatches to the mode configured (threaded by default, pipeline, sharded or priority),
+        traced when trace_dir is set, profiled when profile_interval_seconds is set.
+        Only one worker at a time builds the tree of a site (crawl_{site_id} lease), a second
+        request meanwhile gets a 409.
+
+        :param pipeline_mode: overrides self.pipeline_mode for this build.
+        """
+        trace_file = None
+        if self.trace_dir:
+            trace_file = os.path.join(
+                self.trace_dir, f"trace_{site_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+
+        with self.leader_election.lead(f"crawl_{site_id}", self.crawl_lease_seconds) as is_leader:
+            if not is_leader:
+                raise HTTPException(status_code=409,
+                                    detail=f"The tree of {site_id} is already being built by another worker.")
+
+            # From here on every MeLi call of this service is part of the build: it goes with the
+            # crawl priority, and leaves the interactive share of the limit to the other requests
+            self.meli_client.priority = "crawl"
+            profiling = (self.profiler.periodic(f"build_{site_id}", self.profile_interval_seconds)
+                         if self.profile_interval_seconds else nullcontext())
+            with profiling, self.tracer.trace_to_file(trace_file), \
+                    self.tracer.span("build_category_tree", site_id=site_id):
+                if self.pipeline_mode if pipeline_mode is None else pipeline_mode:
+                    response_status = self.build_category_tree_pipelined(site_id)
+                elif self.shard_processes:
+                    response_status = self.build_category_tree_sharded(site_id, self.shard_processes)
+                elif self.priority_mode:
+                    response_status = self.build_category_tree_prioritized(site_id)
+                else:
+                    response_status = self.build_category_tree_threaded(site_id)
+
+                self.persist_category_tree(site_id, response_status)
+                if self.columnar_format:
+                    self.export_columnar_index(site_id, response_status)
+                if self.keep_trees_in_memory:
+                    self.index_registry.load(site_id, self.category_index)
+                self.publish_category_snapshot(site_id, response_status)
+                if self.prefetch_limit:
+                    # The cached responses of the site are refreshed in the background, hottest first.
+                    # With its own service (and MeLi client), its calls are the low priority ones
+                    PrefetchService(lambda: CategoryService(self.auth_service_client),
+                                    self.prefetch_limit).prefetch_in_background(site_id)
+                return response_status
+
+
+    def persist_category_tree(self, site_id: str, response_status: list[str]) -> list[str]:
+        """
+        Persists the index of the last built tree (meli_categories), which also rebuilds the
+        closure table used by the query API (see CategoryQueryService).
+        """
+        with self.tracer.span("persist_tree", categories=len(self.category_index)):
+            if self.category_tree_service.save_category_tree(site_id, self.category_index):
+                message = f"Tree persisted in the database ({len(self.category_index)} categories)."
+            else:
+                message = "Error persisting the tree in the database."
+        self.logger.info(message)
+        response_status.append(message)
+        return response_status
+
+
+    def columnar_index_path(self, site_id: str, file_format: str) -> str:
+        return os.path.join("app", "tree", f"meli_category_index_{site_id}{COLUMNAR_FORMATS[file_format]}")
+
+
+    def export_columnar_index(self, site_id: str, response_status: list[str]) -> list[str]:
+        """Writes the index as Parquet or Arrow (see category_columnar.py), self.columnar_format."""
+        try:
+            file_path = self.columnar_index_path(site_id, self.columnar_format)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with self.tracer.span("dump_index_columnar", file_format=self.columnar_format):
+                write_category_index(file_path, self.category_index, self.columnar_format)
+            message = f"Index ({len(self.category_index)} items) {self.columnar_format} file successfully created: {file_path}"
+        except Exception as exc:
+            message = f"Error saving the {self.columnar_format} file of the index: {exc}"
+        self.logger.info(message)
+        response_status.append(message)
+        return response_status
+
+
+    def load_category_index(self, site_id: str) -> dict | None:
+        """
+        Loads self.category_index from the columnar export of site_id (Arrow first, it's the
+        fastest), None if there's none. Much faster and lighter than parsing the JSON index.
+        """
+        for file_format in ("arrow", "parquet"):
+            file_path = self.columnar_index_path(site_id, file_format)
+            if os.path.exists(file_path):
+                start = time.perf_counter()
+                self.category_index = read_category_index(file_path)
+                self.logger.info(f"Index of {site_id} ({len(self.category_index)} items) loaded from {file_path}"
+                                 f" in {(time.perf_counter() - start):.4f} seconds.")
+                return self.category_index
+        return None
+
+
+    def publish_category_snapshot(self, site_id: str, response_status: list[str]) -> list[str]:
+        """
+        Publishes the index as a snapshot (see CategorySnapshotStore), so every worker serves the
+        nodes of this tree from the same memory-mapped file.
+        """
+        try:
+            with self.tracer.span("publish_snapshot", categories=len(self.category_index)):
+                generation = self.snapshot_store.publish(site_id, self.category_index)
+            message = f"Snapshot of the index published: {generation}"
+        except Exception as exc:
+            message = f"Error publishing the snapshot of the index: {exc}"
+        self.logger.info(message)
+        response_status.append(message)
+        return response_status
+
+
+    def build_category_tree_threaded(self, site_id: str):
+        """
+        Default mode of build_category_tree: BFS with a thread pool, the index is built at the
+        same time as the tree.
+        """
+        start = time.perf_counter()
+        self.get_site_info_by_id(site_id)
+        top_level_categories = self.meli_client.get_top_level_categories(self.get_access_token(), site_id)
+        category_tree = self.crawl_categories(
+            [cat["id"] for cat in top_level_categories], self.get_category_info_thread_safe)
 
         stop = time.perf_counter()
         construction_time = f"Tree built in: {(stop - start):.4f} seconds."
@@ -263,6 +720,91 @@ class CategoryService:
 
         return response_status
 
+
+    def build_category_tree_prioritized(self, site_id: str):
+        """
+        Priority mode of build_category_tree (see crawl_categories_prioritized). Same result and
+        files as the threaded mode, but the biggest branches are fetched (and published) first.
+        """
+        start = time.perf_counter()
+        self.get_site_info_by_id(site_id)
+        top_level_categories = self.meli_client.get_top_level_categories(self.get_access_token(), site_id)
+        try:
+            category_tree = self.crawl_categories_prioritized(
+                [cat["id"] for cat in top_level_categories], self.get_category_info_thread_safe, site_id)
+        except Exception:
+            if self._partial_publisher is not None:
+                self._partial_publisher.join()
+            self.snapshot_store.discard_partial(site_id)
+            raise
+
+        stop = time.perf_counter()
+        construction_time = f"Tree built in: {(stop - start):.4f} seconds (priority mode)."
+        self.logger.info(construction_time)
+        response_status = [construction_time]
+
+        self.url_resolution_service.resolve_url_for_categories(category_tree, self.category_index)
+
+        return self.dump_tree_and_index_to_json(
+            category_tree, self.category_index, response_status, site_id)
+
+
+    def build_category_tree_pipelined(self, site_id: str):
+        """
+        Pipeline mode of build_category_tree (see CategoryTreePipeline). Same result and files,
+        but the CPU-heavy stages are spread across all cores.
+        """
+        start = time.perf_counter()
+        self.get_site_info_by_id(site_id)
+        top_level_categories = self.meli_client.get_top_level_categories(self.get_access_token(), site_id)
+
+        with CategoryTreePipeline(self.pipeline_workers) as pipeline:
+            category_tree = self.crawl_categories(
+                [cat["id"] for cat in top_level_categories],
+                lambda cid: self.get_category_info_pipelined(cid, pipeline),
+                build_index=False)
+            self.category_index = pipeline.aggregate_index(category_tree)
+
+            stop = time.perf_counter()
+            construction_time = f"Tree built in: {(stop - start):.4f} seconds (pipeline mode)."
+            self.logger.info(construction_time)
+            response_status = [construction_time]
+
+            # Infer the URL for each category, the pipeline extracts the anchors (in-process)
+            self.url_resolution_service.resolve_url_for_categories(
+                category_tree, self.category_index, anchor_extractor=pipeline.extract_anchors)
+
+            tree_json, index_json = pipeline.serialize(category_tree, self.category_index)
+
+        return self.dump_serialized_tree_and_index_to_json(
+            tree_json, index_json, len(self.category_index), response_status, site_id)
+
+
+    def build_category_tree_sharded(self, site_id: str, worker_processes: int = 4):
+        """
+        Sharded mode of build_category_tree (see CategoryShardService). Each shard of top-level
+        categories is crawled in a separate process, then the shards are merged here and the URL
+        resolution and the dumps are done as usual.
+        """
+        start = time.perf_counter()
+        self.get_site_info_by_id(site_id)
+        top_level_categories = self.meli_client.get_top_level_categories(self.get_access_token(), site_id)
+
+        shard_service = CategoryShardService(worker_processes=worker_processes)
+        category_tree, self.category_index = shard_service.crawl(
+            site_id, [cat["id"] for cat in top_level_categories], self.access_token, self.max_workers)
+
+        stop = time.perf_counter()
+        construction_time = (f"Tree built in: {(stop - start):.4f} seconds"
+                             f" ({worker_processes} shard processes).")
+        self.logger.info(construction_time)
+        response_status = [construction_time]
+
+        self.url_resolution_service.resolve_url_for_categories(category_tree, self.category_index)
+
+        return self.dump_tree_and_index_to_json(
+            category_tree, self.category_index, response_status, site_id)
+
     
     # Used to avoid calling the tree building process everytime.
     # This method is only to test the usage of url inferer utilities
@@ -0,0 +1,161 @@
+import logging
+import multiprocessing
+import time
+
+from app.dependencies.singleton_concurrency_limiter import get_concurrency_limiters
+from app.dependencies.singleton_meli_transport import get_meli_transport
+from app.infrastructure.shard_queue import LocalShardQueue
+
+
+def partition_top_level_categories(top_level_ids: list[str], shard_count: int) -> list[list[str]]:
+    """
+    Splits the top-level categories into shard_count shards (round-robin, MeLi doesn't tell us
+    the size of each top-level category beforehand). Empty shards are discarded.
+    """
+    shards = [top_level_ids[i::shard_count] for i in range(max(shard_count, 1))]
+    return [shard for shard in shards if shard]
+
+
+def crawl_shard(shard: dict) -> dict:
+    """
+    Crawls the categories of one shard and returns its part of the tree and the index.
+    shard: {"shard_id", "site_id", "category_ids", "access_token", "max_workers", "limiter_max_limits"}
+    """
+    # Imported here, the worker processes are spawned and only need it once they get a shard
+    from app.core.category_service import CategoryService
+
+    # Every process has its own limiters, each one gets its part of the ceiling (see crawl)
+    for name, max_limit in shard.get("limiter_max_limits", {}).items():
+        get_concurrency_limiters()[name].set_max_limit(max_limit)
+
+    category_service = CategoryService()
+    category_service.access_token = shard["access_token"]
+    category_service.max_workers = shard["max_workers"]
+    category_service.meli_client.priority = "crawl"
+
+    start = time.perf_counter()
+    category_tree = category_service.crawl_categories(
+        shard["category_ids"], category_service.get_category_info_thread_safe)
+
+    return {
+        "shard_id": shard["shard_id"],
+        "category_tree": category_tree,
+        "category_index": category_service.category_index,
+        "crawl_time": time.perf_counter() - start,
+    }
+
+
+def run_shard_worker(shard_queue):
+    """
+    Worker loop: takes shards from the queue until the stop signal (None) arrives, and publishes
+    the results (or the error) back. This is the entry point for a shard worker, either a local
+    process or a separate container pointed at the shared queue.
+    """
+    logger = logging.getLogger(__name__)
+
+    while True:
+        shard = shard_queue.get_shard()
+        if shard is None:
+            if hasattr(get_meli_transport(), "close"):
+                get_meli_transport().close()    # Recording mode, finishes this process' part
+            return
+
+        try:
+            result = crawl_shard(shard)
+            logger.info(f"Shard {shard['shard_id']} crawled in {result['crawl_time']:.4f} seconds.")
+        except Exception as exc:
+            logger.critical(f"Shard {shard['shard_id']} failed: {exc}")
+            result = {"shard_id": shard["shard_id"], "error": str(exc)}
+        shard_queue.put_result(result)
+
+
+class CategoryShardService:
+    """
+    Sharded crawl mode: the top-level categories of a site are split into shards, each shard is
+    crawled by a separate worker process and the results are merged into one tree and one index.
+
+    There can be more shards than worker processes, workers pull the next shard from the queue
+    when they finish one, so a large top-level category doesn't leave the rest of them idle.
+
+    The concurrency limiters are per process, so the ceilings (max_limit) of this process are
+    divided between the worker processes: all of them together never go above the MeLi
+    concurrency a single process would use.
+    """
+
+    def __init__(self, worker_processes: int = 4, shard_count: int | None = None,
+                 shard_queue=None, result_timeout: float = 3600):
+        self.worker_processes = worker_processes
+        self.shard_count = shard_count or worker_processes * 2
+        self.result_timeout = result_timeout   # seconds to wait for all the shard results
+        self.context = multiprocessing.get_context("spawn")
+        self.shard_queue = shard_queue or LocalShardQueue(self.context)
+        self.logger = logging.getLogger(__name__)
+
+
+    def crawl(self, site_id: str, top_level_ids: list[str], access_token: str,
+              max_workers: int) -> tuple[dict, dict]:
+        """
+        Publishes the shards, starts the worker processes and merges the results.
+        Returns (category_tree, category_index).
+
+        :param max_workers: threads of this process, divided between the worker processes
+        """
+        shards = partition_top_level_categories(top_level_ids, self.shard_count)
+        worker_count = min(self.worker_processes, len(shards))
+        limiter_max_limits = {name: max(1, limiter.max_limit // max(worker_count, 1))
+                              for name, limiter in get_concurrency_limiters().items()}
+        for shard_id, category_ids in enumerate(shards):
+            self.shard_queue.put_shard({
+                "shard_id": shard_id,
+                "site_id": site_id,
+                "category_ids": category_ids,
+                "access_token": access_token,
+                "max_workers": max(1, max_workers // max(worker_count, 1)),
+                "limiter_max_limits": limiter_max_limits,
+            })
+
+        for _ in range(worker_count):
+            self.shard_queue.put_shard(None)    # One stop signal per worker
+
+        workers = [
+            self.context.Process(target=run_shard_worker, args=(self.shard_queue,), daemon=True)
+            for _ in range(worker_count)
+        ]
+        for worker in workers:
+            worker.start()
+
+        self.logger.info(f"Crawling {site_id} in {len(shards)} shards with {worker_count} processes.")
+
+        shard_trees, category_index, errors = {}, {}, []
+        try:
+            deadline = time.monotonic() + self.result_timeout
+            pending_results = len(shards)
+            while pending_results:
+                result = self.shard_queue.get_result(timeout=1)
+                if result is None:
+                    # Fail fast if every worker died (e.g. killed) instead of waiting the timeout
+                    if not any(worker.is_alive() for worker in workers):
+                        raise RuntimeError(f"All shard workers of {site_id} exited with"
+                                           f" {pending_results} shards pending.")
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"Timed out waiting for the shard results of {site_id}.")
+                    continue
+
+                pending_results -= 1
+                if "error" in result:
+                    errors.append(f"shard {result['shard_id']}: {result['error']}")
+                    continue
+                shard_trees.update(result["category_tree"])
+                category_index.update(result["category_index"])
+        finally:
+            for worker in workers:
+                worker.join(timeout=5)
+                if worker.is_alive():
+                    worker.terminate()
+
+        if errors:
+            raise RuntimeError(f"Failed crawling {site_id}: {'; '.join(errors)}")
+
+        # Keep the top-level categories in the same order MeLi returned them
+        category_tree = {cid: shard_trees[cid] for cid in top_level_ids if cid in shard_trees}
+        return category_tree, category_index
@@ -0,0 +1,168 @@
+from concurrent.futures import ProcessPoolExecutor
+import json
+import logging
+import os
+
+
+# The functions below are module-level (not methods) on purpose: the process pool needs to pickle
+# them, and that only works for functions importable by name.
+
+def build_category_node(category_id: str, category_info: dict) -> dict:
+    """
+    Normalizes the category info returned by MeLi into the node used by the category tree.
+    Shared by the threaded crawl (get_category_info_thread_safe) and the pipeline mode.
+    """
+    return {
+        "id": category_id,
+        "name": category_info.get("name"),
+        "site_id": category_id[:3],
+        "permalink": category_info.get("permalink"),
+        "url": category_info.get("permalink"),
+        "total_items_in_this_category": category_info.get("total_items_in_this_category"),
+        "fragile": category_info.get("settings").get("fragile", False),
+        "path_from_root": category_info.get("path_from_root"),
+
+        # To be filled later
+        "children": {},
+
+        # We retain only the child IDs for recursion
+        "children_ids": [
+            child["id"] for child in category_info.get("children_categories", [])
+        ]
+    }
+
+
+def flatten_category(node: dict) -> dict:
+    """
+    Shallow copy of a node for the index, without the children (otherwise we would get the fully
+    constructed trees for each category as well).
+    """
+    flat = node.copy()
+    flat["children"] = {}
+    flat["children_ids"] = list(node["children_ids"])
+    return flat
+
+
+def parse_category_payload(category_id: str, raw_payload: str) -> dict:
+    """Parses the raw JSON body of /categories/{category_id} and normalizes it."""
+    return build_category_node(category_id, json.loads(raw_payload))
+
+
+def flatten_subtree(subtree: dict) -> dict[str, dict]:
+    """Builds the index entries of a whole top-level category (a shard)."""
+    index_shard = {}
+    stack = [subtree]
+    while stack:
+        node = stack.pop()
+        index_shard[node["id"]] = flatten_category(node)
+        stack.extend(node["children"].values())
+    return index_shard
+
+
+def serialize_shard(category_id: str, subtree: dict, index_shard: dict[str, dict]) -> tuple[str, str]:
+    """
+    Serializes one top-level category (tree and index entries) as JSON fragments, which are later
+    joined by join_tree_fragments/join_index_fragments. The output is the same as json.dump with
+    indent=2, which can't use the C encoder and is the slowest part of the dump for large sites.
+    """
+    # JSON strings never contain raw line breaks (they are escaped), so re-indenting is safe
+    subtree_json = json.dumps(subtree, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+    tree_fragment = f"  {json.dumps(category_id, ensure_ascii=False)}: {subtree_json}"
+
+    # The index is flat, so only the entries are kept (without the enclosing braces)
+    index_fragment = json.dumps(index_shard, indent=2, ensure_ascii=False)[2:-2] if index_shard else ""
+    return tree_fragment, index_fragment
+
+
+def join_tree_fragments(fragments: list[str]) -> str:
+    return "{\n" + ",\n".join(fragments) + "\n}" if fragments else "{}"
+
+
+def join_index_fragments(fragments: list[str]) -> str:
+    fragments = [fragment for fragment in fragments if fragment]
+    return "{\n" + ",\n".join(fragments) + "\n}" if fragments else "{}"
+
+
+class CategoryTreePipeline:
+    """
+    Optional pipeline mode for building the category tree.
+
+    The network I/O stays in the crawler threads, while the serialization of the tree and the
+    index (json.dumps with indent=2, the pure Python encoder) runs in a process pool, sharded by
+    top-level category, so it's not fighting for the GIL with the rest of the build.
+    The other CPU stages (JSON parsing and normalization, HTML anchor extraction, index
+    aggregation) run in-process: they are small per call compared to pickling their arguments
+    and results to another process, so the pool only made them slower
+    (see tools/benchmarks/pipeline_stages_benchmark.py).
+
+    Usage:
+        with CategoryTreePipeline() as pipeline:
+            node = pipeline.parse_category(category_id, raw_payload)
+    """
+
+    def __init__(self, max_workers: int | None = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.logger = logging.getLogger(__name__)
+        self._executor = None
+
+
+    def __enter__(self):
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self
+
+
+    def __exit__(self, exc_type, exc, tb):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+
+
+    def parse_category(self, category_id: str, raw_payload: str) -> dict:
+        """Called from the crawler threads. In-process, see the class docstring."""
+        return parse_category_payload(category_id, raw_payload)
+
+
+    def extract_anchors(self, html: str) -> dict[str, str]:
+        """Anchor extractor for UrlResolutionService.resolve_url_for_categories. In-process too."""
+        # Imported here, like CategoryService.url_resolution_service does, so importing the
+        # pipeline (and CategoryService) doesn't load the URL resolution
+        from app.core.url_resolution_service import extract_category_anchors
+        return extract_category_anchors(html)
+
+
+    def aggregate_index(self, category_tree: dict[str, dict]) -> dict[str, dict]:
+        """Builds the flat category index, one top-level category at a time. In-process too."""
+        category_index = {}
+        for subtree in category_tree.values():
+            category_index.update(flatten_subtree(subtree))
+        self.logger.info(f"Index aggregated from {len(category_tree)} shards"
+                         f" ({len(category_index)} categories).")
+        return category_index
+
+
+    def serialize(self, category_tree: dict[str, dict], category_index: dict[str, dict]) -> tuple[str, str]:
+        """
+        Serializes the tree and the index into JSON text (same output as json.dump with indent=2).
+        The index entries are sharded by their top-level category (first entry of path_from_root).
+        """
+        index_shards = {category_id: {} for category_id in category_tree}
+        for category_id, entry in category_index.items():
+            path_from_root = entry.get("path_from_root") or [{"id": category_id}]
+            index_shards.setdefault(path_from_root[0]["id"], {})[category_id] = entry
+
+        tree_fragments, index_fragments = [], []
+        results = self._executor.map(
+            serialize_shard,
+            list(category_tree.keys()),
+            list(category_tree.values()),
+            [index_shards.pop(category_id) for category_id in category_tree],
+        )
+        for tree_fragment, index_fragment in results:
+            tree_fragments.append(tree_fragment)
+            index_fragments.append(index_fragment)
+
+        # Index entries whose top-level category is not in the tree (shouldn't happen)
+        for orphan_shard in index_shards.values():
+            if orphan_shard:
+                index_fragments.append(json.dumps(orphan_shard, indent=2, ensure_ascii=False)[2:-2])
+
+        return join_tree_fragments(tree_fragments), join_index_fragments(index_fragments)
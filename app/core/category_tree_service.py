@@ -0,0 +1,12 @@
+from app.infrastructure.repository.category_repository import CategoryRepository
+
+class CategoryTreeService:
+    def __init__(self):
+        self.category_repo = CategoryRepository()
+
+
+    def save_category_tree(self, site_id: str, category_index: dict[str, dict]) -> bool:
+        """
+        Calls save_category_tree in category_repo
+        """
+        return self.category_repo.save_category_tree(site_id, category_index)
@@ -0,0 +1,62 @@
+from contextlib import contextmanager
+import logging
+import os
+import socket
+import threading
+import uuid
+
+from app.infrastructure.repository.lease_repository import LeaseRepository
+
+
+class LeaderElectionService:
+    """
+    Leader election between the workers of the service through leases in the database (see Lease).
+    Every worker runs its own CategoryService, so the work that must happen only once (refreshing
+    the access token, building the tree of a site) is done by the worker holding the lease.
+
+        with leader_election.lead("crawl_MLU") as is_leader:
+            if is_leader:
+                ...     # only one worker at a time gets here
+
+    While the block runs, the lease is renewed in the background every ttl_seconds / 3, so a long
+    crawl keeps it, and a worker that dies loses it after ttl_seconds at most.
+    Every lead() is a different holder ({holder_id}:{random}), so two threads of the same worker
+    also exclude each other.
+    """
+
+    def __init__(self, holder_id: str | None = None):
+        self.lease_repo = LeaseRepository()
+        self.holder_id = holder_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.logger = logging.getLogger(__name__)
+
+
+    @contextmanager
+    def lead(self, lease_name: str, ttl_seconds: float = 60):
+        holder = f"{self.holder_id}:{uuid.uuid4().hex[:8]}"
+        if not self.lease_repo.try_acquire(lease_name, holder, ttl_seconds):
+            self.logger.info(f"Lease {lease_name} is held by another worker.")
+            yield False
+            return
+
+        stop = threading.Event()
+        renewer = threading.Thread(target=self._keep_renewing, args=(lease_name, holder, ttl_seconds, stop),
+                                   name=f"lease-{lease_name}", daemon=True)
+        renewer.start()
+        try:
+            yield True
+        finally:
+            stop.set()
+            renewer.join()
+            self.lease_repo.release(lease_name, holder)
+
+
+    def _keep_renewing(self, lease_name: str, holder: str, ttl_seconds: float, stop: threading.Event):
+        while not stop.wait(ttl_seconds / 3):
+            if not self.lease_repo.renew(lease_name, holder, ttl_seconds):
+                # Nothing to interrupt from here, the work finishes but another worker may start it too
+                self.logger.warning(f"Lease {lease_name} was lost by {holder}.")
+                return
+
+
+    def get_leases(self) -> list[dict] | None:
+        return self.lease_repo.get_leases()
@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+
+from app.dependencies.singleton_access_tracker import get_access_tracker
+
+
+class PrefetchService:
+    """
+    Fetches the hottest categories (see AccessTracker) from MeLi and caches them already encoded,
+    so right after a deploy, or after the tree of a site was refreshed, the popular
+    GET /api/v1/{category_id} are served from memory instead of all going to MeLi at once.
+
+    Low priority: the prefetch calls go to MeLi with the "prefetch" priority, which only gets a
+    slot of the concurrency limit while the requests in flight (crawl, interactive) leave a
+    quarter of it free (see singleton_concurrency_limiter.py). When they don't, the prefetch waits
+    in the limiter, it never competes with them for the quota.
+    """
+
+    def __init__(self, category_service_factory, limit: int = 500, worker_share: float = 0.25):
+        self.category_service_factory = category_service_factory
+        self.limit = limit
+        self.worker_share = worker_share      # threads, as a share of the max limit
+        self.access_tracker = get_access_tracker()
+        self.logger = logging.getLogger(__name__)
+
+
+    def prefetch(self, site_id: str | None = None) -> str:
+        """Prefetches the hot categories (of site_id only, when given). Returns a summary."""
+        category_ids = self.access_tracker.hot_categories(self.limit, site_id)
+        if not category_ids:
+            return "No hot categories to prefetch."
+
+        start = time.perf_counter()
+        category_service = self.category_service_factory()
+        category_service.get_access_token()
+        category_service.meli_client.priority = "prefetch"
+        limiter = category_service.meli_client.api_limiter
+
+        def prefetch_one(category_id):
+            try:
+                category_service.prefetch_category(category_id)
+                return True
+            except Exception as exc:
+                self.logger.warning(f"Prefetch of {category_id} failed: {exc}")
+                return False
+
+        workers = max(1, int(limiter.max_limit * self.worker_share))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch") as executor:
+            fetched = sum(executor.map(prefetch_one, category_ids))
+
+        self.access_tracker.save()
+        message = (f"{fetched} of {len(category_ids)} hot categories prefetched"
+                   f"{f' for {site_id}' if site_id else ''} in {(time.perf_counter() - start):.4f} seconds.")
+        self.logger.info(message)
+        return message
+
+
+    def prefetch_in_background(self, site_id: str | None = None) -> threading.Thread:
+        thread = threading.Thread(target=self.prefetch, args=(site_id,), name="prefetch", daemon=True)
+        thread.start()
+        return thread
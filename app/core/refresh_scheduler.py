@@ -0,0 +1,287 @@
+from collections import deque
+from datetime import datetime, timezone, timedelta
+from fastapi import HTTPException
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+
+from app.core.leader_election_service import LeaderElectionService
+from app.dependencies.singleton_category_snapshot_store import get_category_snapshot_store
+
+
+# Fields of a category that count as a change of the tree for the churn (the item counts change
+# all the time, they don't).
+CHURN_FIELDS = ("name", "permalink", "children_ids")
+
+
+def tree_churn(previous_snapshot, category_index: dict[str, dict]) -> float | None:
+    """
+    Share of the categories added, removed or changed (CHURN_FIELDS) between the snapshot of the
+    previous build and the new index. None when there was no previous build.
+    """
+    if previous_snapshot is None or not category_index:
+        return None
+    changed = 0
+    kept = 0
+    for category_id, entry in category_index.items():
+        previous = previous_snapshot.get(category_id)
+        if previous is None:
+            changed += 1
+            continue
+        kept += 1
+        if any(previous.get(field) != entry.get(field) for field in CHURN_FIELDS):
+            changed += 1
+    removed = max(0, len(previous_snapshot) - kept)
+    return (changed + removed) / len(category_index)
+
+
+class RefreshScheduler:
+    """
+    Rebuilds the tree of every site periodically, in the background of the service, each one at
+    its own cadence:
+
+        interval = base_interval * size_factor / churn_factor, between min and max interval
+
+    Big sites take longer and cost more MeLi calls, so they're refreshed less often
+    (size_factor 1 for 1000 categories, 1.5 for 10k, 2 for 100k). Sites whose tree changed a lot
+    in the last run are refreshed more often (churn_factor 1 + churn * churn_weight).
+
+    Load is spread out: the first runs are staggered evenly over base_interval, every run gets a
+    random jitter, and a run is never scheduled while another one is expected to be running
+    (its last duration plus min_gap). Runs are sequential, one site at a time, and only in the
+    worker holding the refresh_scheduler lease. A site whose build is still running (started by
+    hand, or by another worker) is skipped and retried after min_gap.
+
+    Schedule and past runs are kept in state_path, so a restart doesn't reset the cadences. It's
+    also how the workers share them: the leader reloads it before every run (another worker may
+    have led, and run the site, meanwhile) and snapshot() reloads it too.
+    """
+
+    def __init__(self, category_service_factory, site_ids: list[str] | None = None,
+                 base_interval: timedelta = timedelta(hours=24), min_interval: timedelta = timedelta(hours=6),
+                 max_interval: timedelta = timedelta(days=7), churn_weight: float = 20, jitter_ratio: float = 0.1,
+                 min_gap: timedelta = timedelta(minutes=10), default_duration: timedelta = timedelta(minutes=30),
+                 tick_seconds: float = 30, history_size: int = 200,
+                 state_path: str = os.path.join("app", "cache", "refresh_schedule.json")):
+        self.category_service_factory = category_service_factory
+        self.site_ids = site_ids        # None: every site with a snapshot (built at least once)
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.churn_weight = churn_weight
+        self.jitter_ratio = jitter_ratio
+        self.min_gap = min_gap
+        self.default_duration = default_duration
+        self.tick_seconds = tick_seconds
+        self.state_path = state_path
+        self.leader_election = LeaderElectionService()
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._sites = {}        # site_id -> {interval_seconds, next_run_at, categories, churn, duration_seconds}
+        self._runs = deque(maxlen=history_size)
+        self._active = None     # site_id being refreshed
+        self._stop = threading.Event()
+        self._thread = None
+        self.load()
+
+
+    def interval_for(self, categories: int | None, churn: float | None) -> timedelta:
+        if not categories:
+            return self.base_interval
+        size_factor = 1 + math.log10(max(categories, 1000) / 1000) / 2
+        churn_factor = 1 + (churn or 0) * self.churn_weight
+        interval = self.base_interval * size_factor / churn_factor
+        return max(self.min_interval, min(self.max_interval, interval))
+
+
+    def _busy_windows(self, except_site: str) -> list[tuple[datetime, datetime]]:
+        windows = []
+        for site_id, site in self._sites.items():
+            if site_id == except_site or site.get("next_run_at") is None:
+                continue
+            start = site["next_run_at"]
+            duration = timedelta(seconds=site.get("duration_seconds") or self.default_duration.total_seconds())
+            windows.append((start - self.min_gap, start + duration + self.min_gap))
+        return sorted(windows)
+
+
+    def _slot(self, site_id: str, desired: datetime, interval: timedelta) -> datetime:
+        """desired plus jitter, pushed after the runs of the other sites it would overlap with."""
+        jitter = interval.total_seconds() * self.jitter_ratio
+        slot = max(datetime.now(timezone.utc), desired + timedelta(seconds=random.uniform(-jitter, jitter)))
+        duration = timedelta(seconds=self._sites.get(site_id, {}).get("duration_seconds")
+                             or self.default_duration.total_seconds())
+        for start, end in self._busy_windows(site_id):
+            if slot < end and slot + duration > start:
+                slot = end
+        return slot
+
+
+    def _known_sites(self) -> list[str]:
+        if self.site_ids is not None:
+            return list(self.site_ids)
+        return get_category_snapshot_store().site_ids()
+
+
+    def _schedule_new_sites(self):
+        """Sites never scheduled get their first run staggered evenly over base_interval."""
+        new_sites = [site_id for site_id in self._known_sites() if site_id not in self._sites]
+        now = datetime.now(timezone.utc)
+        for position, site_id in enumerate(new_sites):
+            self._sites[site_id] = {"interval_seconds": self.base_interval.total_seconds(), "next_run_at": None,
+                                    "categories": None, "churn": None, "duration_seconds": None}
+            spacing = self.base_interval / len(new_sites)
+            self._sites[site_id]["next_run_at"] = self._slot(site_id, now + spacing * (position + 0.5), spacing)
+
+
+    def _due_site(self) -> str | None:
+        now = datetime.now(timezone.utc)
+        due = [(site["next_run_at"], site_id) for site_id, site in self._sites.items()
+               if site["next_run_at"] is not None and site["next_run_at"] <= now]
+        return min(due)[1] if due else None
+
+
+    def run_site(self, site_id: str) -> dict:
+        """Refreshes the tree of site_id now, records the run and schedules the next one."""
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        run = {"site_id": site_id, "started_at": started_at, "status": None, "categories": None,
+               "churn": None, "seconds": None, "detail": None}
+        with self._lock:
+            self._active = site_id
+
+        category_service = self.category_service_factory()
+        previous_snapshot = category_service.snapshot_store.get(site_id)
+        try:
+            category_service.build_category_tree(site_id)
+            run["status"] = "finished"
+            run["categories"] = len(category_service.category_index)
+            run["churn"] = tree_churn(previous_snapshot, category_service.category_index)
+        except HTTPException as exc:
+            run["status"] = "skipped" if exc.status_code == 409 else "failed"
+            run["detail"] = exc.detail
+        except Exception as exc:
+            self.logger.error(f"Scheduled refresh of {site_id} failed: {exc}")
+            run["status"] = "failed"
+            run["detail"] = str(exc)
+        run["seconds"] = round(time.perf_counter() - start, 4)
+
+        with self._lock:
+            self._active = None
+            site = self._sites.setdefault(site_id, {"categories": None, "churn": None, "duration_seconds": None})
+            now = datetime.now(timezone.utc)
+            if run["status"] == "finished":
+                site.update(categories=run["categories"], churn=run["churn"], duration_seconds=run["seconds"])
+                interval = self.interval_for(site["categories"], site["churn"])
+                site["interval_seconds"] = interval.total_seconds()
+                site["next_run_at"] = self._slot(site_id, now + interval, interval)
+            else:
+                # Still running elsewhere, or failed: retried soon, but not right away
+                site["interval_seconds"] = site.get("interval_seconds") or self.base_interval.total_seconds()
+                site["next_run_at"] = self._slot(site_id, now + self.min_gap, self.min_gap)
+            self._runs.append(run)
+        self.save()
+        self.logger.info(f"Scheduled refresh of {site_id}: {run['status']} in {run['seconds']} seconds,"
+                         f" next run at {site['next_run_at'].isoformat()}.")
+        return run
+
+
+    def tick(self):
+        """One pass of the loop: schedules the new sites and runs the site most overdue, if any."""
+        with self._lock:
+            self._schedule_new_sites()
+            site_id = self._due_site()
+        if site_id is None:
+            return
+        with self.leader_election.lead("refresh_scheduler", ttl_seconds=max(60, self.tick_seconds * 2)) as is_leader:
+            if not is_leader:
+                return
+            # What this worker knows may be stale: the previous leader may have run it already
+            self.load()
+            with self._lock:
+                self._schedule_new_sites()
+                site_id = self._due_site()
+            if site_id is not None:
+                self.run_site(site_id)
+
+
+    def _loop(self):
+        while not self._stop.wait(self.tick_seconds):
+            try:
+                self.tick()
+            except Exception as exc:
+                self.logger.error(f"Refresh scheduler tick failed: {exc}")
+
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="refresh-scheduler", daemon=True)
+            self._thread.start()
+            self.logger.info("Refresh scheduler started.")
+
+
+    def stop(self):
+        """Stops scheduling. A refresh already running finishes in the background."""
+        self._stop.set()
+
+
+    def snapshot(self) -> dict:
+        if self._active is None:
+            self.load()     # The runs of the other workers, unless this one is the one running
+        with self._lock:
+            upcoming = sorted(
+                ({"site_id": site_id, "next_run_at": site["next_run_at"],
+                  "interval_hours": round(site["interval_seconds"] / 3600, 2),
+                  "categories": site["categories"], "churn": site["churn"],
+                  "last_duration_seconds": site["duration_seconds"]}
+                 for site_id, site in self._sites.items() if site.get("next_run_at") is not None),
+                key=lambda site: site["next_run_at"])
+            return {"running": self._thread is not None and self._thread.is_alive(), "active": self._active,
+                    "upcoming": upcoming, "past_runs": list(reversed(self._runs))}
+
+
+    def save(self):
+        def encode(value):
+            return value.isoformat() if isinstance(value, datetime) else value
+
+        with self._lock:
+            data = {
+                "sites": {site_id: {key: encode(value) for key, value in site.items()}
+                          for site_id, site in self._sites.items()},
+                "runs": [{key: encode(value) for key, value in run.items()} for run in self._runs],
+            }
+        try:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.state_path)
+        except OSError as exc:
+            self.logger.error(f"Couldn't save the refresh schedule to {self.state_path}: {exc}")
+
+
+    def load(self):
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as exc:
+            self.logger.error(f"Couldn't load the refresh schedule from {self.state_path}: {exc}")
+            return
+
+        def decode(site_or_run, key):
+            if site_or_run.get(key):
+                site_or_run[key] = datetime.fromisoformat(site_or_run[key])
+            return site_or_run
+
+        with self._lock:
+            self._sites = {site_id: decode(site, "next_run_at") for site_id, site in data.get("sites", {}).items()}
+            self._runs.clear()
+            self._runs.extend(decode(run, "started_at") for run in data.get("runs", []))
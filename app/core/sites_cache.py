@@ -0,0 +1,87 @@
+from datetime import datetime, timezone, timedelta
+from threading import Lock, Thread
+import logging
+
+
+class SitesCache:
+    """
+    In-memory cache of the MeLi sites, with stale-while-revalidate.
+
+    - Cold start (empty cache): loads the sites from the database, or from MeLi when the database
+      is empty. This is the only case in which a caller waits.
+    - Stale (older than max_age): the cached sites are returned right away and a background
+      thread refreshes them from MeLi (only one refresh at a time).
+    - Lookups by site id are O(1) (dict), no database hit.
+    """
+
+    def __init__(self):
+        self._sites = []
+        self._sites_by_id = {}
+        self._fetched_at = None
+        self._lock = Lock()             # Only one cold load at a time
+        self._refreshing = False
+        self.logger = logging.getLogger(__name__)
+
+
+    def get_sites(self, load_from_db, refresh_from_api, max_age: timedelta) -> list[dict]:
+        """
+        :param load_from_db: callable() -> list of sites stored in the database (or None)
+        :param refresh_from_api: callable() -> list of sites from MeLi (and persists them)
+        :param max_age: age after which the sites are revalidated in the background
+        """
+        if self._fetched_at is None:
+            with self._lock:
+                if self._fetched_at is None:
+                    self._cold_load(load_from_db, refresh_from_api)
+
+        if datetime.now(timezone.utc) - self._fetched_at > max_age:
+            self._revalidate_in_background(refresh_from_api)
+        return self._sites
+
+
+    def get_site(self, site_id: str) -> dict | None:
+        return self._sites_by_id.get(site_id)
+
+
+    def set_sites(self, sites: list[dict], fetched_at: datetime | None = None):
+        fetched_at = fetched_at or datetime.now(timezone.utc)
+        sites = [{**site, "updated_at": site.get("updated_at") or fetched_at} for site in sites]
+
+        # Replaced all at once, readers never see a partially updated cache
+        self._sites_by_id = {site["id"]: site for site in sites}
+        self._sites = sites
+        self._fetched_at = fetched_at
+
+
+    def _cold_load(self, load_from_db, refresh_from_api):
+        sites = load_from_db()
+        if sites:
+            self.logger.info("Sites cache loaded from the database.")
+            # updated_at is when they were last fetched from MeLi (see SiteRepository.save_sites)
+            latest_updated = max(site["updated_at"] for site in sites)
+            if latest_updated.tzinfo is None:
+                latest_updated = latest_updated.replace(tzinfo=timezone.utc)
+            self.set_sites(sites, latest_updated)
+        else:
+            self.logger.info("Sites not found in database, retrieving them via API (cold start).")
+            self.set_sites(refresh_from_api())
+
+
+    def _revalidate_in_background(self, refresh_from_api):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        Thread(target=self._revalidate, args=(refresh_from_api,), daemon=True).start()
+
+
+    def _revalidate(self, refresh_from_api):
+        try:
+            self.logger.info("Sites cache is stale, revalidating it in the background.")
+            self.set_sites(refresh_from_api())
+        except Exception as exc:
+            # Keep serving the stale sites, the next call will try again
+            self.logger.error(f"Failed revalidating the sites cache: {exc}")
+        finally:
+            self._refreshing = False
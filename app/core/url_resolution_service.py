@@ -1,81 +1,170 @@
 import re
-import threading
 import requests
 import logging
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from collections import deque
-from bs4 import BeautifulSoup
 
 from app.infrastructure.meli_api import MeliCategoryClient
+from app.dependencies.singleton_tracer import get_tracer
+from app.dependencies.singleton_html_page_cache import get_html_page_cache
 
 
+# Compiled once at module level, shared by every thread and the pipeline mode
+CATEGORY_ID_HREF_REGEX = re.compile(r'href=["\']([^"\']*#CATEGORY_ID=([A-Z]{3}\d+)[^"\']*)["\']',
+                                    flags=re.IGNORECASE)
+
+
+def extract_category_anchors(html: str) -> dict[str, str]:
+    """
+    Docstring for extract_category_anchors:
+
+    Extracts every category anchor from a listing page, in the form of:
+    https://listado.mercadolibre.com.uy/accesorios-vehiculos/acc-motos-cuatriciclos/#CATEGORY_ID=MLU1772
+    and returns a dict {category_id: url}, the URL without the #CATEGORY_ID fragment.
+
+    The regex does most of the work, BeautifulSoup is only used as a fallback when the regex
+    doesn't find anything (e.g. the href is built in a different way).
+    It's a module-level function (not a method) so the pipeline mode can use it without a
+    UrlResolutionService.
+
+    :param html: the HTML code of a listing page
+    """
+    anchors = {}
+    for match in CATEGORY_ID_HREF_REGEX.finditer(html):
+        anchors.setdefault(match.group(2).upper(), match.group(1).split("#", 1)[0])
+
+    if anchors:
+        return anchors
+
+    from bs4 import BeautifulSoup   # Imported here, it's rarely needed and slows down the startup
+    soup = BeautifulSoup(html, "html.parser")
+    for a in soup.find_all("a", href=True):
+        href = a["href"]
+        if "CATEGORY_ID=" not in href.upper():
+            continue
+        category_id = href.upper().split("CATEGORY_ID=", 1)[1].split("&", 1)[0]
+        anchors.setdefault(category_id, href.split("#", 1)[0])
+    return anchors
+
 
 class UrlResolutionService:
 
     def __init__(self):
         self.meli_client = MeliCategoryClient()
-        self.max_workers = 20
-        self._index_lock = threading.Lock()
+        self.meli_client.priority = "crawl"     # Only used by the tree builds
+        # The adaptive limiter of the MeLi client decides the real concurrency
+        self.max_workers = self.meli_client.html_limiter.max_limit
         self.logger = logging.getLogger(__name__)
         self.session = requests.Session()   # Reused for performance
-        self._catid_href_regex = re.compile(r'href=["\']([^"\']*#CATEGORY_ID=(MLU\d+)[^"\']*)["\']',
-                                         flags=re.IGNORECASE)
+        self.tracer = get_tracer()
+
+
+    def resolve_url_for_categories(self, category_tree: dict[str, dict], category_index: dict[str, dict],
+                                   anchor_extractor=None) -> int:
+        """
+        Resolves the URL of every category that doesn't come with a permalink from MeLi, level by
+        level (BFS), and updates both the tree node and its entry in the index.
+        Returns the amount of categories with a resolved URL.
 
-    def resolve_url_for_categories(self, category_tree: dict[str, dict], category_index: dict[str, dict]):
-        if not category_tree and category_index:
+        :param anchor_extractor: callable(html) -> {category_id: url}. By default
+        extract_category_anchors, the pipeline mode passes its own (in-process too).
+        """
+        if not category_tree or not category_index:
             raise RuntimeError(f"Objects category_tree and category_index are empty!"
                                f" Can't continue with the process")
-        
+
+        extract = anchor_extractor or extract_category_anchors
+
         # queue starts with top-level categories
         queue = deque(category_tree.values())
-        # The top-level categories are already resolved (they come with permalink)
-        resolved_url_count = len(category_tree.values())
-        futures = []
+        resolved_url_count = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor, self.tracer.span("resolve_urls"):
 
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            
             while queue:
                 batch = list(queue)
                 queue.clear()
 
-                for node in batch:
-                    # If already resolved, then enqueue children and move to next (continue).
-                    # This current one won't be processed again, avoiding reiteration and
-                    # leading to O(n).
-                    if node["url"]:
-                        for child in node["children"].values():
-                            queue.append(child)
-                        continue
-
-                    parent_id = self._get_parent_id(node)
-                    # If not parent_id that means is a top-level category.
-                    if not parent_id:
-                        continue
-
-                    # Preferred over category_index.get(parent_id), because it will fail with error
-                    # and that's a sign something is wrong. Otherwise, get() will return None.
-                    parent_node = category_index[parent_id]
-                    parent_url = parent_node.get("url")
-
-                    # Can't resolve until parent's URL is resolved, so enqueues for later.
-                    if not parent_url:
-                        queue.append(node)
-                        continue
-
-                    # Determine level in which the node is located in the tree
-                    # 0 - top-level
-                    # 1+ - children
-                    level = len(node["path_from_root"]) - 1
-
-                    # Level 1 categories have a particular way of resolving the URL, because their
-                    # id is present in the parent's webpage in the form of:
-                    # https://listado.mercadolibre.com.uy/accesorios-vehiculos/acc-motos-cuatriciclos/#CATEGORY_ID=MLU1772
-                    if level == 1:
-                        futures.append(
-                            executor.submit(self._resolve_level1, node, parent_node)
-                        )
+                with self.tracer.span("url_level", categories=len(batch)):
+                    resolved, next_nodes = self._resolve_level(batch, category_index, executor, extract)
+                resolved_url_count += resolved
+                queue.extend(next_nodes)
+
+        get_html_page_cache().flush()
+        self.logger.info(f"URLs resolved for {resolved_url_count} of {len(category_index)} categories.")
+        return resolved_url_count
 
 
+    def _resolve_level(self, batch, category_index, executor, extract) -> tuple[int, list[dict]]:
+        """
+        Resolves the URLs of one level of the tree. Returns the amount of resolved URLs and the
+        nodes of the next level (children of the resolved ones).
+        """
+        resolved_url_count = 0
+        next_nodes = []
+
+        # Nodes waiting for their parent's webpage, grouped by the parent URL, so every
+        # parent webpage is downloaded only once per level.
+        pending = {}
+
+        for node in batch:
+            # If already resolved, then enqueue children and move to next (continue).
+            # This current one won't be processed again, avoiding reiteration and
+            # leading to O(n).
+            if node["url"]:
+                resolved_url_count += 1
+                next_nodes.extend(node["children"].values())
+                continue
+
+            parent_id = self._get_parent_id(node)
+            # If not parent_id that means is a top-level category.
+            if not parent_id:
+                continue
+
+            # Preferred over category_index.get(parent_id), because it will fail with error
+            # and that's a sign something is wrong. Otherwise, get() will return None.
+            parent_node = category_index[parent_id]
+            parent_url = parent_node.get("url")
+
+            # Children are only enqueued once the parent is resolved, so this should never
+            # happen. Enqueuing it again would loop forever, so it's skipped.
+            if not parent_url:
+                self.logger.warning(f"Parent {parent_id} of {node['id']} has no URL, skipping.")
+                continue
+
+            # Level 1 categories have a particular way of resolving the URL, because their
+            # id is present in the parent's webpage in the form of:
+            # https://listado.mercadolibre.com.uy/accesorios-vehiculos/acc-motos-cuatriciclos/#CATEGORY_ID=MLU1772
+            # Deeper levels are listed the same way in their parent's listing page.
+            pending.setdefault(parent_url, []).append(node)
+
+        traced_fetch_anchors = self.tracer.wrap(self._fetch_anchors)
+        futures_map = {
+            executor.submit(traced_fetch_anchors, parent_url, extract): parent_url
+            for parent_url in pending
+        }
+
+        for fut in as_completed(futures_map):
+            parent_url = futures_map[fut]
+            try:
+                anchors = fut.result()
+            except Exception as exc:
+                self.logger.error(f"Failed resolving URLs from {parent_url}: {exc}")
+                continue
+
+            for node in pending[parent_url]:
+                url = anchors.get(node["id"])
+                if not url:
+                    self.logger.warning(f"No URL found for {node['id']} in {parent_url}")
+                    continue
+
+                node["url"] = url
+                category_index[node["id"]]["url"] = url
+                resolved_url_count += 1
+                next_nodes.extend(node["children"].values())
+
+        return resolved_url_count, next_nodes
+
 
     def _get_parent_id(self, node):
         """
@@ -84,26 +173,44 @@ class UrlResolutionService:
         MeLi provides the path from category to the root. A simple way to get the parent
         id of a category is checking the second to the last entry in path_from_root,
         which is the parent id, the last entry is the category itself.
-        
+
         :param node: is a category (simple, undeveloped)
         """
         pfr = node.get("path_from_root", [])
         if len(pfr) < 2:
             return None
         return pfr[-2]["id"]
-    
+
 
     def _fetch_html(self, url):
         html_code = self.meli_client.get_html_scrape_code(url)
 
         if not html_code:
+            self.logger.warning(f"Empty HTML code returned for {url}")
+            return None
+        return html_code
 
 
-
-    def _resolve_level1(self, node, parent_node):
-         """Parent HTML contains CATEGORY_ID=... for level 1."""
-         parent_url = parent_node["url"]
-         html = self._fetch_html(parent_url)
-         if not html:
-             return None
-        
\ No newline at end of file
+    def _fetch_anchors(self, parent_url, extract) -> dict[str, str]:
+        """
+        Parent HTML contains CATEGORY_ID=... for its children.
+        Goes through the HTML page cache (see HtmlPageCache): a page fetched within the TTL is
+        neither downloaded nor parsed again, and a page downloaded again but unchanged (same
+        content hash) is not parsed again.
+        """
+        page_cache = get_html_page_cache()
+        anchors = page_cache.get_anchors(parent_url)
+        if anchors is not None:
+            return anchors
+
+        html = self._fetch_html(parent_url)
+        if not html:
+            return {}
+
+        content_hash = page_cache.put_page(parent_url, html)
+        anchors = page_cache.get_anchors_by_hash(content_hash)
+        if anchors is None:
+            with self.tracer.span("extract_anchors", url=parent_url):
+                anchors = extract(html)
+            page_cache.put_anchors(content_hash, anchors)
+        return anchors
@@ -0,0 +1,111 @@
+import logging
+import os
+import threading
+import time
+
+from app.infrastructure.readiness import Readiness
+from app.infrastructure.db_initializer import initialize_database
+from app.dependencies.singleton_category_snapshot_store import get_category_snapshot_store
+from app.core.prefetch_service import PrefetchService
+
+
+class WarmupService:
+    """
+    The startup work of the service, one step per readiness check:
+        database        creates the missing tables
+        access_token    makes sure there's a valid token (fetched by one worker, see get_access_token)
+        snapshots       maps the snapshot of every site already built (see CategorySnapshotStore),
+                        rebuilt from the columnar export when a site has one but no snapshot,
+                        and every export loaded in memory when keep_trees_in_memory is set
+    and then, in the background and without a readiness check (it's best-effort, a slow or rate
+    limiting MeLi must not hold the service back), caches the categories that were the hottest
+    before the restart (see PrefetchService), so the first requests after a deploy don't all go
+    to MeLi.
+
+    Run before serving (the default), or in the background in fast-start mode (MELI_FAST_START=true),
+    where the service answers /health right away and reports ready when the warmup is done.
+    """
+
+    def __init__(self, readiness: Readiness, category_service_factory,
+                 token_attempts: int = 5, token_backoff_seconds: float = 1.0):
+        self.readiness = readiness
+        self.category_service_factory = category_service_factory    # CategoryService built on first use
+        self.token_attempts = token_attempts
+        self.token_backoff_seconds = token_backoff_seconds
+        self.logger = logging.getLogger(__name__)
+
+
+    def _step(self, check: str, func) -> bool:
+        self.readiness.start(check)
+        try:
+            detail = func()
+        except Exception as exc:
+            self.logger.error(f"Warmup step {check} failed: {exc}")
+            self.readiness.finish(check, False, str(exc))
+            return False
+        self.readiness.finish(check, True, detail)
+        return True
+
+
+    def initialize_database(self) -> bool:
+        return self._step("database", initialize_database)
+
+
+    def fetch_access_token(self, attempts: int = 1) -> bool:
+        """With attempts > 1, retries with exponential backoff (the auth service may still be starting)."""
+        def fetch():
+            self.category_service_factory().get_access_token()
+
+        for attempt in range(attempts):
+            if self._step("access_token", fetch):
+                return True
+            if attempt < attempts - 1:
+                time.sleep(self.token_backoff_seconds * 2 ** attempt)
+        return False
+
+
+    def _load_exports(self, store, site_ids: list[str]):
+        tree_dir = os.path.join("app", "tree")
+        exported = {name[len("meli_category_index_"):].split(".", 1)[0]
+                    for name in (os.listdir(tree_dir) if os.path.isdir(tree_dir) else [])
+                    if name.startswith("meli_category_index_") and not name.endswith(".json")}
+        for site_id in sorted(exported):
+            category_service = self.category_service_factory()
+            if site_id in site_ids and not category_service.keep_trees_in_memory:
+                continue
+            category_index = category_service.load_category_index(site_id)
+            if not category_index:
+                continue
+            if site_id not in site_ids:
+                store.publish(site_id, category_index)
+                site_ids.append(site_id)
+            if category_service.keep_trees_in_memory:
+                category_service.index_registry.load(site_id, category_index)
+
+
+    def load_snapshots(self) -> bool:
+        def load():
+            store = get_category_snapshot_store()
+            site_ids = store.site_ids()
+            self._load_exports(store, site_ids)
+            loaded = [site_id for site_id in site_ids if store.get(site_id) is not None]
+            return f"{len(loaded)} snapshots mapped: {', '.join(sorted(loaded))}" if loaded else "No snapshots yet."
+        return self._step("snapshots", load)
+
+
+    def prefetch_hot_categories(self) -> threading.Thread | None:
+        """Starts the prefetch in the background (see PrefetchService), None when it's disabled."""
+        category_service = self.category_service_factory()
+        if not category_service.prefetch_limit:
+            self.logger.info("Prefetch disabled.")
+            return None
+        return PrefetchService(self.category_service_factory, category_service.prefetch_limit).prefetch_in_background()
+
+
+    def run(self) -> bool:
+        """The whole warmup (background mode), doesn't stop at the first failed step."""
+        start = time.perf_counter()
+        results = [self.initialize_database(), self.fetch_access_token(self.token_attempts), self.load_snapshots()]
+        self.prefetch_hot_categories()
+        self.logger.info(f"Warmup finished in {(time.perf_counter() - start):.4f} seconds: {self.readiness.snapshot()}")
+        return all(results)
@@ -0,0 +1,16 @@
+# The entire purpose of this file is to have a Singleton instance of AccessTracker and of the cache
+# of encoded category responses, shared by every CategoryService and by the prefetcher.
+
+from app.infrastructure.access_tracker import AccessTracker
+from app.infrastructure.category_node_cache import CategoryNodeCache
+
+singleton_access_tracker = AccessTracker()
+
+# category_id -> response body of GET /api/v1/{category_id}, already encoded (bytes)
+singleton_category_response_cache = CategoryNodeCache(ttl_seconds=6 * 3600, max_nodes=20_000)
+
+def get_access_tracker() -> AccessTracker:
+    return singleton_access_tracker
+
+def get_category_response_cache() -> CategoryNodeCache:
+    return singleton_category_response_cache
@@ -0,0 +1,21 @@
+# The entire purpose of this file is to have a Singleton instance of AdmissionController, shared
+# by the middleware and the monitoring endpoint.
+# "crawl" is the tree build (few, long requests), "maintenance" the heavy crawler internals (tree
+# history rebuilds, profiling), "interactive" everything else (one category, sites, queries).
+# Each one keeps its reserved slots whatever the other one does. That's per HTTP
+# request, the MeLi calls they make get the same treatment in the limiters
+# (see singleton_concurrency_limiter.py).
+
+from app.infrastructure.admission_control import AdmissionController, PriorityClass
+
+singleton_admission_controller = AdmissionController(
+    classes=[
+        PriorityClass("crawl", reserved=2, client_rate=1 / 60, client_burst=2),
+        PriorityClass("interactive", reserved=16, client_rate=20, client_burst=40),
+        PriorityClass("maintenance", reserved=2, client_rate=0.2, client_burst=3),
+    ],
+    max_in_flight=48,
+)
+
+def get_admission_controller() -> AdmissionController:
+    return singleton_admission_controller
@@ -0,0 +1,16 @@
+# The entire purpose of this file is to have Singleton instances of BoundedBlockingExecutor, so
+# async routes never run blocking I/O (requests, SQLAlchemy) on the event loop.
+# "interactive" is for short calls (one category, sites), "crawl" for the long-running tree builds.
+
+from app.infrastructure.blocking_executor import BoundedBlockingExecutor
+
+singleton_blocking_executors = {
+    "interactive": BoundedBlockingExecutor("interactive", max_workers=32, max_pending=256, timeout_seconds=30),
+    "crawl": BoundedBlockingExecutor("crawl", max_workers=2, max_pending=4, timeout_seconds=None),
+}
+
+def get_blocking_executor(name: str = "interactive") -> BoundedBlockingExecutor:
+    return singleton_blocking_executors[name]
+
+def get_blocking_executors() -> dict[str, BoundedBlockingExecutor]:
+    return singleton_blocking_executors
@@ -0,0 +1,9 @@
+# The entire purpose of this file is to have a Singleton instance of CategoryIndexRegistry, so
+# every site's index kept in memory shares the same string pool.
+
+from app.infrastructure.category_index_registry import CategoryIndexRegistry
+
+singleton_category_index_registry = CategoryIndexRegistry()
+
+def get_category_index_registry() -> CategoryIndexRegistry:
+    return singleton_category_index_registry
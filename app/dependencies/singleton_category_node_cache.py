@@ -0,0 +1,9 @@
+# The entire purpose of this file is to have a Singleton instance of CategoryNodeCache shared by
+# every CategoryService (they are instantiated per request).
+
+from app.infrastructure.category_node_cache import CategoryNodeCache
+
+singleton_category_node_cache = CategoryNodeCache()
+
+def get_category_node_cache() -> CategoryNodeCache:
+    return singleton_category_node_cache
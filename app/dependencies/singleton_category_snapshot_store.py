@@ -0,0 +1,17 @@
+# The entire purpose of this file is to have a Singleton instance of CategorySnapshotStore per
+# worker. The snapshots themselves are shared by every worker through the files (mmap).
+# It's created on first use, like the HTML cache, so importing CategoryService touches no files.
+
+from threading import Lock
+
+from app.infrastructure.category_snapshot import CategorySnapshotStore
+
+singleton_category_snapshot_store = None
+_singleton_lock = Lock()
+
+def get_category_snapshot_store() -> CategorySnapshotStore:
+    global singleton_category_snapshot_store
+    with _singleton_lock:
+        if singleton_category_snapshot_store is None:
+            singleton_category_snapshot_store = CategorySnapshotStore()
+    return singleton_category_snapshot_store
@@ -0,0 +1,25 @@
+# The entire purpose of this file is to have Singleton instances of AdaptiveConcurrencyLimiter
+# shared by every MeliCategoryClient (services are instantiated per request, but the MeLi quota
+# is the same for all of them). One limiter for the API and one for the HTML scraping.
+# Same priority classes as the admission control (singleton_admission_controller.py), but for
+# the MeLi calls themselves: "crawl" (tree builds, scheduled or not), "interactive" (one category,
+# sites) and "prefetch" (background, never more than 3/4 of the limit). Each one keeps its share.
+
+from app.infrastructure.concurrency_limiter import AdaptiveConcurrencyLimiter, LimiterPriority
+
+MELI_PRIORITIES = [
+    LimiterPriority("crawl", reserved=0.25, max_share=1.0),
+    LimiterPriority("interactive", reserved=0.25, max_share=1.0),
+    LimiterPriority("prefetch", reserved=0.05, max_share=0.75),
+]
+
+singleton_concurrency_limiters = {
+    "meli_api": AdaptiveConcurrencyLimiter(priorities=MELI_PRIORITIES),
+    "meli_html": AdaptiveConcurrencyLimiter(initial_limit=10, max_limit=32, priorities=MELI_PRIORITIES),
+}
+
+def get_concurrency_limiter(name: str = "meli_api") -> AdaptiveConcurrencyLimiter:
+    return singleton_concurrency_limiters[name]
+
+def get_concurrency_limiters() -> dict[str, AdaptiveConcurrencyLimiter]:
+    return singleton_concurrency_limiters
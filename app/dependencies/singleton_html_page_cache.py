@@ -0,0 +1,17 @@
+# The entire purpose of this file is to have a Singleton instance of HtmlPageCache shared by every
+# UrlResolutionService. It's created on first use, so the cache directory is only created when
+# URL resolution really runs.
+
+from threading import Lock
+
+from app.infrastructure.html_page_cache import HtmlPageCache
+
+singleton_html_page_cache = None
+_singleton_lock = Lock()
+
+def get_html_page_cache() -> HtmlPageCache:
+    global singleton_html_page_cache
+    with _singleton_lock:
+        if singleton_html_page_cache is None:
+            singleton_html_page_cache = HtmlPageCache()
+    return singleton_html_page_cache
@@ -0,0 +1,27 @@
+# The entire purpose of this file is to have a Singleton transport shared by every
+# MeliCategoryClient (see meli_transport.py). Chosen by environment variables:
+#   MELI_TRANSPORT=record  MELI_TRANSPORT_ARCHIVE=recording.jsonl.gz   records every response
+#   MELI_TRANSPORT=replay  MELI_TRANSPORT_ARCHIVE=recording.jsonl.gz   serves them, no network
+#   MELI_REPLAY_LATENCY_SCALE=0.5                                      (replay) recorded latency x 0.5
+# Anything else (or nothing) is the real network.
+# Recording, every process (uvicorn workers, shard workers) writes its own recording.{pid}.jsonl.gz
+# next to the archive path and replay reads all of them. Use a new archive path per recording,
+# the parts of an older one would be replayed too.
+
+import os
+
+from app.infrastructure.meli_transport import RequestsTransport, RecordingTransport, ReplayTransport
+
+def _build_transport():
+    mode = os.getenv("MELI_TRANSPORT", "").lower()
+    archive_path = os.getenv("MELI_TRANSPORT_ARCHIVE", "meli_recording.jsonl.gz")
+    if mode == "record":
+        return RecordingTransport(archive_path)
+    if mode == "replay":
+        return ReplayTransport(archive_path, float(os.getenv("MELI_REPLAY_LATENCY_SCALE", "1.0")))
+    return RequestsTransport()
+
+singleton_meli_transport = _build_transport()
+
+def get_meli_transport():
+    return singleton_meli_transport
@@ -0,0 +1,9 @@
+# The entire purpose of this file is to have a Singleton instance of Profiler, shared by the
+# profiling endpoints and the profiled tree builds (tracemalloc is process-wide anyway).
+
+from app.infrastructure.profiler import Profiler
+
+singleton_profiler = Profiler()
+
+def get_profiler() -> Profiler:
+    return singleton_profiler
@@ -0,0 +1,10 @@
+# The entire purpose of this file is to have a Singleton instance of Readiness per worker, filled
+# by the startup warmup (see WarmupService) and reported by /health/ready. The prefetch of the hot
+# categories is best-effort and runs in the background, it's not a readiness check.
+
+from app.infrastructure.readiness import Readiness
+
+singleton_readiness = Readiness(["database", "access_token", "snapshots"])
+
+def get_readiness() -> Readiness:
+    return singleton_readiness
@@ -0,0 +1,20 @@
+# The entire purpose of this file is to have a Singleton instance of RefreshScheduler per worker,
+# started by main.py (MELI_REFRESH_SCHEDULER=true) and reported by /api/v1/crawler/schedule.
+# MELI_REFRESH_SITES=MLA,MLB,... limits it to those sites, otherwise every site already built
+# once is refreshed.
+
+import os
+
+from app.core.category_service import CategoryService
+from app.core.refresh_scheduler import RefreshScheduler
+from app.dependencies.singleton_auth_service_client import get_auth_service_client
+
+_site_ids = os.getenv("MELI_REFRESH_SITES")
+
+# With the auth client: runs are hours apart, the access token has usually expired by then
+singleton_refresh_scheduler = RefreshScheduler(
+    lambda: CategoryService(get_auth_service_client()),
+    site_ids=[site_id.strip() for site_id in _site_ids.split(",") if site_id.strip()] if _site_ids else None)
+
+def get_refresh_scheduler() -> RefreshScheduler:
+    return singleton_refresh_scheduler
@@ -0,0 +1,21 @@
+# The entire purpose of this file is to have Singleton instances of the retry budget and the
+# circuit breakers (one per endpoint class), shared by every MeliCategoryClient.
+
+from app.infrastructure.resilience import RetryBudget, CircuitBreaker
+
+singleton_retry_budget = RetryBudget()
+
+singleton_circuit_breakers = {
+    "sites": CircuitBreaker("sites"),
+    "categories": CircuitBreaker("categories"),
+    "html": CircuitBreaker("html"),
+}
+
+def get_retry_budget() -> RetryBudget:
+    return singleton_retry_budget
+
+def get_circuit_breaker(endpoint_class: str) -> CircuitBreaker:
+    return singleton_circuit_breakers[endpoint_class]
+
+def get_circuit_breakers() -> dict[str, CircuitBreaker]:
+    return singleton_circuit_breakers
@@ -0,0 +1,9 @@
+# The entire purpose of this file is to have a Singleton instance of SitesCache shared by every
+# CategoryService (they are instantiated per request).
+
+from app.core.sites_cache import SitesCache
+
+singleton_sites_cache = SitesCache()
+
+def get_sites_cache() -> SitesCache:
+    return singleton_sites_cache
@@ -0,0 +1,9 @@
+# The entire purpose of this file is to have a Singleton instance of Tracer shared by the services
+# and clients involved in a tree build (see tracing.py).
+
+from app.infrastructure.tracing import Tracer
+
+singleton_tracer = Tracer()
+
+def get_tracer() -> Tracer:
+    return singleton_tracer
@@ -0,0 +1,14 @@
+# The entire purpose of this file is to have a Singleton instance of TreeHistoryStore, so the
+# builds (one CategoryService per request) and the history endpoints share the same lock.
+# MELI_TREE_HISTORY_KEEP_DAYS drops the history older than that (kept forever by default).
+
+import os
+
+from app.infrastructure.tree_history import TreeHistoryStore
+
+_keep_days = os.getenv("MELI_TREE_HISTORY_KEEP_DAYS")
+
+singleton_tree_history = TreeHistoryStore(keep_days=float(_keep_days) if _keep_days else None)
+
+def get_tree_history() -> TreeHistoryStore:
+    return singleton_tree_history
@@ -0,0 +1,181 @@
+from datetime import datetime, timezone
+from threading import Lock
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+from app.infrastructure.file_lock import file_lock
+
+
+class AccessTracker:
+    """
+    Which categories (and sites) are requested the most, with decaying counts: every access adds
+    1 and the counts halve every half_life_seconds, so the hot set follows the traffic of the last
+    hours instead of all time. Only the max_entries hottest categories are kept.
+
+    The hot set is saved to path (JSON, every save_interval_seconds and on shutdown) and loaded on
+    startup, so a freshly deployed worker knows what to prefetch (see PrefetchService).
+    Scores are stored with their wall-clock time, they keep decaying while the service is down.
+
+    Every worker saves to the same file: a save adds the accesses recorded since the previous one
+    to what's on disk (under a lock between processes), instead of overwriting the hot set of the
+    other workers, and the worker then takes the merged hot set as its own.
+    """
+
+    def __init__(self, path: str = os.path.join("app", "cache", "hot_categories.json"),
+                 half_life_seconds: float = 6 * 3600, max_entries: int = 5000,
+                 save_interval_seconds: float = 300):
+        self.path = path
+        self.half_life_seconds = half_life_seconds
+        self.max_entries = max_entries
+        self.save_interval_seconds = save_interval_seconds
+        self._categories = {}       # category_id -> (score, updated_at epoch seconds)
+        self._sites = {}            # site_id -> (score, updated_at epoch seconds)
+        self._pending_categories = {}   # Same, only the accesses since the last save
+        self._pending_sites = {}
+        self._lock = Lock()
+        self._saved_at = time.monotonic()
+        self._saving = False
+        self.logger = logging.getLogger(__name__)
+        self.load()
+
+
+    def _decayed(self, entry, now: float) -> float:
+        score, updated_at = entry
+        return score * math.pow(0.5, (now - updated_at) / self.half_life_seconds)
+
+
+    def _bump(self, counts: dict, key: str, now: float):
+        entry = counts.get(key)
+        counts[key] = ((self._decayed(entry, now) if entry else 0.0) + 1.0, now)
+
+
+    def record(self, category_id: str):
+        now = time.time()
+        with self._lock:
+            for counts in (self._categories, self._pending_categories):
+                self._bump(counts, category_id, now)
+            for counts in (self._sites, self._pending_sites):
+                self._bump(counts, category_id[:3], now)     # MeLi category ids start with the site id
+            if len(self._categories) > self.max_entries * 1.2:
+                self._categories = self._trim(self._categories, now)
+        self.save(force=False)
+
+
+    def _trim(self, counts: dict, now: float) -> dict:
+        """The max_entries hottest of counts (with some slack in record, not trimmed on every access)."""
+        hottest = sorted(counts.items(), key=lambda item: self._decayed(item[1], now), reverse=True)
+        return dict(hottest[:self.max_entries])
+
+
+    def _merge(self, counts: dict, other: dict, now: float) -> dict:
+        """The decayed sum of both, per key."""
+        merged = {key: (self._decayed(entry, now), now) for key, entry in counts.items()}
+        for key, entry in other.items():
+            score = merged[key][0] if key in merged else 0.0
+            merged[key] = (score + self._decayed(entry, now), now)
+        return merged
+
+
+    def hot_categories(self, limit: int = 500, site_id: str | None = None) -> list[str]:
+        """The limit hottest category ids (of site_id only, when given), hottest first."""
+        now = time.time()
+        with self._lock:
+            scores = [(self._decayed(entry, now), category_id) for category_id, entry in self._categories.items()
+                      if site_id is None or category_id.startswith(site_id)]
+        scores.sort(reverse=True)
+        return [category_id for _, category_id in scores[:limit]]
+
+
+    def hot_sites(self) -> dict[str, float]:
+        now = time.time()
+        with self._lock:
+            scores = {site_id: round(self._decayed(entry, now), 3) for site_id, entry in self._sites.items()}
+        return dict(sorted(scores.items(), key=lambda item: item[1], reverse=True))
+
+
+    def save(self, force: bool = True):
+        """
+        Adds the accesses since the last save to the file (see the class docstring). Written to a
+        temporary file and then renamed, a crash never leaves a truncated hot set. Without force,
+        only when save_interval_seconds went by. One save at a time per worker.
+        """
+        with self._lock:
+            due = force or time.monotonic() - self._saved_at > self.save_interval_seconds
+            if self._saving or not due:
+                return
+            self._saving = True
+            self._saved_at = time.monotonic()
+            pending_categories, self._pending_categories = self._pending_categories, {}
+            pending_sites, self._pending_sites = self._pending_sites, {}
+
+        now = time.time()
+        try:
+            with file_lock(self.path):
+                stored_categories, stored_sites = self._read()
+                categories = self._trim(self._merge(stored_categories, pending_categories, now), now)
+                sites = self._merge(stored_sites, pending_sites, now)
+                data = {
+                    "saved_at": datetime.now(timezone.utc).isoformat(),
+                    "half_life_seconds": self.half_life_seconds,
+                    "categories": {category_id: list(entry) for category_id, entry in categories.items()},
+                    "sites": {site_id: list(entry) for site_id, entry in sites.items()},
+                }
+                tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+        except OSError as exc:
+            self.logger.error(f"Couldn't save the hot categories to {self.path}: {exc}")
+            with self._lock:
+                # Not lost, added to the next save
+                self._pending_categories = self._merge(self._pending_categories, pending_categories, now)
+                self._pending_sites = self._merge(self._pending_sites, pending_sites, now)
+                self._saving = False
+            return
+
+        with self._lock:
+            # The hot set of every worker, plus what this one recorded while saving
+            self._categories = self._merge(categories, self._pending_categories, now)
+            self._sites = self._merge(sites, self._pending_sites, now)
+            self._saving = False
+
+
+    def _read(self) -> tuple[dict, dict]:
+        """Categories and sites stored in path, empty when there's no file yet (or it's unreadable)."""
+        if not os.path.exists(self.path):
+            return {}, {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as exc:
+            self.logger.error(f"Couldn't load the hot categories from {self.path}: {exc}")
+            return {}, {}
+        return ({category_id: tuple(entry) for category_id, entry in data.get("categories", {}).items()},
+                {site_id: tuple(entry) for site_id, entry in data.get("sites", {}).items()})
+
+
+    def load(self):
+        categories, sites = self._read()
+        with self._lock:
+            self._categories = categories
+            self._sites = sites
+        if categories:
+            self.logger.info(f"{len(categories)} hot categories loaded from {self.path}.")
+
+
+    def snapshot(self, limit: int = 20) -> dict:
+        now = time.time()
+        with self._lock:
+            tracked = len(self._categories)
+            top = sorted(((round(self._decayed(entry, now), 3), category_id)
+                          for category_id, entry in self._categories.items()), reverse=True)[:limit]
+        return {
+            "tracked_categories": tracked,
+            "half_life_seconds": self.half_life_seconds,
+            "top_categories": {category_id: score for score, category_id in top},
+            "sites": self.hot_sites(),
+        }
@@ -0,0 +1,207 @@
+from collections import OrderedDict
+import logging
+import math
+import re
+import threading
+import time
+
+from fastapi.responses import JSONResponse
+
+
+class TokenBucket:
+    """
+    rate tokens per second, up to burst. Every admitted request takes one, so a client can make
+    burst requests at once and then rate per second.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+
+    def try_take(self, now: float) -> float:
+        """Takes a token and returns 0, or returns the seconds until there will be one."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class PriorityClass:
+    """
+    A class of requests (crawl, interactive, maintenance) and its share of the API:
+        reserved        in-flight requests only this class can use, so the other one can't starve it
+        client_rate     requests per second each client can make (token bucket)
+        client_burst    requests a client can make at once
+    """
+
+    def __init__(self, name: str, reserved: int, client_rate: float, client_burst: float):
+        self.name = name
+        self.reserved = reserved
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+
+
+class AdmissionController:
+    """
+    Decides whether a request runs now or gets a 429 (with Retry-After), before it reaches the
+    routes and turns into MeLi calls, whose quota the crawler needs too.
+
+    - Per client (the peer address, or a header set by a trusted proxy, see
+      AdmissionControlMiddleware): a token bucket per priority class.
+    - Global: at most max_in_flight requests at the same time. Each class has its reserved slots
+      and the rest are shared, first come first served. A burst of interactive requests can take
+      the whole shared part, but never the reserved slots of the crawl (and the other way round).
+
+    Rejecting is cheap and immediate, nothing waits in a queue.
+    """
+
+    def __init__(self, classes: list[PriorityClass], max_in_flight: int = 48, max_clients: int = 10_000):
+        self.classes = {priority_class.name: priority_class for priority_class in classes}
+        self.max_in_flight = max_in_flight
+        self.shared = max_in_flight - sum(priority_class.reserved for priority_class in classes)
+        if self.shared < 0:
+            raise ValueError(f"Reserved slots ({max_in_flight - self.shared}) exceed max_in_flight ({max_in_flight}).")
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()       # (class, client) -> TokenBucket, least recently used first
+        self._in_flight = {name: 0 for name in self.classes}
+        self._rejected = {name: {"client_rate": 0, "saturated": 0} for name in self.classes}
+        self._admitted = {name: 0 for name in self.classes}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+
+    def _shared_in_use(self) -> int:
+        return sum(max(0, self._in_flight[name] - c.reserved) for name, c in self.classes.items())
+
+
+    def _bucket(self, priority_class: PriorityClass, client_id: str) -> TokenBucket:
+        key = (priority_class.name, client_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(priority_class.client_rate, priority_class.client_burst)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)       # The client idle for the longest time
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+
+    def try_acquire(self, class_name: str, client_id: str) -> float:
+        """
+        Admits the request (call release(class_name) when it's done) and returns 0, or returns
+        the seconds the client should wait before retrying.
+        """
+        priority_class = self.classes[class_name]
+        with self._lock:
+            wait = self._bucket(priority_class, client_id).try_take(time.monotonic())
+            if wait:
+                self._rejected[class_name]["client_rate"] += 1
+                return wait
+
+            if self._in_flight[class_name] >= priority_class.reserved and self._shared_in_use() >= self.shared:
+                self._rejected[class_name]["saturated"] += 1
+                return 1.0
+            self._in_flight[class_name] += 1
+            self._admitted[class_name] += 1
+            return 0.0
+
+
+    def release(self, class_name: str):
+        with self._lock:
+            self._in_flight[class_name] -= 1
+
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "shared": self.shared,
+                "shared_in_use": self._shared_in_use(),
+                "clients": len(self._buckets),
+                "classes": {
+                    name: {
+                        "reserved": priority_class.reserved,
+                        "in_flight": self._in_flight[name],
+                        "client_rate": priority_class.client_rate,
+                        "client_burst": priority_class.client_burst,
+                        "admitted": self._admitted[name],
+                        "rejected": dict(self._rejected[name]),
+                    }
+                    for name, priority_class in self.classes.items()
+                },
+            }
+
+
+# Requests that never go through admission control: liveness/readiness, docs and the cheap
+# monitoring endpoints, state kept in memory (they must answer precisely when the service is
+# saturated).
+EXEMPT_PATHS = re.compile(r"^/(health|docs|redoc|openapi\.json)"
+                          r"|^/api/v1/crawler/(concurrency|resilience|leases|memory|admission|hot|schedule"
+                          r"|history/[^/]+)$")
+# The tree build, a long-running crawl of a whole site.
+CRAWL_PATHS = re.compile(r"^/api/v1/[^/]+/categories$")
+# The heavy internals: rebuilding a tree from its history (a base plus up to compact_every
+# deltas per call) and the profiling captures. Everything else is interactive.
+MAINTENANCE_PATHS = re.compile(r"^/api/v1/crawler/")
+
+
+def classify_request(path: str) -> str | None:
+    """Priority class of a request path, None if it's exempt."""
+    if EXEMPT_PATHS.match(path):
+        return None
+    if CRAWL_PATHS.match(path):
+        return "crawl"
+    return "maintenance" if MAINTENANCE_PATHS.match(path) else "interactive"
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware running every request through the AdmissionController. The slot is held
+    until the response is completely sent (not only until the route returns).
+
+    Clients are told apart by their peer address. Headers sent by the client itself (e.g. a
+    client id) are never trusted, rotating them would get a fresh bucket every time. Behind a
+    proxy, client_header names the header the proxy sets with the real client (e.g.
+    X-Forwarded-For, of which only the last entry, the one the proxy added, is used).
+    """
+
+    def __init__(self, app, controller: AdmissionController, client_header: str | None = None):
+        self.app = app
+        self.controller = controller
+        self.client_header = client_header.lower().encode("latin-1") if client_header else None
+
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        class_name = classify_request(scope["path"])
+        if class_name is None:
+            return await self.app(scope, receive, send)
+
+        client_id = self._client_id(scope)
+        wait = self.controller.try_acquire(class_name, client_id)
+        if wait:
+            self.controller.logger.warning(f"Rejected {class_name} request {scope['path']} of {client_id},"
+                                           f" retry in {wait:.1f}s.")
+            response = JSONResponse(status_code=429, headers={"Retry-After": str(math.ceil(wait))},
+                                    content={"detail": f"Too many requests ({class_name}), retry later."})
+            return await response(scope, receive, send)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(class_name)
+
+
+    def _client_id(self, scope) -> str:
+        if self.client_header:
+            for name, value in scope.get("headers", ()):
+                if name == self.client_header:
+                    return value.decode("latin-1").split(",")[-1].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
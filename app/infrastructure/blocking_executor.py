@@ -0,0 +1,64 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+
+class BoundedBlockingExecutor:
+    """
+    Runs blocking calls (requests to MeLi, SQLAlchemy sessions) from async routes without blocking
+    the event loop.
+
+    - Bounded: at most max_workers calls run at the same time, and at most max_pending are
+      accepted (running + waiting). Beyond that the call is rejected right away with a 503
+      (backpressure), instead of piling up.
+    - Timeout: the route gives up after timeout_seconds with a 504. The thread can't be killed, so
+      it still counts as pending until the blocking call really finishes.
+
+    Must only be used from the event loop thread (the pending counter is not locked).
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int, timeout_seconds: float | None):
+        self.name = name
+        self.max_pending = max_pending
+        self.timeout_seconds = timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._pending = 0
+        self.logger = logging.getLogger(__name__)
+
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+
+    async def run(self, func, *args, **kwargs):
+        if self._pending >= self.max_pending:
+            self.logger.warning(f"Executor {self.name} is saturated ({self._pending} pending), rejecting call.")
+            raise HTTPException(status_code=503, detail=f"Service busy ({self.name}), retry later.",
+                                headers={"Retry-After": "1"})
+
+        loop = asyncio.get_running_loop()
+        self._pending += 1
+        future = loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        future.add_done_callback(self._on_done)
+
+        try:
+            # shield: a timeout must not cancel the future, _on_done has to run when it finishes
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            self.logger.error(f"Call to {getattr(func, '__name__', func)} timed out on executor {self.name}.")
+            raise HTTPException(status_code=504, detail=f"Upstream call timed out ({self.name}).")
+
+
+    def _on_done(self, future):
+        self._pending -= 1
+        if not future.cancelled():
+            # Retrieved here so asyncio doesn't warn about it when the route already timed out
+            future.exception()
+
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,98 @@
+from sqlalchemy import select, delete, update, insert, and_, or_, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+# Bulk write primitives shared by the repositories (sites, access token, categories), instead of
+# deleting every row and inserting them again: rows that didn't change are not written at all,
+# and readers never see an empty table. They don't commit, the caller's session does, so several
+# of them run in the same (short) transaction.
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def upsert_rows(session, model, rows: list[dict], key_columns: list[str], compare_columns: list[str],
+                touch_columns: list[str] = (), chunk_size: int = 500) -> int:
+    """
+    Inserts the new rows and updates the existing ones (matched by key_columns, which need a
+    unique constraint) only when one of compare_columns changed. touch_columns (e.g. updated_at)
+    are written along with a change, but don't count as one.
+
+    PostgreSQL and SQLite: INSERT ... ON CONFLICT (keys) DO UPDATE ... WHERE <something changed>,
+    one statement per chunk_size rows. Other databases: compared in Python (see _upsert_rows_generic).
+
+    Returns the amount of rows written (inserted or changed).
+    """
+    if not rows:
+        return 0
+
+    dialect = session.get_bind().dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        return _upsert_rows_generic(session, model, rows, key_columns, compare_columns, touch_columns)
+
+    dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    written = 0
+    for chunk in _chunks(rows, chunk_size):
+        statement = dialect_insert(model).values(chunk)
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=[getattr(model, column) for column in key_columns],
+            set_={column: excluded[column] for column in (*compare_columns, *touch_columns)},
+            where=or_(*(getattr(model, column).is_distinct_from(excluded[column]) for column in compare_columns)),
+        )
+        written += session.execute(statement).rowcount
+    return written
+
+
+def _upsert_rows_generic(session, model, rows, key_columns, compare_columns, touch_columns) -> int:
+    """Same as upsert_rows, for databases without ON CONFLICT: reads the existing rows and compares them."""
+    key_attributes = [getattr(model, column) for column in key_columns]
+    compare_attributes = [getattr(model, column) for column in compare_columns]
+    existing = {}
+    for chunk in _chunks(rows, 500):
+        keys = [tuple(row[column] for column in key_columns) for row in chunk]
+        for found in session.execute(select(*key_attributes, *compare_attributes)
+                                     .where(_keys_in(key_attributes, keys))).all():
+            existing[tuple(found[:len(key_columns)])] = tuple(found[len(key_columns):])
+
+    new_rows, changed_rows = [], []
+    for row in rows:
+        key = tuple(row[column] for column in key_columns)
+        if key not in existing:
+            new_rows.append(row)
+        elif existing[key] != tuple(row[column] for column in compare_columns):
+            changed_rows.append(row)
+
+    if new_rows:
+        session.execute(insert(model), new_rows)
+    for row in changed_rows:
+        session.execute(
+            update(model)
+            .where(and_(*(attribute == row[column] for attribute, column in zip(key_attributes, key_columns))))
+            .values({column: row[column] for column in (*compare_columns, *touch_columns)})
+            .execution_options(synchronize_session=False)
+        )
+    return len(new_rows) + len(changed_rows)
+
+
+def _keys_in(key_attributes, keys: list[tuple]):
+    if len(key_attributes) == 1:
+        return key_attributes[0].in_([key[0] for key in keys])
+    return tuple_(*key_attributes).in_(keys)
+
+
+def delete_missing(session, model, key_columns: list[str], keep_keys: set[tuple], *where,
+                   chunk_size: int = 500) -> int:
+    """
+    Deletes the rows (filtered by where) whose key is not in keep_keys, e.g. the categories that
+    MeLi removed since the last persist. Returns the amount of rows deleted.
+    """
+    key_attributes = [getattr(model, column) for column in key_columns]
+    stale = [tuple(row) for row in session.execute(select(*key_attributes).where(*where)).all()
+             if tuple(row) not in keep_keys]
+
+    for chunk in _chunks(stale, chunk_size):
+        session.execute(delete(model).where(_keys_in(key_attributes, chunk), *where)
+                        .execution_options(synchronize_session=False))
+    return len(stale)
@@ -0,0 +1,142 @@
+import importlib.util
+import os
+
+
+# Columnar export of the flat category index (Parquet or Arrow), for the analytics loading the
+# trees into pandas, and for warm-starting the service without parsing the JSON dumps.
+#
+# pyarrow is in requirements.txt but still optional: it's only imported when exporting or loading,
+# and only needed if those are used (pip install pyarrow).
+#
+# One row per category. The repetitive strings (site, parent, names, path) are dictionary
+# encoded, so pandas loads them as categoricals instead of millions of separate strings:
+#     pandas.read_parquet("app/tree/meli_category_index_MLA.parquet")
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrows"}     # Arrow IPC stream, see write_category_index
+
+
+def pyarrow_available() -> bool:
+    """Whether pyarrow is installed (without importing it), to check the configuration early."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as exc:
+        raise RuntimeError("The columnar export needs pyarrow (pip install pyarrow).") from exc
+    return pyarrow
+
+
+def _schema(pa):
+    dictionary_string = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("id", pa.string()),
+        ("parent_id", dictionary_string),
+        ("site_id", dictionary_string),
+        ("depth", pa.int16()),
+        ("name", dictionary_string),
+        ("url", pa.string()),
+        ("permalink", pa.string()),
+        ("total_items_in_this_category", pa.int64()),
+        ("fragile", pa.bool_()),
+        ("path_ids", pa.list_(dictionary_string)),
+        ("path_names", pa.list_(dictionary_string)),
+        ("children_ids", pa.list_(pa.string())),
+    ])
+
+
+def _row(entry: dict) -> dict:
+    path_from_root = entry.get("path_from_root") or [{"id": entry["id"], "name": entry.get("name")}]
+    return {
+        "id": entry["id"],
+        "parent_id": path_from_root[-2]["id"] if len(path_from_root) > 1 else None,
+        "site_id": entry.get("site_id"),
+        "depth": len(path_from_root) - 1,
+        "name": entry.get("name"),
+        "url": entry.get("url"),
+        "permalink": entry.get("permalink"),
+        "total_items_in_this_category": entry.get("total_items_in_this_category"),
+        "fragile": bool(entry.get("fragile")),
+        "path_ids": [node["id"] for node in path_from_root],
+        "path_names": [node.get("name") for node in path_from_root],
+        "children_ids": list(entry.get("children_ids") or []),
+    }
+
+
+def _to_pylist(pa, column) -> list:
+    # Dictionary columns are decoded by arrow first, to_pylist() on them is ~10 times slower
+    if pa.types.is_dictionary(column.type):
+        column = column.cast(column.type.value_type)
+    elif pa.types.is_list(column.type) and pa.types.is_dictionary(column.type.value_type):
+        column = column.cast(pa.list_(column.type.value_type.value_type))
+    return column.to_pylist()
+
+
+def _entries(pa, batch) -> list[dict]:
+    """Back to index entries (as built by flatten_category), converting the batch column by column."""
+    columns = {name: _to_pylist(pa, batch.column(name)) for name in batch.schema.names}
+    return [
+        {
+            "id": category_id,
+            "name": name,
+            "site_id": site_id,
+            "permalink": permalink,
+            "url": url,
+            "total_items_in_this_category": total_items,
+            "fragile": fragile,
+            "path_from_root": [{"id": node_id, "name": node_name} for node_id, node_name in zip(path_ids, path_names)],
+            "children": {},
+            "children_ids": children_ids,
+        }
+        for category_id, name, site_id, permalink, url, total_items, fragile, path_ids, path_names, children_ids in zip(
+            columns["id"], columns["name"], columns["site_id"], columns["permalink"], columns["url"],
+            columns["total_items_in_this_category"], columns["fragile"], columns["path_ids"],
+            columns["path_names"], columns["children_ids"])
+    ]
+
+
+def write_category_index(path: str, category_index: dict[str, dict], file_format: str = "parquet",
+                         row_group_size: int = 50_000):
+    """
+    Writes the index streamed in row groups of row_group_size categories, so only one group is
+    converted at a time. Parquet (compressed, for analytics) or Arrow IPC stream (uncompressed,
+    the fastest to load). The stream format and not the IPC file one: the file format doesn't
+    allow a different dictionary per batch.
+    Written to a temporary file and then renamed.
+    """
+    pa = _pyarrow()
+    schema = _schema(pa)
+    tmp_path = f"{path}.tmp"
+
+    if file_format == "parquet":
+        writer = pa.parquet.ParquetWriter(tmp_path, schema, compression="zstd")
+    elif file_format == "arrow":
+        writer = pa.ipc.new_stream(tmp_path, schema)
+    else:
+        raise ValueError(f"Unknown columnar format {file_format}, expected one of {list(FORMATS)}.")
+
+    with writer:
+        entries = list(category_index.values())
+        for start in range(0, len(entries), row_group_size):
+            rows = [_row(entry) for entry in entries[start:start + row_group_size]]
+            writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+    os.replace(tmp_path, path)
+
+
+def read_category_index(path: str) -> dict[str, dict]:
+    """Rebuilds the in-memory index (category_id -> entry) from a file of write_category_index."""
+    pa = _pyarrow()
+    if path.endswith(FORMATS["arrow"]):
+        batches = pa.ipc.open_stream(path)
+    else:
+        parquet_file = pa.parquet.ParquetFile(path)
+        batches = (parquet_file.read_row_group(i) for i in range(parquet_file.num_row_groups))
+
+    category_index = {}
+    for batch in batches:
+        for entry in _entries(pa, batch):
+            category_index[entry["id"]] = entry
+    return category_index
@@ -0,0 +1,81 @@
+from threading import Lock
+import logging
+import time
+
+from app.infrastructure.string_pool import StringPool, InternedCategoryIndex, deep_sizeof
+
+
+class CategoryIndexRegistry:
+    """
+    The category indexes of every site kept in memory by this process, interned in one
+    StringPool shared by all of them (see string_pool.py): a name like "Accesorios" or a prefix
+    like https://listado.mercadolibre.com.ar/ is stored once, not once per category and site.
+
+    memory_report() tells, per site, how much the plain index would take (measured when it was
+    loaded) against the interned one.
+    """
+
+    def __init__(self):
+        self.pool = StringPool()
+        self.logger = logging.getLogger(__name__)
+        self._lock = Lock()
+        self._indexes = {}      # site_id -> InternedCategoryIndex
+        self._raw_bytes = {}    # site_id -> memory of the plain index it was loaded from
+
+
+    def load(self, site_id: str, category_index: dict[str, dict]) -> InternedCategoryIndex:
+        """Interns category_index and replaces the one of site_id (the plain one can be dropped)."""
+        start = time.perf_counter()
+        interned = InternedCategoryIndex(site_id, self.pool)
+        for entry in category_index.values():
+            interned.add(entry)
+        raw_bytes = deep_sizeof(category_index)
+
+        with self._lock:
+            self._indexes[site_id] = interned
+            self._raw_bytes[site_id] = raw_bytes
+        self.logger.info(f"Index of {site_id} ({len(interned)} categories) interned in"
+                         f" {(time.perf_counter() - start):.4f} seconds.")
+        return interned
+
+
+    def get(self, site_id: str) -> InternedCategoryIndex | None:
+        return self._indexes.get(site_id)
+
+
+    def get_category(self, category_id: str) -> dict | None:
+        index = self._indexes.get(category_id[:3])     # MeLi category ids start with the site id
+        return index.get(category_id) if index else None
+
+
+    def memory_report(self) -> dict:
+        """
+        Per site: categories, bytes of the plain index, bytes of the interned records (without
+        the pool) and the ratio. The pool is reported once, it's shared by all the sites.
+        Walks every object, so it takes a while for big trees (it's not meant for every request).
+        """
+        with self._lock:
+            indexes = dict(self._indexes)
+            raw = dict(self._raw_bytes)
+
+        pool_ids = {id(s) for s in self.pool.strings()}
+        sites = {}
+        for site_id, index in sorted(indexes.items()):
+            interned_bytes = index.sizeof(pool_ids)
+            sites[site_id] = {
+                "categories": len(index),
+                "raw_bytes": raw[site_id],
+                "interned_bytes": interned_bytes,
+                "ratio": round(interned_bytes / raw[site_id], 3) if raw[site_id] else None,
+            }
+
+        pool = self.pool.stats()
+        total_raw = sum(site["raw_bytes"] for site in sites.values())
+        total_interned = sum(site["interned_bytes"] for site in sites.values()) + pool["bytes"]
+        return {
+            "sites": sites,
+            "pool": pool,
+            "total_raw_bytes": total_raw,
+            "total_interned_bytes": total_interned,
+            "saved_bytes": total_raw - total_interned,
+        }
@@ -0,0 +1,48 @@
+from collections import OrderedDict
+from threading import Lock
+import time
+
+
+class CategoryNodeCache:
+    """
+    In-memory cache of category nodes (as built by build_category_node, children not included),
+    with a TTL per node and a maximum amount of nodes (least recently used ones are evicted).
+
+    Used by the on-demand subtree mode, so requests for overlapping branches reuse the nodes
+    already fetched from MeLi.
+    """
+
+    def __init__(self, ttl_seconds: float = 6 * 3600, max_nodes: int = 200_000):
+        self.ttl_seconds = ttl_seconds
+        self.max_nodes = max_nodes
+        self._nodes = OrderedDict()     # category_id -> (expires_at, node)
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+
+    def get(self, category_id: str) -> dict | None:
+        with self._lock:
+            entry = self._nodes.get(category_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._nodes[category_id]
+                self.misses += 1
+                return None
+            self._nodes.move_to_end(category_id)
+            self.hits += 1
+            return entry[1]
+
+
+    def put(self, category_id: str, node: dict, ttl_seconds: float | None = None):
+        expires_at = time.monotonic() + (ttl_seconds or self.ttl_seconds)
+        with self._lock:
+            self._nodes[category_id] = (expires_at, node)
+            self._nodes.move_to_end(category_id)
+            while len(self._nodes) > self.max_nodes:
+                self._nodes.popitem(last=False)
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"nodes": len(self._nodes), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,216 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+
+# Snapshot file layout (little-endian):
+#   MAGIC
+#   records          the index entries as UTF-8 JSON, one after the other
+#   directory        one entry per category, sorted by id: id (UTF-8, up to 32 bytes, padded), offset, length
+#   footer           directory offset, count, MAGIC
+MAGIC = b"MELISNP1"
+DIRECTORY_ENTRY = struct.Struct("<32sQI")
+MAX_ID_BYTES = 32
+FOOTER = struct.Struct("<QI8s")
+
+
+def write_category_snapshot(path: str, category_index: dict[str, dict]):
+    """
+    Writes the flat index of a site as a snapshot file (see CategorySnapshot). Raises ValueError
+    for an id longer than MAX_ID_BYTES (MeLi ids are far shorter): struct would truncate it
+    silently, and then it could never be found, or be found as another id.
+    """
+    too_long = [category_id for category_id in category_index if len(category_id.encode("utf-8")) > MAX_ID_BYTES]
+    if too_long:
+        raise ValueError(f"Category ids longer than {MAX_ID_BYTES} bytes can't be stored in a snapshot: {too_long[:5]}")
+
+    tmp_path = f"{path}.tmp"
+    directory = []
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        for category_id in sorted(category_index):
+            record = json.dumps(category_index[category_id], ensure_ascii=False, default=str).encode("utf-8")
+            directory.append((category_id.encode("utf-8"), f.tell(), len(record)))
+            f.write(record)
+
+        directory_offset = f.tell()
+        for key, offset, length in directory:
+            f.write(DIRECTORY_ENTRY.pack(key, offset, length))
+        f.write(FOOTER.pack(directory_offset, len(directory), MAGIC))
+    os.replace(tmp_path, path)
+
+
+class CategorySnapshot:
+    """
+    Read-only view of a snapshot file through mmap. Looking up a category is a binary search over
+    the directory and parsing only its record, nothing is loaded up front. Every worker maps the
+    same file, so the OS page cache holds a single copy of it no matter how many workers there are.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        directory_offset, count, magic = FOOTER.unpack_from(self._mm, len(self._mm) - FOOTER.size)
+        if magic != MAGIC or self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a category snapshot.")
+        self._directory_offset = directory_offset
+        self._count = count
+
+
+    def __len__(self):
+        return self._count
+
+
+    def _entry(self, position: int) -> tuple[bytes, int, int]:
+        key, offset, length = DIRECTORY_ENTRY.unpack_from(
+            self._mm, self._directory_offset + position * DIRECTORY_ENTRY.size)
+        return key.rstrip(b"\0"), offset, length
+
+
+    def get(self, category_id: str) -> dict | None:
+        key = category_id.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            middle_key, offset, length = self._entry(middle)
+            if middle_key == key:
+                return json.loads(self._mm[offset:offset + length])
+            if middle_key < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+
+    def close(self):
+        self._mm.close()
+
+
+class CategorySnapshotStore:
+    """
+    Snapshots of the category index of each site, published by the worker that built the tree and
+    read by all of them (the read path shared between workers).
+
+    Every publish writes a new generation ({site_id}_{timestamp}.snap) and then points
+    {site_id}.current to it, instead of replacing the file in place: a mapped file can't be
+    replaced on Windows, and readers still using the previous generation keep working.
+    Readers check the pointer at most every check_interval seconds.
+
+    A build still running may publish what it has so far with partial=True: those generations go
+    behind their own pointer ({site_id}.partial) and are only read for the categories the current
+    generation doesn't have, so a truncated index never replaces a complete one. The next complete
+    publish (or discard_partial, when the build fails) removes them.
+
+    Layout (snapshot_dir):
+        {site_id}.current           name of the current generation
+        {site_id}.partial           name of the partial generation of the build running, if any
+        {site_id}_{timestamp}.snap
+        {site_id}_partial_{timestamp}.snap
+    """
+
+    def __init__(self, snapshot_dir: str = os.path.join("app", "cache", "snapshots"),
+                 check_interval: float = 2.0, keep_generations: int = 2):
+        self.snapshot_dir = snapshot_dir
+        self.check_interval = check_interval
+        self.keep_generations = keep_generations
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._snapshots = {}    # (site_id, pointer) -> (generation, CategorySnapshot | None, checked_at)
+        # snapshot_dir is created by the first publish, a worker that only reads never creates it
+
+
+    def _pointer_path(self, site_id: str, pointer: str = "current") -> str:
+        return os.path.join(self.snapshot_dir, f"{site_id}.{pointer}")
+
+
+    def site_ids(self) -> list[str]:
+        """Sites with a current snapshot."""
+        if not os.path.isdir(self.snapshot_dir):
+            return []
+        return sorted(name[:-len(".current")] for name in os.listdir(self.snapshot_dir) if name.endswith(".current"))
+
+
+    def publish(self, site_id: str, category_index: dict[str, dict], partial: bool = False) -> str:
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        pointer = "partial" if partial else "current"
+        generation = f"{site_id}_partial_{time.time_ns()}.snap" if partial else f"{site_id}_{time.time_ns()}.snap"
+        write_category_snapshot(os.path.join(self.snapshot_dir, generation), category_index)
+
+        pointer_path = self._pointer_path(site_id, pointer)
+        with open(f"{pointer_path}.tmp", "w", encoding="utf-8") as f:
+            f.write(generation)
+        os.replace(f"{pointer_path}.tmp", pointer_path)
+        self.logger.info(f"Snapshot {generation} published ({len(category_index)} categories).")
+
+        if partial:
+            self._remove_old_generations(site_id, partial=True, keep=1)
+        else:
+            self.discard_partial(site_id)
+            self._remove_old_generations(site_id)
+        return generation
+
+
+    def discard_partial(self, site_id: str):
+        """Removes the partial generations of site_id (its build finished, or failed)."""
+        try:
+            os.remove(self._pointer_path(site_id, "partial"))
+        except FileNotFoundError:
+            pass
+        self._remove_old_generations(site_id, partial=True, keep=0)
+
+
+    def _remove_old_generations(self, site_id: str, partial: bool = False, keep: int | None = None):
+        keep = self.keep_generations if keep is None else keep
+        if not os.path.isdir(self.snapshot_dir):
+            return
+        prefix = f"{site_id}_partial_"
+        generations = sorted(name for name in os.listdir(self.snapshot_dir)
+                             if name.startswith(f"{site_id}_") and name.endswith(".snap")
+                             and name.startswith(prefix) == partial)
+        for name in generations[:len(generations) - keep]:
+            try:
+                os.remove(os.path.join(self.snapshot_dir, name))
+            except OSError:
+                pass    # Still mapped by some worker (Windows), removed by a later publish
+
+
+    def get(self, site_id: str, pointer: str = "current") -> CategorySnapshot | None:
+        """The current snapshot of site_id (the partial one with pointer="partial"), None if none was published."""
+        with self._lock:
+            generation, snapshot, checked_at = self._snapshots.get((site_id, pointer), (None, None, 0.0))
+            if time.monotonic() - checked_at < self.check_interval:
+                return snapshot
+
+            try:
+                with open(self._pointer_path(site_id, pointer), "r", encoding="utf-8") as f:
+                    current = f.read().strip()
+            except FileNotFoundError:
+                current = None
+
+            if current != generation:
+                # The previous generation isn't closed: a thread may be reading it right now, the
+                # mapping goes away when it's garbage collected.
+                try:
+                    snapshot = CategorySnapshot(os.path.join(self.snapshot_dir, current)) if current else None
+                except (OSError, ValueError) as exc:
+                    self.logger.error(f"Snapshot {current} couldn't be opened: {exc}")
+                    snapshot, current = None, None
+            self._snapshots[(site_id, pointer)] = (current, snapshot, time.monotonic())
+            return snapshot
+
+
+    def get_category(self, category_id: str) -> dict | None:
+        site_id = category_id[:3]    # MeLi category ids start with the site id
+        for pointer in ("current", "partial"):
+            snapshot = self.get(site_id, pointer)
+            node = snapshot.get(category_id) if snapshot else None
+            if node is not None:
+                return node
+        return None
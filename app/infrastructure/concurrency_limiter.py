@@ -0,0 +1,175 @@
+import math
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+
+
+# A class of callers of the limiter: reserved is the share of the limit kept for it (the others
+# can't take it, even when it's idle), max_share the most of the limit it may use at once.
+LimiterPriority = namedtuple("LimiterPriority", ["name", "reserved", "max_share"])
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Adaptive limit for the in-flight requests to MeLi (gradient/Vegas style), instead of a
+    hard-coded amount of workers.
+
+    - While the latency stays close to the best latency observed (no queuing on MeLi side) and no
+      429 comes back, the limit grows a bit on every request.
+    - When the latency grows, the limit shrinks proportionally (gradient = best / current).
+    - A 429 (or a network error) cuts the limit right away (multiplicative decrease).
+
+    Every thread calls acquire() before the request and release() after it. The thread pools can
+    then have max_limit threads, and the limiter decides how many of them are really calling MeLi.
+
+    Callers acquire with a priority (see LimiterPriority), e.g. crawl, interactive and prefetch:
+    the unused reserved share of the other priorities is never given away, so a big crawl can't
+    starve the interactive calls and the other way around, and low priority callers (max_share < 1)
+    only get a slot while the requests in flight leave the rest of the limit free. Callers without
+    a priority only get what no priority has reserved.
+    """
+
+    def __init__(self, initial_limit: int = 20, min_limit: int = 2, max_limit: int = 64,
+                 smoothing: float = 0.2, tolerance: float = 1.5, backoff_ratio: float = 0.5,
+                 baseline_window_seconds: float = 600, history_size: int = 1000,
+                 priorities: list[LimiterPriority] | None = None):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.smoothing = smoothing              # how fast the limit follows the estimated one
+        self.tolerance = tolerance              # latency up to tolerance * best is considered flat
+        self.backoff_ratio = backoff_ratio      # limit multiplier on 429
+        self.baseline_window_seconds = baseline_window_seconds  # best latency is forgotten after this
+
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._best_latency = None
+        self._best_latency_at = 0.0
+        self._smoothed_latency = None
+        self._condition = threading.Condition()
+        self.priorities = {priority.name: priority for priority in priorities or []}
+        self._in_flight_by_priority = {name: 0 for name in self.priorities}
+
+        # (timestamp, limit, reason), only when the integer limit changes
+        self.history = deque(maxlen=history_size)
+        self._record(int(self._limit), "initial")
+
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+
+    def _has_room(self, priority: str | None) -> bool:
+        """Called with the lock held."""
+        limit = int(self._limit)
+        if self._in_flight >= limit:
+            return False
+        own = self.priorities.get(priority)
+        if own is not None and self._in_flight_by_priority[priority] < int(limit * own.reserved):
+            return True     # Within its own reserved share
+        if own is not None and self._in_flight >= max(1, int(limit * own.max_share)):
+            return False
+        # Slots reserved by the other priorities and not in use right now
+        held_for_others = sum(max(0, int(limit * other.reserved) - self._in_flight_by_priority[name])
+                              for name, other in self.priorities.items() if name != priority)
+        return self._in_flight + held_for_others < limit
+
+
+    def acquire(self, timeout: float | None = None, priority: str | None = None) -> bool:
+        """
+        Blocks until there's room for priority under the current limit (checked and taken under
+        the same lock). Returns False on timeout.
+        """
+        with self._condition:
+            acquired = self._condition.wait_for(lambda: self._has_room(priority), timeout)
+            if acquired:
+                self._in_flight += 1
+                if priority in self._in_flight_by_priority:
+                    self._in_flight_by_priority[priority] += 1
+            return acquired
+
+
+    def release(self, latency: float | None = None, throttled: bool = False, priority: str | None = None):
+        """
+        Must be called once per acquire(), with the same priority.
+
+        :param latency: seconds the request took, None if it failed without a response
+        :param throttled: True for a 429 (or any error that means "slow down")
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if priority in self._in_flight_by_priority:
+                self._in_flight_by_priority[priority] -= 1
+
+            if throttled or latency is None:
+                self._update_limit(max(self.min_limit, self._limit * self.backoff_ratio),
+                                   "throttled" if throttled else "error")
+            else:
+                self._on_sample(latency)
+
+            self._condition.notify_all()
+
+
+    def set_max_limit(self, max_limit: int):
+        """Lowers (or raises) the ceiling, e.g. for a process that gets only part of the MeLi quota."""
+        with self._condition:
+            self.max_limit = max(self.min_limit, max_limit)
+            if self._limit > self.max_limit:
+                self._update_limit(float(self.max_limit), "max_limit")
+
+
+    def _on_sample(self, latency: float):
+        now = time.monotonic()
+        if (self._best_latency is None or latency < self._best_latency
+                or now - self._best_latency_at > self.baseline_window_seconds):
+            self._best_latency = latency
+            self._best_latency_at = now
+
+        if self._smoothed_latency is None:
+            self._smoothed_latency = latency
+        else:
+            self._smoothed_latency = self._smoothed_latency * 0.9 + latency * 0.1
+
+        # 1.0 while latency is flat, down to 0.5 when it's growing (requests are queuing)
+        gradient = max(0.5, min(1.0, self.tolerance * self._best_latency / self._smoothed_latency))
+        # Room to grow, proportional to sqrt(limit) (Netflix's gradient2 uses the same)
+        headroom = math.sqrt(self._limit) if gradient >= 1.0 else 0.0
+        estimated = self._limit * gradient + headroom
+        new_limit = self._limit * (1 - self.smoothing) + estimated * self.smoothing
+        self._update_limit(min(self.max_limit, max(self.min_limit, new_limit)),
+                           "grow" if new_limit >= self._limit else "latency")
+
+
+    def _update_limit(self, new_limit: float, reason: str):
+        previous = int(self._limit)
+        self._limit = new_limit
+        if int(new_limit) != previous:
+            self._record(int(new_limit), reason)
+
+
+    def _record(self, limit: int, reason: str):
+        self.history.append((datetime.now(timezone.utc).isoformat(), limit, reason))
+
+
+    def snapshot(self) -> dict:
+        """Current state and the limit over time, for monitoring."""
+        with self._condition:
+            return {
+                "limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "in_flight_by_priority": dict(self._in_flight_by_priority),
+                "reserved": {name: int(self._limit * priority.reserved) for name, priority in self.priorities.items()},
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "best_latency": self._best_latency,
+                "smoothed_latency": self._smoothed_latency,
+                "history": [
+                    {"at": at, "limit": limit, "reason": reason} for at, limit, reason in self.history
+                ],
+            }
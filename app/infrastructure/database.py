@@ -1,3 +1,4 @@
+from threading import Lock
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
@@ -5,11 +6,37 @@ from app.config.env import Settings
 
 Settings.load()
 DB_URL = Settings.DB_URL
-engine = create_engine(DB_URL, echo=True, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, future=True)
+
+# The engines are created on first use (not at import time), so importing the app doesn't load
+# the database driver. Sessions are bound to them when created.
+_engine = None
+_read_engine = None
+_engine_lock = Lock()
+SessionLocal = sessionmaker(autoflush=False, future=True)
+ReadSessionLocal = sessionmaker(autoflush=False, future=True)
 
 # This is THE Base for the whole app
 Base = declarative_base()
 
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine(DB_URL, echo=Settings.DB_ECHO, future=True)
+    return _engine
+
+def get_read_engine():
+    """Read replica for the read-only queries (falls back to the primary when not configured)."""
+    global _read_engine
+    if not Settings.DB_READ_URL:
+        return get_engine()
+    with _engine_lock:
+        if _read_engine is None:
+            _read_engine = create_engine(Settings.DB_READ_URL, echo=Settings.DB_ECHO, future=True)
+    return _read_engine
+
 def get_session():
-    return SessionLocal()
+    return SessionLocal(bind=get_engine())
+
+def get_read_session():
+    return ReadSessionLocal(bind=get_read_engine())
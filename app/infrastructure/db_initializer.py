@@ -1,4 +1,4 @@
-from app.infrastructure.database import engine, Base # imports all models via __init__.py
+from app.infrastructure.database import get_engine, Base # imports all models via __init__.py
 from app.infrastructure import models # # This runs __init__.py, importing all models
 
 def initialize_database():
@@ -6,4 +6,4 @@ def initialize_database():
     Ensure all tables exist at app startup.
     Safe to call multiple times.
     """
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=get_engine())
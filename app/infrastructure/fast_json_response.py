@@ -0,0 +1,36 @@
+from datetime import date, datetime
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:     # Optional (pip install orjson), falls back to the standard json module
+    orjson = None
+
+
+# FastAPI encodes what a route returns with jsonable_encoder (walks every value of the payload
+# in Python) and then json.dumps. For a whole category tree that's most of the response time.
+#
+# FastJSONResponse encodes the content in one call, straight to bytes: orjson when installed
+# (datetimes included, ~10 times faster than json), json.dumps otherwise. The content must be
+# made of dicts, lists, strings, numbers, bools, None and datetimes (what the services return).
+# See tools/benchmarks/response_encoding_benchmark.py
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """The app's default response class. Return one directly to skip jsonable_encoder."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,254 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from app.infrastructure.file_lock import file_lock
+
+
+class HtmlPageCache:
+    """
+    On-disk cache of the listing pages scraped by the URL resolution, and of the anchors extracted
+    from them (category id -> URL).
+
+    - Content-addressed: pages are stored (gzip) by the sha256 of their content, the manifest maps
+      each URL to its current content hash. Two URLs with the same content share the blob.
+    - Anchor index per content hash: when a page is downloaded again after its TTL and didn't
+      change, the anchors are already there and the page is not parsed again.
+    - TTL per URL and size-bounded: when the blobs exceed max_bytes, the least recently used URLs
+      are dropped and their blobs deleted (if no other URL uses them). Same when the page of a URL
+      changes: the blobs of its previous content go away once no URL points to them.
+
+    Every worker has its own copy of the manifest and they all save to the same file: a save
+    re-reads it under a lock between processes and merges in the URLs this worker wrote or read
+    since the previous save, evicts over the size bound and only then deletes the blobs no URL of
+    the merged manifest points to anymore, so a worker never drops the entries of another one nor
+    deletes the blobs it uses.
+
+    Layout (cache_dir):
+        manifest.json               {url: {"hash", "fetched_at", "last_access"}}
+        pages/{hash}.html.gz
+        anchors/{hash}.json
+    """
+
+    def __init__(self, cache_dir: str = os.path.join("app", "cache", "html"),
+                 ttl_seconds: float = 7 * 24 * 3600, max_bytes: int = 512 * 1024 * 1024,
+                 autosave_every: int = 100):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.autosave_every = autosave_every     # manifest saved every N writes (and on flush)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._dirty_writes = 0
+        self._written = set()       # URLs put since the last save
+        self._accessed = set()      # URLs read since the last save
+        self._released = set()      # Hashes that lost their last URL since the last save
+
+        os.makedirs(os.path.join(cache_dir, "pages"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "anchors"), exist_ok=True)
+        self._manifest_path = os.path.join(cache_dir, "manifest.json")
+        self._manifest = self._load_manifest()
+        self._refcounts = self._count_references(self._manifest)   # content hash -> URLs pointing to it
+
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as exc:
+            self.logger.error(f"HTML cache manifest unreadable, starting empty: {exc}")
+            return {}
+
+
+    @staticmethod
+    def _count_references(manifest: dict) -> dict:
+        refcounts = {}
+        for entry in manifest.values():
+            refcounts[entry["hash"]] = refcounts.get(entry["hash"], 0) + 1
+        return refcounts
+
+
+    def _page_path(self, content_hash):
+        return os.path.join(self.cache_dir, "pages", f"{content_hash}.html.gz")
+
+
+    def _anchors_path(self, content_hash):
+        return os.path.join(self.cache_dir, "anchors", f"{content_hash}.json")
+
+
+    def _fresh_entry(self, url) -> dict | None:
+        entry = self._manifest.get(url)
+        if entry is None or time.time() - entry["fetched_at"] > self.ttl_seconds:
+            return None
+        entry["last_access"] = time.time()
+        self._accessed.add(url)
+        return entry
+
+
+    def get_page(self, url: str) -> str | None:
+        """The cached HTML of url, None if not cached or older than the TTL."""
+        with self._lock:
+            entry = self._fresh_entry(url)
+        if entry is None:
+            return None
+        try:
+            with gzip.open(self._page_path(entry["hash"]), "rt", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+    def put_page(self, url: str, html: str) -> str:
+        """Stores the page and returns its content hash."""
+        content_hash = hashlib.sha256(html.encode("utf-8")).hexdigest()
+        with self._lock:
+            now = time.time()
+            previous = self._manifest.get(url)
+            self._manifest[url] = {"hash": content_hash, "fetched_at": now, "last_access": now}
+            self._written.add(url)
+            # The new hash is referenced before the old one is released, so a page that went back
+            # and forth is never deleted under another writer
+            if previous is None or previous["hash"] != content_hash:
+                self._refcounts[content_hash] = self._refcounts.get(content_hash, 0) + 1
+                if previous is not None:
+                    self._release(previous["hash"])
+            self._after_write()
+
+        page_path = self._page_path(content_hash)
+        if not os.path.exists(page_path):
+            tmp_path = f"{page_path}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                f.write(html)
+            os.replace(tmp_path, page_path)
+        return content_hash
+
+
+    def get_anchors(self, url: str) -> dict[str, str] | None:
+        """The anchors extracted from the cached page of url, None if not available or expired."""
+        with self._lock:
+            entry = self._fresh_entry(url)
+        if entry is None:
+            return None
+        return self.get_anchors_by_hash(entry["hash"])
+
+
+    def get_anchors_by_hash(self, content_hash: str) -> dict[str, str] | None:
+        try:
+            with open(self._anchors_path(content_hash), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+    def put_anchors(self, content_hash: str, anchors: dict[str, str]):
+        anchors_path = self._anchors_path(content_hash)
+        tmp_path = f"{anchors_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(anchors, f, ensure_ascii=False)
+        os.replace(tmp_path, anchors_path)
+
+
+    def _after_write(self):
+        """Called with the lock held."""
+        self._dirty_writes += 1
+        if self._dirty_writes >= self.autosave_every:
+            self._save_manifest()
+
+
+    def flush(self):
+        """Saves the manifest (merged with the other workers' and evicted over the size bound)."""
+        with self._lock:
+            self._save_manifest()
+
+
+    def _release(self, content_hash) -> bool:
+        """
+        One URL less points to content_hash, its blobs go away with the last one (on the next
+        save, other workers may still use them). Called with the lock held.
+        """
+        self._refcounts[content_hash] -= 1
+        if self._refcounts[content_hash] > 0:
+            return False
+        del self._refcounts[content_hash]
+        self._released.add(content_hash)
+        return True
+
+
+    def _merge_manifest(self, stored: dict) -> dict:
+        """
+        The manifest on disk plus what this worker did since the last save: the URLs it put (the
+        newest fetch wins) and the last access of the ones it read. The rest comes from disk, an
+        entry another worker evicted is not brought back.
+        """
+        merged = dict(stored)
+        for url in self._written:
+            entry = self._manifest.get(url)
+            if entry is not None and (url not in merged or entry["fetched_at"] >= merged[url]["fetched_at"]):
+                merged[url] = entry
+        for url in self._accessed - self._written:
+            if url in merged and url in self._manifest:
+                merged[url]["last_access"] = max(merged[url]["last_access"], self._manifest[url]["last_access"])
+        return merged
+
+
+    def _delete_released(self):
+        for content_hash in self._released:
+            if content_hash in self._refcounts:
+                continue
+            for path in (self._page_path(content_hash), self._anchors_path(content_hash)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        self._released = set()
+
+
+    def _evict(self):
+        sizes = {}
+        for entry in self._manifest.values():
+            content_hash = entry["hash"]
+            if content_hash not in sizes:
+                try:
+                    sizes[content_hash] = os.path.getsize(self._page_path(content_hash))
+                except FileNotFoundError:
+                    sizes[content_hash] = 0
+
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        for url, entry in sorted(self._manifest.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            del self._manifest[url]
+            evicted += 1
+            if self._release(entry["hash"]):
+                total -= sizes.pop(entry["hash"], 0)
+        self.logger.info(f"HTML cache: evicted {evicted} pages, {total} bytes left.")
+
+
+    def _save_manifest(self):
+        """Called with the lock held."""
+        with file_lock(self._manifest_path):
+            self._manifest = self._merge_manifest(self._load_manifest())
+            self._refcounts = self._count_references(self._manifest)
+            self._evict()
+            self._delete_released()
+
+            tmp_path = f"{self._manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._manifest, f, ensure_ascii=False)
+            os.replace(tmp_path, self._manifest_path)
+        self._dirty_writes = 0
+        self._written = set()
+        self._accessed = set()
+        self._written = set()       # URLs put since the last save
+        self._accessed = set()      # URLs read since the last save
+        self._released = set()      # Hashes that lost their last URL since the last save
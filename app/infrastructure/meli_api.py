@@ -4,6 +4,11 @@ import time
 import logging
 
 from app.config.env import Settings
+from app.dependencies.singleton_concurrency_limiter import get_concurrency_limiter
+from app.dependencies.singleton_resilience import get_retry_budget, get_circuit_breaker
+from app.dependencies.singleton_tracer import get_tracer
+from app.dependencies.singleton_meli_transport import get_meli_transport
+from app.infrastructure.resilience import CircuitOpenError
 
 class MeliCategoryClient:
 
@@ -13,12 +18,27 @@ class MeliCategoryClient:
     BASE_DELAY = 0.07 # ~ 14 req/sec (840 per minute)
     MAX_DELAY = 2.0   # a request per 5 seconds (cool down)
 
-    def __init__(self):
+    def __init__(self, transport=None):
         Settings.load()
         self.MELI_API_BASE_URL = Settings.MELI_API_BASE_URL
         self.logger = logging.getLogger(__name__)
         self.thread_local = threading.local() # throttler variable for delay to be shared among threads
 
+        # Shared adaptive limits of in-flight requests (see concurrency_limiter.py)
+        self.api_limiter = get_concurrency_limiter("meli_api")
+        self.html_limiter = get_concurrency_limiter("meli_html")
+        # Priority of the calls of this client in the limiters (see singleton_concurrency_limiter.py):
+        # set to "crawl" by the tree builds and to "prefetch" by the prefetch
+        self.priority = "interactive"
+
+        # Shared retry budget and circuit breakers per endpoint class (see resilience.py)
+        self.retry_budget = get_retry_budget()
+        self.tracer = get_tracer()
+
+        # Every request goes through the transport: the network, or recording/replaying it
+        # (see meli_transport.py), which makes the crawler benchmarks deterministic
+        self.transport = transport or get_meli_transport()
+
 
     def get_sites(self, access_token):
         """
@@ -32,15 +52,7 @@ class MeliCategoryClient:
             "Authorization": f"Bearer {access_token}"
         }
 
-        try:
-            response = requests.get(url, headers=headers, timeout=15)
-            response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            print("[ERROR] Status code: ", response.status_code)
-            print("[ERROR] Response text: ", response.text)
-            raise e
-    
-        return response.json()
+        return self._guarded_request(url, headers, "sites").json()
 
 
     def get_top_level_categories(self, access_token, site_id: str) -> list[dict]:
@@ -58,15 +70,37 @@ class MeliCategoryClient:
             "Authorization": f"Bearer {access_token}"
         }
 
+        return self._guarded_request(url, headers, "sites").json()
+
+
+    def _guarded_request(self, url, headers, endpoint_class):
+        """
+        Single GET (no retries) guarded by the circuit breaker of the endpoint class, under the
+        adaptive concurrency limit like every other MeLi call (see _limited_request).
+        Same policy as _throttled_request: only 5xx and network errors count as failures for the
+        breaker. A 429 is backpressure, MeLi is alive: it slows the limiter down, not the breaker.
+        """
+        breaker = get_circuit_breaker(endpoint_class)
+        breaker.allow_request()
+
         try:
-            response = requests.get(url, headers=headers, timeout=15)
+            response = self._limited_request("GET", url, headers)
             response.raise_for_status()
         except requests.exceptions.HTTPError as e:
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()    # MeLi answered: rate limited (429), or our request is wrong
             print("[ERROR] Status code: ", response.status_code)
             print("[ERROR] Response text: ", response.text)
             raise e
-        return response.json()
-    
+        except requests.exceptions.RequestException:
+            breaker.record_failure()
+            raise
+
+        breaker.record_success()
+        return response
+
 
     def _get_thread_delay(self):
         """Initialize delay per thread if missing"""
@@ -80,7 +114,37 @@ class MeliCategoryClient:
         self.thread_local.delay = value
 
 
-    def _throttled_request(self, method, url, headers, max_retries=10):
+    def _limited_request(self, method, url, headers):
+        """
+        Makes the request under the adaptive concurrency limit (see AdaptiveConcurrencyLimiter),
+        feeding it with the observed latency and the 429s.
+        """
+        is_api_call = bool(self.MELI_API_BASE_URL) and url.startswith(self.MELI_API_BASE_URL)
+        limiter = self.api_limiter if is_api_call else self.html_limiter
+
+        priority = self.priority
+        with self.tracer.span("limiter_wait", limit=limiter.limit, priority=priority):
+            limiter.acquire(priority=priority)
+        start = time.perf_counter()
+        try:
+            with self.tracer.span("http", method=method, url=url) as span:
+                response = self.transport.request(method, url, headers=headers, timeout=15)
+                span.set_attribute("status_code", response.status_code)
+        except Exception:
+            limiter.release(None, priority=priority)
+            raise
+        limiter.release(time.perf_counter() - start, throttled=response.status_code == 429, priority=priority)
+        return response
+
+
+    def _throttle_sleep(self, seconds):
+        """Sleeps of the throttler, traced on their own to tell them apart from the network time."""
+        with self.tracer.span("throttle_sleep", seconds=seconds):
+            time.sleep(seconds)
+
+
+    def _throttled_request(self, method, url, headers=None, max_retries=10, expect_json=True,
+                           endpoint_class="categories"):
         """
         We don't know what's the MeLi requests limit per app (developer), I tried initially with 845
         and no 429 (too many requests) was returned. But maybe in the future they decide to lower
@@ -92,47 +156,96 @@ class MeliCategoryClient:
 
         IMPORTANT: This works for each thread independently. For example, if one thread gets a 429,
         only that thread slows down. Avoiding all the threads to slow down. The same with speeding up.
+
+        expect_json=False returns the raw response body (str) instead of the parsed JSON, used for
+        HTML scraping and for the pipeline mode, where parsing is done apart from the request.
+
+        Retries are limited by max_retries but also by the retry budget shared by all the threads,
+        and every attempt goes through the circuit breaker of endpoint_class ("categories" or
+        "html"). During a MeLi outage the breaker opens and the requests fail fast (CircuitOpenError)
+        instead of every thread sleeping through its retries.
+        Only 5xx and network errors count as failures for the breaker. A 429 is backpressure
+        (same policy as _guarded_request): the thread slows down, the concurrency limit shrinks
+        and the request is retried, but the breaker records it as a success, MeLi is alive.
         """
+        breaker = get_circuit_breaker(endpoint_class)
         attempt = 0
 
         while True:
             delay = self._get_thread_delay()
+            # Raises CircuitOpenError when open, not retried (that's the purpose of the breaker)
+            breaker.allow_request()
+            self.retry_budget.record_request()
 
             try:
-                response = requests.request(method, url, headers=headers, timeout=15)
+                response = self._limited_request(method, url, headers)
 
-                # 429 - Then rate limit
+                # 429 - Then rate limit. MeLi is alive, so it's not a failure for the breaker
                 if response.status_code == 429:
+                    breaker.record_success()
                     attempt += 1
+                    if attempt >= max_retries or not self.retry_budget.try_retry():
+                        raise RuntimeError(f"Request to {url} still rate limited (429) after {attempt}"
+                                           f" attempts, retry budget or max_retries exhausted.")
                     new_delay = min(delay * 2, self.MAX_DELAY)
                     self._set_thread_delay(new_delay)
                     self.logger.warning(f"[429] Thread {threading.get_ident()} faced 429 status code,"
                                         f" slowing to {new_delay:.2f}s")
-                    time.sleep(new_delay) # Sleep a bit before continuing.
+                    self._throttle_sleep(new_delay) # Sleep a bit before continuing.
                     continue
 
                 # Success? - Then continue and attempt speed up a bit toward BASE_DELAY
                 if response.status_code < 400:
+                    breaker.record_success()
                     new_delay = max(delay * 0.9, self.BASE_DELAY)
                     self._set_thread_delay(new_delay)
 
-                    time.sleep(new_delay) # Short pause. Always pause, that's the purpose of the mechanism
-                    return response.json()
-                
-                # other errros, escalate:
+                    self._throttle_sleep(new_delay) # Short pause. Always pause, that's the purpose of the mechanism
+                    if not expect_json:
+                        return response.text
+                    with self.tracer.span("json_parse"):
+                        return response.json()
+
+                # Other client errors (e.g. 404), retrying won't change the answer
+                if response.status_code < 500:
+                    breaker.record_success()
+                    response.raise_for_status()
+
+                # other errros (5xx), escalate:
+                breaker.record_failure()
                 response.raise_for_status()
-            
+
+            except requests.exceptions.HTTPError as exc:
+                if exc.response is not None and exc.response.status_code < 500:
+                    raise RuntimeError(f"Request to {url} failed: {exc}")
+                attempt = self._backoff_or_raise(attempt, max_retries, delay, exc)
+
+            except RuntimeError:
+                raise
+
             except Exception as exc:
-                attempt += 1
-                if attempt >= max_retries:
-                    raise RuntimeError(f"Request failed after {max_retries} retries (max_retries): {exc}")
-                
-                # backoff (slow down) on network errors too just in case
-                new_delay = min(delay * 2, self.MAX_DELAY)
-                self._set_thread_delay(new_delay)
-                self.logger.info(f"After network error, thread {threading.get_ident()} is retrying "
-                                 f"in {new_delay:2f}s. Error: {exc}")
-                time.sleep(new_delay)
+                breaker.record_failure()
+                attempt = self._backoff_or_raise(attempt, max_retries, delay, exc)
+
+
+    def _backoff_or_raise(self, attempt, max_retries, delay, exc) -> int:
+        """
+        After a server or network error: raises if max_retries or the shared retry budget are
+        exhausted, otherwise sleeps (slows down) and returns the new attempt count.
+        """
+        attempt += 1
+        if attempt >= max_retries:
+            raise RuntimeError(f"Request failed after {max_retries} retries (max_retries): {exc}")
+        if not self.retry_budget.try_retry():
+            raise RuntimeError(f"Request failed and the retry budget is exhausted: {exc}")
+
+        # backoff (slow down) on network errors too just in case
+        new_delay = min(delay * 2, self.MAX_DELAY)
+        self._set_thread_delay(new_delay)
+        self.logger.info(f"After network error, thread {threading.get_ident()} is retrying "
+                         f"in {new_delay:2f}s. Error: {exc}")
+        self._throttle_sleep(new_delay)
+        return attempt
 
 
 
@@ -148,12 +261,31 @@ class MeliCategoryClient:
         }
 
         try:
-            category_info = self._throttled_request("GET", url, headers=headers)
+            with self.tracer.span("meli_request", endpoint_class="categories", category_id=category_id):
+                category_info = self._throttled_request("GET", url, headers=headers)
             return category_info
         except Exception as exc:
             self.logger.critical(f"Failed to fetch category {category_id}: {exc}")
             raise
 
+    def get_category_info_raw(self, category_id, access_token) -> str:
+        """
+        Same as get_category_info, but returns the raw JSON body (str) without parsing it.
+        Used by the pipeline mode (see category_tree_pipeline.py), which parses it in its own
+        trace span, apart from the network call.
+        """
+        url = f"{self.MELI_API_BASE_URL}/categories/{category_id}"
+        headers = {
+            "Authorization": f"Bearer {access_token}"
+        }
+
+        try:
+            with self.tracer.span("meli_request", endpoint_class="categories", category_id=category_id):
+                return self._throttled_request("GET", url, headers=headers, expect_json=False)
+        except Exception as exc:
+            self.logger.critical(f"Failed to fetch category {category_id}: {exc}")
+            raise
+
     # TODO: Make this HTML scrapper resilient by implementing _resilient_html_scraper() method
     def get_html_scrape_code(self, url) -> str:
         """
@@ -163,4 +295,5 @@ class MeliCategoryClient:
         
         :param url: URL from which retrieve the HTML code
         """
-        return self._throttled_request("GET", url, expect_json=False)
+        with self.tracer.span("meli_request", endpoint_class="html", url=url):
+            return self._throttled_request("GET", url, expect_json=False, endpoint_class="html")
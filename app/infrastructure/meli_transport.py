@@ -0,0 +1,220 @@
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from requests.structures import CaseInsensitiveDict
+import glob
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import requests
+
+
+# Response headers worth keeping in a recording, the rest are noise for the crawler
+RECORDED_HEADERS = ("Content-Type", "Retry-After", "X-RateLimit-Remaining")
+ARCHIVE_FORMAT = "meli-recording"
+ARCHIVE_VERSION = 1
+ARCHIVE_SUFFIX = ".jsonl.gz"
+
+
+def _split_archive_path(archive_path: str) -> tuple[str, str]:
+    if archive_path.endswith(ARCHIVE_SUFFIX):
+        return archive_path[:-len(ARCHIVE_SUFFIX)], ARCHIVE_SUFFIX
+    return archive_path, ""
+
+
+def recording_part_path(archive_path: str, pid: int) -> str:
+    """The file process pid records into: meli_recording.jsonl.gz -> meli_recording.{pid}.jsonl.gz"""
+    stem, suffix = _split_archive_path(archive_path)
+    return f"{stem}.{pid}{suffix}"
+
+
+def recording_parts(archive_path: str) -> list[str]:
+    """
+    The files of a recording: archive_path itself (a single-file archive) and the parts written
+    by each process (see RecordingTransport).
+    """
+    stem, suffix = _split_archive_path(archive_path)
+    parts = sorted(path for path in glob.glob(f"{glob.escape(stem)}.*{suffix}")
+                   if path[len(stem) + 1:len(path) - len(suffix)].isdigit())
+    return ([archive_path] if os.path.isfile(archive_path) else []) + parts
+
+
+class RequestsTransport:
+    """
+    The transport MeliCategoryClient sends its requests through: the real network. Recording and
+    replaying (below) are the other two, with the same request() signature.
+    """
+
+    def request(self, method: str, url: str, headers: dict | None = None, timeout: float = 15) -> requests.Response:
+        return requests.request(method, url, headers=headers, timeout=timeout)
+
+
+class RecordingTransport:
+    """
+    Sends the requests through another transport and records every response (status, body, a few
+    headers and the latency) into a gzip JSONL archive, to be replayed later by ReplayTransport.
+    429s are recorded too, in order, so the replay gets the same rate limiting sequence.
+    Request headers are never recorded (they carry the access token).
+
+    Every process records into its own part of the archive, recording_part_path(archive_path, pid),
+    opened on its first response: the shard workers and the uvicorn workers all build this
+    transport, a single file would be truncated by each one of them. ReplayTransport reads all the
+    parts as one archive.
+
+    Part: a header line {"format", "version", "recorded_at"} and then one line per response:
+        {"method", "url", "status", "headers", "body", "latency"}
+    Call close() (or flush()) before reading it, gzip needs its trailer.
+    """
+
+    def __init__(self, archive_path: str, inner=None):
+        self.archive_path = archive_path
+        self.inner = inner or RequestsTransport()
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+        self.part_path = None
+        self.recorded = 0
+
+
+    def _write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open_part()
+            self._file.write(line + "\n")
+
+
+    def _open_part(self):
+        # A forked child gets the parent's file too, it's left alone (the parent writes it)
+        self._pid = os.getpid()
+        self.part_path = recording_part_path(self.archive_path, self._pid)
+        self._file = gzip.open(self.part_path, "wt", encoding="utf-8")
+        header = {"format": ARCHIVE_FORMAT, "version": ARCHIVE_VERSION,
+                  "recorded_at": datetime.now(timezone.utc).isoformat()}
+        self._file.write(json.dumps(header) + "\n")
+
+
+    def request(self, method: str, url: str, headers: dict | None = None, timeout: float = 15) -> requests.Response:
+        start = time.perf_counter()
+        response = self.inner.request(method, url, headers=headers, timeout=timeout)
+        latency = time.perf_counter() - start
+
+        self._write({
+            "method": method.upper(),
+            "url": url,
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers},
+            "body": response.text,
+            "latency": round(latency, 6),
+        })
+        self.recorded += 1
+        return response
+
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._file.flush()
+
+
+    def close(self):
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._file.close()
+            self._file = None
+            self._pid = None
+
+
+class ReplayTransport:
+    """
+    Serves the responses of an archive written by RecordingTransport, without network. Every part
+    of the archive (see recording_parts) is loaded, a part cut short (a process killed before
+    closing it) is used up to where it's readable.
+
+    The responses of each (method, url) are served in the order they were recorded, so a URL that
+    got two 429s and then a 200 gets exactly that again. Once its responses are used up, the last
+    one is repeated (usually the 200). URLs not in the archive get a 404.
+
+    Every response waits its recorded latency multiplied by latency_scale: 1.0 replays the real
+    timing, 0.5 a network twice as fast, 0 no waiting at all (the crawler's own work only).
+    """
+
+    def __init__(self, archive_path: str, latency_scale: float = 1.0):
+        self.archive_path = archive_path
+        self.latency_scale = latency_scale
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._responses = defaultdict(list)     # (method, url) -> [record, ...]
+        self._cursors = defaultdict(int)
+        self.served = 0
+        self.misses = 0
+        self.status_counts = Counter()      # status code -> responses served
+
+        parts = recording_parts(archive_path)
+        if not parts:
+            raise FileNotFoundError(f"No recording at {archive_path}.")
+        for part_path in parts:
+            self._load_part(part_path)
+
+
+    def _load_part(self, part_path: str):
+        with gzip.open(part_path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("format") != ARCHIVE_FORMAT:
+                raise ValueError(f"{part_path} is not a MeLi recording.")
+            try:
+                for line in f:
+                    record = json.loads(line)
+                    self._responses[(record["method"], record["url"])].append(record)
+            except (EOFError, ValueError) as exc:
+                self.logger.warning(f"Replay: {part_path} is cut short ({exc}), using what was read.")
+
+
+    def __len__(self):
+        return sum(len(records) for records in self._responses.values())
+
+
+    def _next_record(self, method: str, url: str) -> dict | None:
+        key = (method.upper(), url)
+        with self._lock:
+            records = self._responses.get(key)
+            if not records:
+                self.misses += 1
+                return None
+            position = self._cursors[key]
+            self._cursors[key] = position + 1
+            self.served += 1
+            record = records[min(position, len(records) - 1)]
+            self.status_counts[record["status"]] += 1
+            return record
+
+
+    def request(self, method: str, url: str, headers: dict | None = None, timeout: float = 15) -> requests.Response:
+        record = self._next_record(method, url)
+        if record is None:
+            self.logger.warning(f"Replay: {method} {url} is not in the archive, answering 404.")
+            record = {"status": 404, "headers": {}, "body": '{"message": "not recorded"}', "latency": 0}
+
+        if record["latency"] and self.latency_scale:
+            time.sleep(record["latency"] * self.latency_scale)
+
+        response = requests.Response()
+        response.status_code = record["status"]
+        response.headers = CaseInsensitiveDict(record["headers"])
+        response._content = record["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = url
+        return response
+
+
+    def reset(self):
+        """Starts serving every URL from its first recorded response again (e.g. between runs)."""
+        with self._lock:
+            self._cursors.clear()
+            self.served = 0
+            self.misses = 0
+            self.status_counts.clear()
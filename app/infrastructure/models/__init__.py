@@ -4,3 +4,7 @@
 
 from .meli_access_token import MeliAccessToken
 from .meli_site import MeliSite
+from .meli_category_tree import CategoryTree
+from .meli_category import Category
+from .meli_category_closure import CategoryClosure
+from .meli_lease import Lease
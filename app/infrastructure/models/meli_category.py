@@ -48,7 +48,7 @@ class Category(Base):
     created_in_meli_at = Column(DateTime, nullable=False)    # Could be old or a new category
 
     # Backref to tree metadata
-    tree = relationship("CategoryTree", back_populates="meli_categories")
+    tree = relationship("CategoryTree", back_populates="categories", foreign_keys=[tree_id])
 
     # Parent/children relations inside this table
     parent = relationship(
@@ -63,3 +63,28 @@ class Category(Base):
         back_populates="parent",
         cascade="all, delete-orphan"
     )
+
+    __table_args__ = (
+        # One row per category and site, also the lookup used by every query
+        Index("uix_meli_categories_site_category", "site_id", "category_id", unique=True),
+        # Siblings
+        Index("ix_meli_categories_site_parent", "site_id", "parent_id", "category_id"),
+        # Depth slices (keyset paginated by category_id)
+        Index("ix_meli_categories_site_depth", "site_id", "depth", "category_id"),
+    )
+
+    def to_dict(self):
+        return {
+            "category_id": self.category_id,
+            "site_id": self.site_id,
+            "name": self.name,
+            "url": self.url,
+            "parent_id": self.parent_id,
+            "fragile": self.fragile,
+            "depth": self.depth,
+            "total_items_in_this_category": self.total_items_in_this_category,
+            "full_path": self.full_path,
+            "has_children": self.has_children,
+            "total_children": self.total_children,
+            "persisted_at": self.persisted_at,
+        }
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, Index
+
+from app.infrastructure.database import Base
+
+
+class CategoryClosure(Base):
+    """
+    Closure table of the category trees: one row per (ancestor, descendant) pair, including each
+    category with itself (distance 0). Rebuilt for a site every time its tree is persisted.
+
+    Makes ancestors and descendants a single indexed query, instead of recursive self-joins on
+    parent_db_id:
+        ancestors of X:   WHERE site_id = :site AND descendant_id = X   (ORDER BY distance DESC)
+        descendants of X: WHERE site_id = :site AND ancestor_id = X     (ORDER BY distance, descendant_id)
+    """
+
+    __tablename__ = "meli_category_closure"
+
+    site_id = Column(String(10), primary_key=True)
+    ancestor_id = Column(String(50), primary_key=True)
+    descendant_id = Column(String(50), primary_key=True)
+    distance = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_meli_category_closure_descendants", "site_id", "ancestor_id", "distance", "descendant_id"),
+        Index("ix_meli_category_closure_ancestors", "site_id", "descendant_id", "distance"),
+    )
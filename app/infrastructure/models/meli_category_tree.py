@@ -23,7 +23,7 @@ class CategoryTree(Base):
     # The top category_id ("All categories" root)
     root_category_id = Column(
         Integer,
-        ForeignKey("categories.id", ondelete="SET NULL"),
+        ForeignKey("meli_categories.id", ondelete="SET NULL", use_alter=True),
         nullable=True,
     )
 
@@ -31,5 +31,6 @@ class CategoryTree(Base):
     categories = relationship(
         "Category",
         back_populates="tree",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        foreign_keys="Category.tree_id"     # root_category_id is another path between the tables
     )
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, String, DateTime
+
+from app.infrastructure.database import Base
+
+
+class Lease(Base):
+    """
+    Leases used for leader election between the workers (uvicorn --workers N, or several
+    containers) sharing the database. A lease is held by one worker until expires_at, and renewed
+    while the work lasts (see LeaderElectionService).
+    Datetimes are naive UTC, so they compare the same way in every database.
+    """
+
+    __tablename__ = "meli_leases"
+
+    name = Column(String(64), primary_key=True)     # e.g. token_refresh, crawl_MLU
+    holder = Column(String(128), nullable=False)    # hostname:pid of the worker
+    acquired_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "holder": self.holder,
+            "acquired_at": self.acquired_at,
+            "expires_at": self.expires_at,
+        }
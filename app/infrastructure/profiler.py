@@ -0,0 +1,174 @@
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+import gc
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+
+# Types worth following during a build, counted on their own in every snapshot: the nodes and
+# index entries (dicts with children_ids), the futures of the thread pools and the responses.
+TRACKED_TYPES = ("Future", "Response", "Span", "CategoryRecord")
+
+
+class Profiler:
+    """
+    Opt-in memory and CPU profiling of the live process, for a build that bloats memory or pegs
+    the CPU, without restarting the service. Nothing runs (and nothing costs) until asked.
+
+    - capture(label): writes a snapshot to output_dir: tracemalloc top allocators (when tracing,
+      see start_tracemalloc) and object counts per type, as JSON, plus the raw tracemalloc dump
+      (.tracemalloc) to compare two snapshots offline (tools/profiling/compare_profiles.py).
+    - sample_cpu(seconds): samples the stacks of every thread and writes them folded
+      ("thread;module:function;... count"), to open with speedscope or flamegraph.pl.
+    - periodic(label, interval_seconds): captures every interval_seconds while the block runs
+      (and once at the end), e.g. during build_category_tree.
+    """
+
+    def __init__(self, output_dir: str = os.path.join("app", "logs", "profiles"), top_allocators: int = 30,
+                 top_types: int = 40):
+        self.output_dir = output_dir
+        self.top_allocators = top_allocators
+        self.top_types = top_types
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+
+    def _path(self, label: str, extension: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        return os.path.join(self.output_dir, f"{label}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}{extension}")
+
+
+    def start_tracemalloc(self, frames: int = 10) -> bool:
+        """Starts tracing allocations (slows down allocations, until stop_tracemalloc). False if it already was."""
+        if tracemalloc.is_tracing():
+            return False
+        tracemalloc.start(frames)
+        self.logger.info(f"tracemalloc started ({frames} frames).")
+        return True
+
+
+    def stop_tracemalloc(self):
+        tracemalloc.stop()
+        self.logger.info("tracemalloc stopped.")
+
+
+    def object_counts(self) -> dict:
+        """Live objects per type (the top_types biggest), plus the tracked ones and the tree nodes."""
+        counts = Counter()
+        nodes = 0
+        for obj in gc.get_objects():
+            counts[type(obj).__name__] += 1
+            if type(obj) is dict and "children_ids" in obj:
+                nodes += 1
+        return {
+            "total": sum(counts.values()),
+            "category_nodes": nodes,
+            "tracked": {name: counts.get(name, 0) for name in TRACKED_TYPES},
+            "types": dict(counts.most_common(self.top_types)),
+        }
+
+
+    def allocators(self, snapshot) -> list[dict]:
+        return [
+            {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             "size_bytes": stat.size, "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:self.top_allocators]
+        ]
+
+
+    def capture(self, label: str = "snapshot") -> dict:
+        """Writes a memory snapshot (see the class docstring) and returns its summary."""
+        with self._lock:
+            start = time.perf_counter()
+            summary = {"label": label, "captured_at": datetime.now().isoformat(), "tracemalloc": None}
+            if tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+                dump_path = self._path(label, ".tracemalloc")
+                snapshot.dump(dump_path)
+                summary["tracemalloc"] = {"current_bytes": current, "peak_bytes": peak, "dump": dump_path,
+                                          "top_allocators": self.allocators(snapshot)}
+            summary["objects"] = self.object_counts()
+            summary["seconds"] = round(time.perf_counter() - start, 4)
+
+            path = self._path(label, ".json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+            summary["file"] = path
+        self.logger.info(f"Profile snapshot written to {path} in {summary['seconds']} seconds.")
+        return summary
+
+
+    def sample_cpu(self, seconds: float = 10, interval_seconds: float = 0.01, label: str = "cpu") -> dict:
+        """
+        Samples the stack of every thread (but this one) every interval_seconds during seconds.
+        Blocks while sampling. Threads waiting (on a socket, a lock) show up too, with the frame
+        they wait in: that's wall-clock, not only on-CPU time.
+        """
+        own_thread = threading.get_ident()
+        thread_names = {}
+        stacks = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if samples % 100 == 0:
+                thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                stack.append(thread_names.get(thread_id, str(thread_id)))
+                stacks[";".join(reversed(stack))] += 1
+            samples += 1
+            time.sleep(interval_seconds)
+
+        path = self._path(label, ".folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self.logger.info(f"{samples} CPU samples written to {path}.")
+        return {
+            "samples": samples,
+            "file": path,
+            "top_stacks": [{"stack": stack.split(";")[-3:], "count": count} for stack, count in stacks.most_common(10)],
+        }
+
+
+    @contextmanager
+    def periodic(self, label: str, interval_seconds: float, frames: int = 10):
+        """Captures every interval_seconds while the block runs, and once when it ends."""
+        started = self.start_tracemalloc(frames)
+        stop = threading.Event()
+
+        def capture_loop():
+            while not stop.wait(interval_seconds):
+                self.capture(label)
+
+        thread = threading.Thread(target=capture_loop, name="profiler", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+            self.capture(f"{label}_end")
+            if started:
+                self.stop_tracemalloc()
+
+
+    def list_files(self) -> list[dict]:
+        if not os.path.isdir(self.output_dir):
+            return []
+        return [
+            {"file": os.path.join(self.output_dir, name), "size_bytes": os.path.getsize(os.path.join(self.output_dir, name))}
+            for name in sorted(os.listdir(self.output_dir))
+        ]
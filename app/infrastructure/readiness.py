@@ -0,0 +1,48 @@
+from threading import Lock
+import time
+
+
+class Readiness:
+    """
+    State of the startup checks (database, access token, snapshots...). The service is alive as
+    soon as it serves requests, but ready only when every check passed: that's what the readiness
+    probe looks at (GET /health/ready), so no traffic is sent to a worker still warming up.
+
+    Each check is pending, running, ready or failed, with the error and how long it took.
+    """
+
+    def __init__(self, checks: list[str]):
+        self._lock = Lock()
+        self._started_at = time.monotonic()
+        self._ready_at = None
+        self._checks = {name: {"status": "pending", "detail": None, "seconds": None} for name in checks}
+        self._check_started = {}
+
+
+    def start(self, check: str):
+        with self._lock:
+            self._checks[check].update(status="running", detail=None)
+            self._check_started[check] = time.monotonic()
+
+
+    def finish(self, check: str, ok: bool, detail: str | None = None):
+        with self._lock:
+            started = self._check_started.get(check, time.monotonic())
+            self._checks[check].update(status="ready" if ok else "failed", detail=detail,
+                                       seconds=round(time.monotonic() - started, 4))
+            if self._ready_at is None and all(c["status"] == "ready" for c in self._checks.values()):
+                self._ready_at = time.monotonic()
+
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return self._ready_at is not None
+
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self._ready_at is not None,
+                "seconds_to_ready": round(self._ready_at - self._started_at, 4) if self._ready_at else None,
+                "checks": {name: dict(check) for name, check in self._checks.items()},
+            }
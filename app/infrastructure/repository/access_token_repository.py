@@ -5,6 +5,7 @@ from datetime import datetime, timedelta, timezone
 
 from app.infrastructure.database import get_session
 from app.infrastructure.models.meli_access_token import MeliAccessToken
+from app.infrastructure.bulk_writer import upsert_rows
 
 class AccessTokenRepository:
     def __init__(self):
@@ -38,20 +39,20 @@ class AccessTokenRepository:
         access_token_expires_at = self.check_convert(token_data["access_token_expires_at"])
         refresh_token_expires_at = self.check_convert(token_data["refresh_token_expires_at"])
 
-        new_access_token = MeliAccessToken(
-            singleton_key=1,
-            access_token=token_data["access_token"],
-            created_at=created_at,
-            expires_in_seconds=token_data["expires_in_seconds"],
-            access_token_expires_at=access_token_expires_at,
-            refresh_token_expires_at=refresh_token_expires_at,
-        )
+        new_access_token = {
+            "singleton_key": 1,
+            "access_token": token_data["access_token"],
+            "created_at": created_at,
+            "expires_in_seconds": token_data["expires_in_seconds"],
+            "access_token_expires_at": access_token_expires_at,
+            "refresh_token_expires_at": refresh_token_expires_at,
+        }
 
         try:
             with get_session() as session:
-                # Delete the old token
-                session.query(MeliAccessToken).delete()
-                session.add(new_access_token)
+                # Replaces the only row (singleton_key) in place, nothing written if it's the same token
+                upsert_rows(session, MeliAccessToken, [new_access_token], ["singleton_key"],
+                            [column for column in new_access_token if column != "singleton_key"])
                 session.commit()
             return True
         except SQLAlchemyError as e:
@@ -0,0 +1,205 @@
+from sqlalchemy import select, update, and_, or_
+from sqlalchemy.orm import aliased
+from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime, timezone
+
+from app.infrastructure.database import get_session, get_read_session
+from app.infrastructure.models.meli_category import Category
+from app.infrastructure.models.meli_category_tree import CategoryTree
+from app.infrastructure.models.meli_category_closure import CategoryClosure
+from app.infrastructure.bulk_writer import upsert_rows, delete_missing
+
+
+# Columns of meli_categories that make a category "changed" when persisting the tree again
+CATEGORY_COMPARE_COLUMNS = [
+    "tree_id", "name", "url", "parent_id", "fragile", "status", "depth", "total_items_in_this_category",
+    "full_path", "has_children", "total_children",
+]
+
+
+class CategoryRepository:
+
+    def save_category_tree(self, site_id: str, category_index: dict[str, dict]) -> bool:
+        """
+        Persists the flat category index of a site (meli_categories) and its closure table
+        (meli_category_closure), in one transaction. Only the new or changed rows are written,
+        and the categories no longer in the index are deleted (see bulk_writer.py), so persisting
+        a tree that barely changed since the last build writes almost nothing.
+        """
+        now = datetime.now(timezone.utc)
+
+        try:
+            with get_session() as session:
+                tree = session.scalars(select(CategoryTree).where(CategoryTree.site_id == site_id)).one_or_none()
+                if tree is None:
+                    tree = CategoryTree(site_id=site_id, updated_at=now)
+                    session.add(tree)
+                    session.flush()     # to get tree.id
+                else:
+                    tree.updated_at = now
+
+                category_rows = [self._category_row(site_id, tree.id, entry, now) for entry in category_index.values()]
+                closure_rows = [row for entry in category_index.values() for row in self._closure_rows(site_id, entry)]
+
+                written = upsert_rows(session, Category, category_rows, ["site_id", "category_id"],
+                                      CATEGORY_COMPARE_COLUMNS, ["persisted_at"])
+                deleted = delete_missing(session, Category, ["category_id"],
+                                         {(row["category_id"],) for row in category_rows},
+                                         Category.site_id == site_id)
+                upsert_rows(session, CategoryClosure, closure_rows, ["site_id", "ancestor_id", "descendant_id"],
+                            ["distance"])
+                delete_missing(session, CategoryClosure, ["ancestor_id", "descendant_id"],
+                               {(row["ancestor_id"], row["descendant_id"]) for row in closure_rows},
+                               CategoryClosure.site_id == site_id)
+                self._link_parents(session, site_id)
+                session.commit()
+            print(f"[INFO] Category tree of {site_id} persisted: {written} categories written,"
+                  f" {len(category_rows) - written} unchanged, {deleted} deleted.")
+            return True
+        except SQLAlchemyError as e:
+            print(f"[ERROR] Failed to persist the category tree of {site_id}: {e}")
+            return False
+
+
+    def _category_row(self, site_id: str, tree_id: int, entry: dict, now: datetime) -> dict:
+        path_from_root = entry.get("path_from_root") or [{"id": entry["id"], "name": entry.get("name")}]
+        children_ids = entry.get("children_ids") or []
+        return {
+            "tree_id": tree_id,
+            "site_id": site_id,
+            "category_id": entry["id"],
+            "name": entry.get("name") or "",
+            "url": entry.get("url") or entry.get("permalink") or "",
+            "parent_id": path_from_root[-2]["id"] if len(path_from_root) > 1 else None,
+            "fragile": bool(entry.get("fragile")),
+            "status": "completed",
+            "depth": len(path_from_root) - 1,
+            "total_items_in_this_category": entry.get("total_items_in_this_category") or 0,
+            "full_path": " > ".join(node.get("name") or node["id"] for node in path_from_root),
+            "has_children": bool(children_ids),
+            "total_children": len(children_ids),
+            "persisted_at": now,
+            "created_in_meli_at": now,
+        }
+
+
+    def _closure_rows(self, site_id: str, entry: dict) -> list[dict]:
+        """One row per ancestor (the category itself included, distance 0)."""
+        path_ids = [node["id"] for node in (entry.get("path_from_root") or [{"id": entry["id"]}])]
+        depth = len(path_ids) - 1
+        return [
+            {"site_id": site_id, "ancestor_id": ancestor_id, "descendant_id": entry["id"], "distance": depth - i}
+            for i, ancestor_id in enumerate(path_ids)
+        ]
+
+
+    def _link_parents(self, session, site_id: str):
+        """
+        Fills parent_db_id from parent_id with one UPDATE (correlated subquery), only in the rows
+        where it's wrong (new categories, or moved to another parent).
+        """
+        parent = aliased(Category)
+        parent_db_id = (
+            select(parent.id)
+            .where(parent.site_id == Category.site_id, parent.category_id == Category.parent_id)
+            .scalar_subquery()
+        )
+        session.execute(
+            update(Category)
+            .where(Category.site_id == site_id, Category.parent_db_id.is_distinct_from(parent_db_id))
+            .values(parent_db_id=parent_db_id)
+            .execution_options(synchronize_session=False)
+        )
+
+
+    def get_category(self, site_id: str, category_id: str) -> dict | None:
+        try:
+            with get_read_session() as session:
+                category = session.scalars(
+                    select(Category).where(Category.site_id == site_id, Category.category_id == category_id)
+                ).one_or_none()
+                return category.to_dict() if category else None
+        except SQLAlchemyError as e:
+            print(f"[ERROR] Failed to retrieve category {category_id}: {e}")
+
+
+    def get_ancestors(self, site_id: str, category_id: str) -> list[dict] | None:
+        """Ancestors of a category, from the top-level one down to its parent."""
+        statement = (
+            select(Category)
+            .join(CategoryClosure, and_(CategoryClosure.site_id == Category.site_id,
+                                        CategoryClosure.ancestor_id == Category.category_id))
+            .where(CategoryClosure.site_id == site_id,
+                   CategoryClosure.descendant_id == category_id,
+                   CategoryClosure.distance > 0)
+            .order_by(CategoryClosure.distance.desc())
+        )
+        return self._fetch_all(statement, f"ancestors of {category_id}")
+
+
+    def get_descendants(self, site_id: str, category_id: str, limit: int,
+                        after: tuple[int, str] | None = None, max_distance: int | None = None) -> list[dict] | None:
+        """
+        Descendants of a category ordered by (distance, category_id), keyset paginated: after is
+        the (distance, category_id) of the last row of the previous page.
+        Returns up to limit + 1 rows, so the caller knows if there's a next page.
+        """
+        statement = (
+            select(Category, CategoryClosure.distance)
+            .join(CategoryClosure, and_(CategoryClosure.site_id == Category.site_id,
+                                        CategoryClosure.descendant_id == Category.category_id))
+            .where(CategoryClosure.site_id == site_id,
+                   CategoryClosure.ancestor_id == category_id,
+                   CategoryClosure.distance > 0)
+        )
+        if max_distance is not None:
+            statement = statement.where(CategoryClosure.distance <= max_distance)
+        if after is not None:
+            after_distance, after_id = after
+            statement = statement.where(or_(
+                CategoryClosure.distance > after_distance,
+                and_(CategoryClosure.distance == after_distance, CategoryClosure.descendant_id > after_id),
+            ))
+        statement = statement.order_by(CategoryClosure.distance, CategoryClosure.descendant_id).limit(limit + 1)
+
+        try:
+            with get_read_session() as session:
+                return [
+                    {**category.to_dict(), "distance": distance}
+                    for category, distance in session.execute(statement).all()
+                ]
+        except SQLAlchemyError as e:
+            print(f"[ERROR] Failed to retrieve the descendants of {category_id}: {e}")
+
+
+    def get_siblings(self, site_id: str, category_id: str) -> list[dict] | None:
+        """Categories with the same parent (the other top-level ones for a top-level category)."""
+        target = aliased(Category)
+        statement = (
+            select(Category)
+            .join(target, and_(target.site_id == Category.site_id, target.category_id == category_id))
+            .where(Category.site_id == site_id,
+                   Category.category_id != category_id,
+                   or_(Category.parent_id == target.parent_id,
+                       and_(target.parent_id.is_(None), Category.parent_id.is_(None))))
+            .order_by(Category.category_id)
+        )
+        return self._fetch_all(statement, f"siblings of {category_id}")
+
+
+    def get_categories_at_depth(self, site_id: str, depth: int, limit: int,
+                                after_id: str | None = None) -> list[dict] | None:
+        """Categories of a site at a certain depth, keyset paginated by category_id (limit + 1 rows)."""
+        statement = select(Category).where(Category.site_id == site_id, Category.depth == depth)
+        if after_id is not None:
+            statement = statement.where(Category.category_id > after_id)
+        statement = statement.order_by(Category.category_id).limit(limit + 1)
+        return self._fetch_all(statement, f"categories of {site_id} at depth {depth}")
+
+
+    def _fetch_all(self, statement, description: str) -> list[dict] | None:
+        try:
+            with get_read_session() as session:
+                return [category.to_dict() for category in session.scalars(statement).all()]
+        except SQLAlchemyError as e:
+            print(f"[ERROR] Failed to retrieve the {description}: {e}")
@@ -0,0 +1,75 @@
+from sqlalchemy import select, update, delete, or_
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from datetime import datetime, timedelta, timezone
+
+from app.infrastructure.database import get_session
+from app.infrastructure.models.meli_lease import Lease
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class LeaseRepository:
+
+    def try_acquire(self, name: str, holder: str, ttl_seconds: float) -> bool:
+        """
+        Takes the lease if it's free, expired, or already held by holder. Atomic: the UPDATE only
+        matches a row that can be taken, and when there's no row the INSERT fails (primary key)
+        for every worker but one.
+        """
+        now = _utc_now()
+        expires_at = now + timedelta(seconds=ttl_seconds)
+        try:
+            with get_session() as session:
+                result = session.execute(
+                    update(Lease)
+                    .where(Lease.name == name, or_(Lease.holder == holder, Lease.expires_at < now))
+                    .values(holder=holder, acquired_at=now, expires_at=expires_at)
+                )
+                if result.rowcount == 0:
+                    session.add(Lease(name=name, holder=holder, acquired_at=now, expires_at=expires_at))
+                session.commit()
+            return True
+        except IntegrityError:
+            return False    # Somebody else holds it
+        except SQLAlchemyError as e:
+            print(f"[ERROR] Failed to acquire the lease {name}: {e}")
+            return False
+
+
+    def renew(self, name: str, holder: str, ttl_seconds: float) -> bool:
+        """Extends the lease, False if holder lost it (expired and taken by another worker)."""
+        try:
+            with get_session() as session:
+                result = session.execute(
+                    update(Lease)
+                    .where(Lease.name == name, Lease.holder == holder)
+                    .values(expires_at=_utc_now() + timedelta(seconds=ttl_seconds))
+                )
+                session.commit()
+            return result.rowcount == 1
+        except SQLAlchemyError as e:
+            print(f"[ERROR] Failed to renew the lease {name}: {e}")
+            return False
+
+
+    def release(self, name: str, holder: str) -> bool:
+        try:
+            with get_session() as session:
+                session.execute(delete(Lease).where(Lease.name == name, Lease.holder == holder))
+                session.commit()
+            return True
+        except SQLAlchemyError as e:
+            print(f"[ERROR] Failed to release the lease {name}: {e}")
+            return False
+
+
+    def get_leases(self) -> list[dict] | None:
+        """Leases currently held (not expired)."""
+        try:
+            with get_session() as session:
+                leases = session.scalars(select(Lease).where(Lease.expires_at >= _utc_now())).all()
+                return [lease.to_dict() for lease in leases]
+        except SQLAlchemyError as e:
+            print(f"[ERROR] Failed to retrieve the leases: {e}")
@@ -1,9 +1,10 @@
-from sqlalchemy import select, delete
+from sqlalchemy import select, update
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime, timedelta, timezone
 
 from app.infrastructure.database import get_session
 from app.infrastructure.models.meli_site import MeliSite
+from app.infrastructure.bulk_writer import upsert_rows, delete_missing
 
 class SiteRepository:
     def get_sites(self) -> dict | None:
@@ -22,26 +23,27 @@ class SiteRepository:
         """
         Insert or update multiple MeLi sites from a list of dicts.
         Each dict should have keys: id, name, default_currency_id
+        Only new or changed sites are written, and the ones no longer returned by MeLi are deleted,
+        all in one transaction (see bulk_writer.py). updated_at is when the sites were last fetched,
+        for every row: SitesCache uses it as the age of the stored sites on a cold start, and MeLi
+        sites almost never change (a last changed date would make every cold start stale).
         """
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                "default_currency_id": site.get("default_currency_id"),
+                "id": site.get("id"),
+                "name": site.get("name"),
+                "updated_at": now,
+            }
+            for site in sites
+        ]
+
         try:
             with get_session() as session:
-                # Delete all the existing rows, since new one and full will arrive
-                session.execute(delete(MeliSite))
-                now = datetime.now(timezone.utc)
-
-                # Prepare new site objects
-                refreshed_sites = [
-                    MeliSite(
-                        default_currency_id=site.get("default_currency_id"),
-                        id=site.get("id"),
-                        name=site.get("name"),
-                        updated_at=now,
-                    )
-                    for site in sites
-                ]
-
-                # Bulk insert
-                session.bulk_save_objects(refreshed_sites)
+                upsert_rows(session, MeliSite, rows, ["id"], ["name", "default_currency_id"], ["updated_at"])
+                delete_missing(session, MeliSite, ["id"], {(row["id"],) for row in rows})
+                session.execute(update(MeliSite).values(updated_at=now))
                 session.commit()
         except SQLAlchemyError as e:
             print(f"[ERROR] Failed to persist the sites: {e}")
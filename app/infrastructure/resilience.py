@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import deque
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised (fail fast) when the circuit breaker of an endpoint class is open."""
+
+
+class RetryBudget:
+    """
+    Retries shared by all the threads, limited to a percentage of the traffic in a sliding window
+    (plus a small floor, so a low traffic service can still retry).
+    During an outage every request fails, so the retries quickly exhaust the budget and the
+    requests fail right away instead of each thread retrying max_retries times.
+    """
+
+    def __init__(self, retry_ratio: float = 0.1, min_retries_per_second: float = 2,
+                 window_seconds: float = 10):
+        self.retry_ratio = retry_ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.window_seconds = window_seconds
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+
+    def _expire(self, now):
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window_seconds:
+                events.popleft()
+
+
+    def record_request(self):
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            self._requests.append(now)
+
+
+    def try_retry(self) -> bool:
+        """Returns True (and spends one retry) if the budget allows a retry."""
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            allowed = max(self.min_retries_per_second * self.window_seconds,
+                          self.retry_ratio * len(self._requests))
+            if len(self._retries) >= allowed:
+                return False
+            self._retries.append(now)
+            return True
+
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._expire(time.monotonic())
+            return {"requests": len(self._requests), "retries": len(self._retries),
+                    "window_seconds": self.window_seconds, "retry_ratio": self.retry_ratio}
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one endpoint class (/sites, /categories, HTML scraping).
+
+    - closed: requests go through. failure_threshold consecutive failures open the circuit.
+    - open: requests fail right away (CircuitOpenError) during reset_timeout seconds.
+    - half_open: up to half_open_max_calls probe requests go through. A success closes the
+      circuit, a failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+
+    def allow_request(self):
+        """Raises CircuitOpenError if the request must not be made."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.OPEN:
+                raise CircuitOpenError(f"Circuit {self.name} is open, MeLi is failing. Not calling it"
+                                       f" for {self.reset_timeout - (time.monotonic() - self._opened_at):.1f}s.")
+            if state == self.HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    raise CircuitOpenError(f"Circuit {self.name} is half-open, waiting for the probe request.")
+                self._half_open_calls += 1
+
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"state": self._current_state(), "consecutive_failures": self._failures}
@@ -0,0 +1,41 @@
+import multiprocessing
+import queue
+
+
+class LocalShardQueue:
+    """
+    Local stand-in for the queue shared by the coordinator and the shard workers of the sharded
+    crawl (see category_shard_service.py). Backed by multiprocessing queues, so it works across
+    processes started by the coordinator.
+
+    Any other implementation (e.g. a table in the shared DB, or a broker, for workers running in
+    separate containers) only needs the same four methods.
+    """
+
+    def __init__(self, context=None):
+        context = context or multiprocessing.get_context("spawn")
+        self._shards = context.Queue()
+        self._results = context.Queue()
+
+
+    def put_shard(self, shard: dict | None):
+        """Publishes a shard to be crawled. None is the stop signal for a worker."""
+        self._shards.put(shard)
+
+
+    def get_shard(self, timeout: float | None = None) -> dict | None:
+        try:
+            return self._shards.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+    def put_result(self, result: dict):
+        self._results.put(result)
+
+
+    def get_result(self, timeout: float | None = None) -> dict | None:
+        try:
+            return self._results.get(timeout=timeout)
+        except queue.Empty:
+            return None
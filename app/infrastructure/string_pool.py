@@ -0,0 +1,171 @@
+from collections import namedtuple
+from threading import Lock
+import sys
+
+
+class StringPool:
+    """
+    One copy of every repeated string (category names, ids, URL prefixes...) shared by all the
+    trees in memory, whatever their site. intern(value) returns the copy already in the pool
+    when there's one, so equal strings end up being the same object.
+    Like sys.intern, but counted, so the memory report can tell how much it holds.
+    """
+
+    def __init__(self):
+        self._strings = {}
+        self._lock = Lock()
+        self.lookups = 0
+
+
+    def intern(self, value: str | None) -> str | None:
+        if value is None:
+            return None
+        self.lookups += 1
+        pooled = self._strings.get(value)
+        if pooled is None:
+            with self._lock:
+                pooled = self._strings.setdefault(value, value)
+        return pooled
+
+
+    def split_url(self, url: str | None) -> tuple[str | None, str | None]:
+        """
+        Splits url into its prefix (scheme and host, e.g. https://listado.mercadolibre.com.uy/),
+        pooled, and the rest of it (not pooled, it's different for every category).
+        """
+        if not url:
+            return None, url
+        host_start = url.find("://")
+        path_start = url.find("/", host_start + 3) if host_start != -1 else -1
+        if path_start == -1:
+            return self.intern(url), ""
+        return self.intern(url[:path_start + 1]), url[path_start + 1:]
+
+
+    def __len__(self):
+        return len(self._strings)
+
+
+    def strings(self) -> list[str]:
+        return list(self._strings)
+
+
+    def stats(self) -> dict:
+        strings = self.strings()
+        return {
+            "strings": len(strings),
+            "bytes": sum(sys.getsizeof(s) for s in strings) + sys.getsizeof(self._strings),
+            "lookups": self.lookups,
+        }
+
+
+def deep_sizeof(obj, exclude_ids: set[int] = frozenset()) -> int:
+    """
+    Approximate memory of obj and everything it references (dicts, lists, tuples, sets, strings),
+    each object counted once. Objects in exclude_ids (e.g. the pooled strings) are not counted.
+    """
+    seen = set(exclude_ids)
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+    return total
+
+
+# One category in memory. parent_id replaces path_from_root (rebuilt by following the parents),
+# and the URLs are split in a pooled prefix and the rest.
+CategoryRecord = namedtuple("CategoryRecord", [
+    "name", "parent_id", "url_prefix", "url_rest", "permalink_prefix", "permalink_rest",
+    "total_items_in_this_category", "fragile", "children_ids",
+])
+
+
+class InternedCategoryIndex:
+    """
+    The category index of a site (category_id -> entry, as built by flatten_category) stored as
+    CategoryRecord tuples with pooled strings, instead of a dict per category with its own
+    path_from_root list. get() rebuilds the usual entry, so callers don't see the difference.
+    """
+
+    def __init__(self, site_id: str, pool: StringPool):
+        self.site_id = site_id
+        self.pool = pool
+        self._records = {}
+
+
+    def add(self, entry: dict):
+        intern = self.pool.intern
+        path_from_root = entry.get("path_from_root") or []
+        url_prefix, url_rest = self.pool.split_url(entry.get("url"))
+        permalink_prefix, permalink_rest = self.pool.split_url(entry.get("permalink"))
+        self._records[intern(entry["id"])] = CategoryRecord(
+            name=intern(entry.get("name")),
+            parent_id=intern(path_from_root[-2]["id"]) if len(path_from_root) > 1 else None,
+            url_prefix=url_prefix,
+            url_rest=url_rest,
+            permalink_prefix=permalink_prefix,
+            permalink_rest=permalink_rest,
+            total_items_in_this_category=entry.get("total_items_in_this_category"),
+            fragile=entry.get("fragile"),
+            children_ids=tuple(intern(child_id) for child_id in entry.get("children_ids") or ()),
+        )
+
+
+    def __len__(self):
+        return len(self._records)
+
+
+    def __contains__(self, category_id):
+        return category_id in self._records
+
+
+    def __iter__(self):
+        return iter(self._records)
+
+
+    def path_from_root(self, category_id: str) -> list[dict]:
+        """Follows the parents up to the top-level category (or the first one not loaded)."""
+        path = []
+        current = category_id
+        while current is not None and current in self._records:
+            record = self._records[current]
+            path.append({"id": current, "name": record.name})
+            current = record.parent_id
+        path.reverse()
+        return path
+
+
+    def get(self, category_id: str) -> dict | None:
+        record = self._records.get(category_id)
+        if record is None:
+            return None
+        return {
+            "id": category_id,
+            "name": record.name,
+            "site_id": self.site_id,
+            "permalink": None if record.permalink_prefix is None else record.permalink_prefix + record.permalink_rest,
+            "url": None if record.url_prefix is None else record.url_prefix + record.url_rest,
+            "total_items_in_this_category": record.total_items_in_this_category,
+            "fragile": record.fragile,
+            "path_from_root": self.path_from_root(category_id),
+            "children": {},
+            "children_ids": list(record.children_ids),
+        }
+
+
+    def to_index(self) -> dict[str, dict]:
+        return {category_id: self.get(category_id) for category_id in self._records}
+
+
+    def sizeof(self, exclude_ids: set[int] = frozenset()) -> int:
+        """Memory of the records, without the pooled strings (they're shared by every site)."""
+        return deep_sizeof(self._records, exclude_ids)
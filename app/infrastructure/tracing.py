@@ -0,0 +1,179 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_span_id", "name", "start_ns", "end_ns", "attributes",
+                 "status", "thread")
+
+    def __init__(self, name: str, parent, attributes: dict):
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent else None
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.status = "OK"
+        self.thread = threading.current_thread().name
+
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+
+    def to_dict(self) -> dict:
+        # Field names of the OpenTelemetry (OTLP/JSON) span model, so the file can be converted or
+        # loaded by OTel tooling.
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": self.status,
+            "thread": self.thread,
+        }
+
+
+class _NoopSpan:
+    """Returned when tracing is disabled, so the instrumented code doesn't need to check."""
+
+    def set_attribute(self, key, value):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _TraceFile:
+    """A trace file, shared by every span of one traced block (e.g. one build)."""
+
+    def __init__(self, file_path: str):
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        self._file = open(file_path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+
+    def write(self, line: str):
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# The trace file of the block being traced, per context like the current span: two builds traced
+# at the same time write to their own files, and requests running meanwhile aren't traced.
+_current_trace_file = contextvars.ContextVar("current_trace_file", default=None)
+
+
+class Tracer:
+    """
+    Opt-in tracing of the tree build. Disabled by default (spans cost nothing but a check).
+    When enabled, every finished span is appended as one JSON line to the trace file, which
+    tools/trace_summary/summarize_trace.py turns into a flame/timeline summary.
+
+    The current span and the trace file are kept in contextvars (trace_to_file), or the trace file
+    is global to the process (start/stop). Thread pools don't propagate contextvars, so the tasks
+    submitted from a traced code path must be wrapped with tracer.wrap(func).
+    """
+
+    def __init__(self):
+        self._global_file = None
+        self._lock = threading.Lock()
+
+
+    def _trace_file(self) -> _TraceFile | None:
+        return _current_trace_file.get() or self._global_file
+
+
+    @property
+    def enabled(self) -> bool:
+        return self._trace_file() is not None
+
+
+    def start(self, file_path: str):
+        """Traces everything the process does (every context) until stop()."""
+        with self._lock:
+            if self._global_file is None:
+                self._global_file = _TraceFile(file_path)
+
+
+    def stop(self):
+        with self._lock:
+            if self._global_file is not None:
+                self._global_file.close()
+                self._global_file = None
+
+
+    @contextmanager
+    def trace_to_file(self, file_path: str | None):
+        """
+        Traces the block, and the tasks it wraps (see wrap), to file_path. Nothing happens when
+        file_path is None or the block is already traced.
+        """
+        if not file_path or _current_trace_file.get() is not None:
+            yield
+            return
+        trace_file = _TraceFile(file_path)
+        token = _current_trace_file.set(trace_file)
+        try:
+            yield
+        finally:
+            _current_trace_file.reset(token)
+            trace_file.close()
+
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        trace_file = self._trace_file()
+        if trace_file is None:
+            yield _NOOP_SPAN
+            return
+
+        span = Span(name, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.status = "ERROR"
+            span.attributes["error"] = str(exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            trace_file.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str))
+
+
+    def wrap(self, func):
+        """Runs func (e.g. in a worker thread) as a child of the current span, in the same trace file."""
+        trace_file = _current_trace_file.get()
+        if trace_file is None and self._global_file is None:
+            return func
+        parent = _current_span.get()
+
+        def run_with_parent(*args, **kwargs):
+            file_token = _current_trace_file.set(trace_file)
+            token = _current_span.set(parent)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _current_span.reset(token)
+                _current_trace_file.reset(file_token)
+
+        return run_with_parent
@@ -0,0 +1,195 @@
+from datetime import datetime, timezone
+from threading import Lock
+import gzip
+import json
+import logging
+import os
+import time
+
+
+class TreeHistoryStore:
+    """
+    History of the category index of every site, one version per build, without keeping a full
+    copy of each: a base (the whole index) and then one delta per build, keyed by category id:
+
+        {"added": {category_id: entry}, "removed": [category_id], "changed": {category_id: {field: value}},
+         "removed_fields": {category_id: [field]}}
+
+    Only the fields that changed are stored, so a build where only the item counts moved takes a
+    few bytes per category (and compresses well). Fields gone from an entry are listed apart, a
+    field set to None stays None when rebuilt. Files are gzip JSON, under
+    history_dir/{site_id}/, listed in order in manifest.json.
+
+    read_at(site_id, when) rebuilds the index as it was at any time: the last base before it, plus
+    its deltas. After compact_every deltas the next build writes a new base instead (compaction),
+    so a rebuild never applies more than compact_every deltas. Then compact() also drops the
+    chains older than keep_days (None keeps everything).
+    """
+
+    def __init__(self, history_dir: str = os.path.join("app", "tree", "history"), compact_every: int = 30,
+                 keep_days: float | None = None):
+        self.history_dir = history_dir
+        self.compact_every = compact_every
+        self.keep_days = keep_days
+        self._lock = Lock()
+        self.logger = logging.getLogger(__name__)
+
+
+    def _site_dir(self, site_id: str) -> str:
+        return os.path.join(self.history_dir, site_id)
+
+
+    def _manifest(self, site_id: str) -> list[dict]:
+        path = os.path.join(self._site_dir(site_id), "manifest.json")
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+
+    def _write_json(self, path: str, data, compress: bool):
+        tmp_path = f"{path}.tmp"
+        opener = gzip.open if compress else open
+        with opener(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+
+    def _read_version(self, site_id: str, version: dict):
+        with gzip.open(os.path.join(self._site_dir(site_id), version["file"]), "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+
+    @staticmethod
+    def diff(previous: dict[str, dict], current: dict[str, dict]) -> dict:
+        changed = {}
+        removed_fields = {}
+        for category_id, entry in current.items():
+            old = previous.get(category_id)
+            if old is not None and old != entry:
+                fields = {field: value for field, value in entry.items() if field not in old or old[field] != value}
+                if fields:
+                    changed[category_id] = fields
+                gone = [field for field in old if field not in entry]
+                if gone:
+                    removed_fields[category_id] = gone
+        return {
+            "added": {category_id: entry for category_id, entry in current.items() if category_id not in previous},
+            "removed": [category_id for category_id in previous if category_id not in current],
+            "changed": changed,
+            "removed_fields": removed_fields,
+        }
+
+
+    @staticmethod
+    def apply(index: dict[str, dict], delta: dict) -> dict[str, dict]:
+        """Applies a delta to index (in place) and returns it."""
+        for category_id in delta["removed"]:
+            index.pop(category_id, None)
+        for category_id, fields in delta["changed"].items():
+            index[category_id] = {**index[category_id], **fields}
+        for category_id, gone in delta.get("removed_fields", {}).items():
+            index[category_id] = {field: value for field, value in index[category_id].items() if field not in gone}
+        index.update(delta["added"])
+        return index
+
+
+    def record(self, site_id: str, category_index: dict[str, dict], when: datetime | None = None) -> dict:
+        """Adds the index of a build to the history of site_id. Returns the manifest entry."""
+        when = when or datetime.now(timezone.utc)
+        start = time.perf_counter()
+        with self._lock:
+            os.makedirs(self._site_dir(site_id), exist_ok=True)
+            manifest = self._manifest(site_id)
+            deltas_since_base = next((i for i, version in enumerate(reversed(manifest)) if version["kind"] == "base"),
+                                     None)
+
+            stamp = when.strftime("%Y%m%dT%H%M%S%fZ")
+            if deltas_since_base is None or deltas_since_base >= self.compact_every:
+                version = {"kind": "base", "file": f"base_{stamp}.json.gz", "categories": len(category_index)}
+                data = category_index
+            else:
+                # Rebuilt from disk, at most compact_every deltas, instead of keeping a whole index
+                # per site in memory between builds
+                previous = self._rebuild(site_id, manifest)
+                data = self.diff(previous, category_index)
+                version = {"kind": "delta", "file": f"delta_{stamp}.json.gz", "categories": len(category_index),
+                           "added": len(data["added"]), "removed": len(data["removed"]),
+                           "changed": len(data["changed"])}
+            version["at"] = when.isoformat()
+
+            self._write_json(os.path.join(self._site_dir(site_id), version["file"]), data, compress=True)
+            version["bytes"] = os.path.getsize(os.path.join(self._site_dir(site_id), version["file"]))
+            manifest.append(version)
+            self._write_json(os.path.join(self._site_dir(site_id), "manifest.json"), manifest, compress=False)
+            compact = version["kind"] == "base" and len(manifest) > 1
+
+        if compact:
+            self.compact(site_id)
+
+        self.logger.info(f"History of {site_id}: {version['kind']} {version['file']} ({version['bytes']} bytes)"
+                         f" written in {(time.perf_counter() - start):.4f} seconds.")
+        return version
+
+
+    def _rebuild(self, site_id: str, versions: list[dict]) -> dict[str, dict]:
+        """The index after the last version of versions (from its last base on)."""
+        base_position = max(i for i, version in enumerate(versions) if version["kind"] == "base")
+        index = self._read_version(site_id, versions[base_position])
+        for version in versions[base_position + 1:]:
+            self.apply(index, self._read_version(site_id, version))
+        return index
+
+
+    def read_at(self, site_id: str, when: datetime | None = None) -> dict[str, dict] | None:
+        """The index of site_id as it was at when (the latest one when None). None if there's no history then."""
+        manifest = self._manifest(site_id)
+        if when is not None:
+            when = when if when.tzinfo else when.replace(tzinfo=timezone.utc)
+            manifest = [version for version in manifest if datetime.fromisoformat(version["at"]) <= when]
+        if not any(version["kind"] == "base" for version in manifest):
+            return None
+        return self._rebuild(site_id, manifest)
+
+
+    def versions(self, site_id: str) -> list[dict]:
+        return self._manifest(site_id)
+
+
+    def compact(self, site_id: str) -> int:
+        """
+        Drops the chains (a base and its deltas) entirely older than keep_days, the current chain
+        is always kept. Returns the amount of files removed.
+        """
+        if self.keep_days is None:
+            return 0
+        with self._lock:
+            manifest = self._manifest(site_id)
+            cutoff = datetime.now(timezone.utc).timestamp() - self.keep_days * 86400
+            bases = [i for i, version in enumerate(manifest) if version["kind"] == "base"]
+            # The first base still needed: the last one whose chain reaches the cutoff
+            keep_from = 0
+            for base in bases[1:]:
+                if datetime.fromisoformat(manifest[base]["at"]).timestamp() <= cutoff:
+                    keep_from = base
+            removed = manifest[:keep_from]
+            for version in removed:
+                os.remove(os.path.join(self._site_dir(site_id), version["file"]))
+            self._write_json(os.path.join(self._site_dir(site_id), "manifest.json"), manifest[keep_from:], compress=False)
+        if removed:
+            self.logger.info(f"History of {site_id} compacted: {len(removed)} old versions removed.")
+        return len(removed)
+
+
+def build_tree_from_index(category_index: dict[str, dict]) -> dict[str, dict]:
+    """The nested tree (top-level id -> node with its children) of an index, e.g. one from read_at."""
+    nodes = {category_id: {**entry, "children": {}} for category_id, entry in category_index.items()}
+    tree = {}
+    for category_id, node in nodes.items():
+        path_from_root = node.get("path_from_root") or []
+        parent_id = path_from_root[-2]["id"] if len(path_from_root) > 1 else None
+        if parent_id is None:
+            tree[category_id] = node
+        elif parent_id in nodes:
+            nodes[parent_id]["children"][category_id] = node
+    return tree
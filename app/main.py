@@ -1,14 +1,24 @@
 from fastapi import FastAPI, Depends
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import os
 import logging
 from datetime import datetime
 
 from app.core.category_service import CategoryService
 from app.infrastructure.auth_api import AuthServiceClient
-from app.routes import category_routes
+from app.routes import category_routes, category_query_routes, crawler_routes, profiling_routes
 from app.dependencies.singleton_auth_service_client import get_auth_service_client # Singleton imported
-from app.infrastructure.db_initializer import initialize_database
+from app.core.warmup_service import WarmupService
+from app.dependencies.singleton_blocking_executor import get_blocking_executors
+from app.dependencies.singleton_readiness import get_readiness
+from app.dependencies.singleton_meli_transport import get_meli_transport
+from app.dependencies.singleton_access_tracker import get_access_tracker
+from app.dependencies.singleton_refresh_scheduler import get_refresh_scheduler
+from app.dependencies.singleton_admission_controller import get_admission_controller
+from app.infrastructure.admission_control import AdmissionControlMiddleware
+from app.infrastructure.fast_json_response import FastJSONResponse
 
 # 1. Create "logs" folder in a portable way
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -28,33 +38,79 @@ logging.basicConfig(
     ]
 )
 
-category_service = CategoryService(get_auth_service_client())   # Singleton injected to the constructor
+# The CategoryService of the startup is only built when the warmup needs it
+warmup_service = WarmupService(
+    get_readiness(), lambda: CategoryService(get_auth_service_client()))   # Singleton injected to the constructor
+
+# Fast-start mode: the warmup (database, access token, snapshots) runs in the background and the
+# service answers right away, /health/ready reports when it's done. Meant for autoscaling, where
+# start-to-ready time matters. Off by default: the warmup runs before serving, as below.
+FAST_START = os.getenv("MELI_FAST_START", "false").lower() in ("1", "true", "yes")
+
+# Profiling endpoints (/api/v1/crawler/profiling, see profiler.py), off by default: they expose
+# the internals of the process and a CPU sampling holds a thread for its duration.
+PROFILING = os.getenv("MELI_PROFILING", "false").lower() in ("1", "true", "yes")
+
+# Periodic refresh of the trees (see RefreshScheduler), each site at its own cadence. Every worker
+# runs the scheduler, but only the one holding the refresh_scheduler lease refreshes.
+REFRESH_SCHEDULER = os.getenv("MELI_REFRESH_SCHEDULER", "false").lower() in ("1", "true", "yes")
+
+# Admission control tells clients apart by their address. Behind a proxy, the header the proxy
+# sets with the real client address (e.g. X-Forwarded-For). Only set it when the proxy is trusted.
+CLIENT_HEADER = os.getenv("MELI_CLIENT_HEADER")
 
 
 # This code will try to get the access_token from meli_auth_service microservice before everything
-# and if it fails, the app will fail fast.
+# and if it fails, the app will fail fast (in fast-start mode it's retried instead, and the
+# service stays not ready if it never succeeds).
+# With several workers (uvicorn --workers N) each one runs this, but only the one holding the
+# token_refresh lease fetches a new token, the others wait for it (see refresh_access_token).
 # NOTE: Code before yield executes before and code after yield is executed after
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    try:
-        initialize_database()
-        print("[INFO] Database initialized successfully.")
-    except Exception as e:
-        print("[ERROR] Database couldn't be initialize at startup. Please check and correct.")
-
-    try:
-        category_service.get_access_token()
-        print("[INFO] Access token fetched successfully at startup.")
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch access token at startup: {e}")
-        import sys
-        sys.exit(1)
+    if FAST_START:
+        app.state.warmup_task = asyncio.create_task(asyncio.to_thread(warmup_service.run))
+        print("[INFO] Fast start: warmup running in the background.")
+    else:
+        if warmup_service.initialize_database():
+            print("[INFO] Database initialized successfully.")
+        else:
+            print("[ERROR] Database couldn't be initialize at startup. Please check and correct.")
+
+        if warmup_service.fetch_access_token():
+            print("[INFO] Access token fetched successfully at startup.")
+        else:
+            error = get_readiness().snapshot()["checks"]["access_token"]["detail"]
+            print(f"[ERROR] Failed to fetch access token at startup: {error}")
+            import sys
+            sys.exit(1)
+        warmup_service.load_snapshots()
+        warmup_service.prefetch_hot_categories()     # In the background, doesn't hold the startup
+    if REFRESH_SCHEDULER:
+        get_refresh_scheduler().start()
     yield
-    # Optional: add shutdown code here if needed
+    get_refresh_scheduler().stop()
+    get_access_tracker().save()     # The hot set, for the next start (see PrefetchService)
+    for executor in get_blocking_executors().values():
+        executor.shutdown()
+    if hasattr(get_meli_transport(), "close"):
+        get_meli_transport().close()    # Recording mode, finishes the archive
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+# Per-client rate limits and in-flight caps per priority class (crawl/interactive/maintenance),
+# 429 beyond them
+app.add_middleware(AdmissionControlMiddleware, controller=get_admission_controller(), client_header=CLIENT_HEADER)
+app.include_router(crawler_routes.router)
+if PROFILING:
+    app.include_router(profiling_routes.router)
+app.include_router(category_query_routes.router)
 app.include_router(category_routes.router)
 
-@app.get("/health")
+@app.get("/health") # Liveness: the process is up and serving, even while warming up
 def health():
-    return {"status": "meli_category_service is running."}
\ No newline at end of file
+    return {"status": "meli_category_service is running.", "ready": get_readiness().is_ready()}
+
+@app.get("/health/ready") # Readiness: 503 until every warmup check passed
+def health_ready():
+    readiness = get_readiness().snapshot()
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Query
+
+from app.core.category_query_service import CategoryQueryService
+from app.dependencies.singleton_blocking_executor import get_blocking_executor
+
+# Queries over the persisted trees (meli_categories). Blocking DB calls go through the executor.
+router = APIRouter(prefix="/api/v1/categories")
+
+@router.get("/depth/{depth}") # Categories of a site at a certain depth (0 = top-level)
+async def get_categories_at_depth(depth: int, site_id: str, limit: int = Query(100, ge=1, le=1000),
+                                  cursor: str | None = None):
+    return await get_blocking_executor().run(
+        lambda: CategoryQueryService().get_categories_at_depth(site_id, depth, limit, cursor))
+
+@router.get("/{category_id}/ancestors") # From the top-level category down to the parent
+async def get_ancestors(category_id: str):
+    return await get_blocking_executor().run(lambda: CategoryQueryService().get_ancestors(category_id))
+
+@router.get("/{category_id}/descendants") # Paginated, ordered by depth (keyset cursor)
+async def get_descendants(category_id: str, limit: int = Query(100, ge=1, le=1000),
+                          cursor: str | None = None, max_depth: int | None = Query(None, ge=1)):
+    return await get_blocking_executor().run(
+        lambda: CategoryQueryService().get_descendants(category_id, limit, cursor, max_depth))
+
+@router.get("/{category_id}/siblings")
+async def get_siblings(category_id: str):
+    return await get_blocking_executor().run(lambda: CategoryQueryService().get_siblings(category_id))
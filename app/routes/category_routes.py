@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Response
 
 from app.core.category_service import CategoryService
 from app.dependencies.singleton_auth_service_client import get_auth_service_client, AuthServiceClient
+from app.dependencies.singleton_blocking_executor import get_blocking_executor
+from app.infrastructure.fast_json_response import FastJSONResponse
+from app.routes.response_models import Site, CategoryNode, CategoryInfo
 
 router = APIRouter(prefix="/api/v1") # This appends /api/v1 at the beginning of every endpoint
 
-@router.get("/sites") # Returns all the sites available (countries where MeLi is operating or related to)
-def get_sites(auth_client: AuthServiceClient = Depends(get_auth_service_client)):        # Injecting the singleton for AuthServiceClient
-    category_service = CategoryService(auth_client)
-    return category_service.get_sites()
+# NOTE: CategoryService uses requests and SQLAlchemy sessions (blocking). Routes are async, so
+# every call to it goes through a bounded executor, never directly on the event loop.
+# Category payloads are returned as FastJSONResponse (no jsonable_encoder pass, see response_models.py).
+
+@router.get("/sites", response_model=list[Site]) # Returns all the sites available (countries where MeLi is operating or related to)
+async def get_sites(auth_client: AuthServiceClient = Depends(get_auth_service_client)):        # Injecting the singleton for AuthServiceClient
+    return await get_blocking_executor().run(lambda: CategoryService(auth_client).get_sites())
 
 @router.get("/{site_id}/categories")
 async def build_category_tree(site_id: str):
@@ -16,11 +22,20 @@ async def build_category_tree(site_id: str):
     This endpoint builds (persist in the database) and returns the category tree with
     links to each category and other required data for each of the categories.
     """
-    category_service = CategoryService()
-    #return category_service.build_category_tree(site_id)
-    return category_service.stub_method() # Delete after testing
+    #return await get_blocking_executor("crawl").run(lambda: CategoryService().build_category_tree(site_id))
+    return await get_blocking_executor("crawl").run(lambda: CategoryService().stub_method()) # Delete after testing
+
+@router.get("/categories/{category_id}/subtree", response_model=CategoryNode)
+async def get_category_subtree(category_id: str, depth: int = Query(1, ge=0, le=10)):
+    """
+    Returns only the branch of category_id, down to depth levels below it, fetched on demand
+    (and cached) instead of crawling the whole site.
+    """
+    return FastJSONResponse(await get_blocking_executor().run(
+        lambda: CategoryService().get_category_subtree(category_id, depth)))
 
-@router.get("/{category_id}")
+@router.get("/{category_id}", response_model=CategoryInfo)
 async def get_category_info(category_id: str):
-    category_service = CategoryService()
-    return category_service.get_category_info(category_id)
\ No newline at end of file
+    # Already encoded (and usually cached, see PrefetchService)
+    body = await get_blocking_executor().run(lambda: CategoryService().get_category_info_encoded(category_id))
+    return Response(content=body, media_type="application/json")
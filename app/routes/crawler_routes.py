@@ -0,0 +1,57 @@
+from datetime import datetime
+from fastapi import APIRouter, HTTPException
+
+from app.dependencies.singleton_concurrency_limiter import get_concurrency_limiters
+from app.dependencies.singleton_resilience import get_circuit_breakers, get_retry_budget
+from app.core.leader_election_service import LeaderElectionService
+from app.dependencies.singleton_category_index_registry import get_category_index_registry
+from app.dependencies.singleton_admission_controller import get_admission_controller
+from app.dependencies.singleton_access_tracker import get_access_tracker, get_category_response_cache
+from app.dependencies.singleton_refresh_scheduler import get_refresh_scheduler
+from app.dependencies.singleton_tree_history import get_tree_history
+from app.infrastructure.tree_history import build_tree_from_index
+from app.infrastructure.fast_json_response import FastJSONResponse
+
+router = APIRouter(prefix="/api/v1/crawler") # Crawler internals, for monitoring
+
+@router.get("/concurrency") # Current adaptive concurrency limits and their history
+def get_concurrency():
+    return {name: limiter.snapshot() for name, limiter in get_concurrency_limiters().items()}
+
+@router.get("/resilience") # Circuit breakers state and retry budget usage
+def get_resilience():
+    return {
+        "circuit_breakers": {name: breaker.snapshot() for name, breaker in get_circuit_breakers().items()},
+        "retry_budget": get_retry_budget().snapshot(),
+    }
+
+@router.get("/leases") # Leases held by the workers (token refresh, tree builds in progress)
+def get_leases():
+    return LeaderElectionService().get_leases()
+
+@router.get("/memory") # Trees kept in memory: size per site, plain vs interned, and the string pool
+def get_memory():
+    return get_category_index_registry().memory_report()
+
+@router.get("/admission") # Requests in flight and rejected per priority class (crawl/interactive)
+def get_admission():
+    return get_admission_controller().snapshot()
+
+@router.get("/hot") # Hottest categories and sites (decaying counts) and the cache of prefetched responses
+def get_hot():
+    return {**get_access_tracker().snapshot(), "response_cache": get_category_response_cache().stats()}
+
+@router.get("/schedule") # Periodic tree refreshes: upcoming runs per site (cadence, churn) and past runs
+def get_schedule():
+    return get_refresh_scheduler().snapshot()
+
+@router.get("/history/{site_id}") # Versions of the tree of a site kept in the history (bases and deltas)
+def get_history(site_id: str):
+    return get_tree_history().versions(site_id)
+
+@router.get("/history/{site_id}/tree") # The tree of a site as it was at a point in time (latest when not given)
+def get_tree_at(site_id: str, at: datetime | None = None):
+    category_index = get_tree_history().read_at(site_id, at)
+    if category_index is None:
+        raise HTTPException(status_code=404, detail=f"No history of {site_id} at {at}.")
+    return FastJSONResponse(build_tree_from_index(category_index))
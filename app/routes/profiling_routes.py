@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Query
+
+from app.dependencies.singleton_profiler import get_profiler
+from app.dependencies.singleton_blocking_executor import get_blocking_executor
+
+# Profiling of the live process (see profiler.py), e.g. while a big site is being built. Only
+# mounted with MELI_PROFILING=true. Every capture is written to app/logs/profiles for offline
+# comparison (tools/profiling/compare_profiles.py).
+router = APIRouter(prefix="/api/v1/crawler/profiling")
+
+@router.post("/tracemalloc/start") # Needed for the top allocators, slows allocations down while on
+def start_tracemalloc(frames: int = Query(10, ge=1, le=50)):
+    return {"started": get_profiler().start_tracemalloc(frames)}
+
+@router.post("/tracemalloc/stop")
+def stop_tracemalloc():
+    get_profiler().stop_tracemalloc()
+    return {"stopped": True}
+
+@router.post("/snapshot") # Top allocators (when tracing) and object counts per type
+async def capture_snapshot(label: str = Query("snapshot", pattern=r"^[\w-]+$")):
+    return await get_blocking_executor().run(lambda: get_profiler().capture(label))
+
+@router.post("/cpu") # Sampled stacks of every thread during seconds, folded
+async def sample_cpu(seconds: float = Query(10, gt=0, le=25), interval_ms: float = Query(10, ge=1, le=1000)):
+    return await get_blocking_executor().run(lambda: get_profiler().sample_cpu(seconds, interval_ms / 1000))
+
+@router.get("/files")
+def list_files():
+    return get_profiler().list_files()
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict, RootModel
+
+
+# Typed shapes of what the routes return, for the docs (/docs) and the clients. The small
+# payloads (sites) are validated against them. The big ones (category trees) are not: they're
+# built by the service in exactly this shape, so the routes send them straight through
+# FastJSONResponse (see fast_json_response.py) and the model only documents them.
+
+class Site(BaseModel):
+    id: str
+    name: str
+    default_currency_id: str | None = None
+    updated_at: datetime | None = None
+
+
+class PathItem(BaseModel):
+    id: str
+    name: str | None = None
+
+
+class CategoryNode(BaseModel):
+    """A category of the tree (see build_category_node), with its children already fetched."""
+    id: str
+    name: str | None = None
+    site_id: str
+    permalink: str | None = None
+    url: str | None = None
+    total_items_in_this_category: int | None = None
+    fragile: bool | None = False
+    path_from_root: list[PathItem] | None = None
+    children: dict[str, "CategoryNode"] = {}
+    children_ids: list[str] = []
+
+
+class CategoryTree(RootModel[dict[str, CategoryNode]]):
+    """The tree of a site: top-level category id -> its node."""
+
+
+class CategoryInfo(BaseModel):
+    """A category as-is from MeLi, only the main fields are listed (the rest are kept too)."""
+    model_config = ConfigDict(extra="allow")
+
+    id: str
+    name: str | None = None
+    permalink: str | None = None
+    total_items_in_this_category: int | None = None
+    path_from_root: list[PathItem] = []
+    children_categories: list[dict] = []
+    settings: dict = {}
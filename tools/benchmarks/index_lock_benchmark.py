@@ -0,0 +1,90 @@
+# Benchmark: lock wait of the category index, before and after removing the index lock.
+#
+# Usage: python index_lock_benchmark.py [categories] [threads] [latency_ms]
+#        python index_lock_benchmark.py 20000 64 2
+#
+# Simulates the crawl with fake MeLi responses (no network, the latency is a sleep, which
+# releases the GIL like a real request does):
+# 1- locked: every worker takes a shared lock and copies its node into the index (how
+#    get_category_info_thread_safe used to work). Total and max lock wait are measured.
+# 2- single consumer: workers only return their node and the thread consuming the results adds
+#    it to the index (how crawl_categories works now). There's no lock to wait for.
+#
+# No dependencies needed (run it from the repository root).
+
+
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, ".")
+from app.core.category_tree_pipeline import build_category_node, flatten_category
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+LOGGER = logging.getLogger(__name__)
+
+
+def fake_category_info(category_id):
+    return {
+        "name": f"Category {category_id}",
+        "permalink": None,
+        "total_items_in_this_category": 1000,
+        "settings": {"fragile": False},
+        "path_from_root": [{"id": "MLU1", "name": "Root"}, {"id": category_id, "name": "Category"}],
+        "children_categories": [{"id": f"{category_id}-{i}"} for i in range(5)],
+    }
+
+
+def run_locked(category_ids, threads, latency):
+    index, lock = {}, threading.Lock()
+    waits = []
+
+    def worker(category_id):
+        time.sleep(latency)
+        data = build_category_node(category_id, fake_category_info(category_id))
+        wait_start = time.perf_counter()
+        with lock:
+            waits.append(time.perf_counter() - wait_start)
+            index[category_id] = flatten_category(data)
+        return data
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for fut in as_completed([executor.submit(worker, cid) for cid in category_ids]):
+            fut.result()
+    return time.perf_counter() - start, waits
+
+
+def run_single_consumer(category_ids, threads, latency):
+    index = {}
+
+    def worker(category_id):
+        time.sleep(latency)
+        return build_category_node(category_id, fake_category_info(category_id))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures_map = {executor.submit(worker, cid): cid for cid in category_ids}
+        for fut in as_completed(futures_map):
+            index[futures_map[fut]] = flatten_category(fut.result())
+    return time.perf_counter() - start, []
+
+
+def report(name, elapsed, waits):
+    total_wait = sum(waits) * 1000
+    max_wait = max(waits) * 1000 if waits else 0.0
+    LOGGER.info(f"{name:<16} wall {elapsed:8.3f} s   lock wait total {total_wait:10.2f} ms   max {max_wait:8.3f} ms")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    categories = int(args[0]) if len(args) > 0 else 20000
+    threads = int(args[1]) if len(args) > 1 else 64
+    latency = (float(args[2]) if len(args) > 2 else 2) / 1000
+
+    category_ids = [f"MLU{i}" for i in range(categories)]
+    LOGGER.info(f"{categories} categories, {threads} threads, {latency * 1000:.1f} ms latency")
+    report("locked", *run_locked(category_ids, threads, latency))
+    report("single consumer", *run_single_consumer(category_ids, threads, latency))
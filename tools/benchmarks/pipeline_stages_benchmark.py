@@ -0,0 +1,153 @@
+# Benchmark: every CPU stage of the pipeline mode (see app/core/category_tree_pipeline.py), run in
+# a process pool vs in-process, to know which ones are worth sending to other processes (only the
+# serialization is, the pipeline runs the others in-process).
+#
+# Usage: python pipeline_stages_benchmark.py [categories] [fan_out] [threads] [workers]
+#        python pipeline_stages_benchmark.py 30000 8 16 4
+#
+# Builds fake MeLi payloads and a fake tree shaped like the real ones, and times, for each stage:
+# 1- parse: raw /categories/{id} bodies to nodes, called from threads like the crawler does.
+# 2- anchors: anchor extraction from listing pages, called from threads too.
+# 3- aggregate: the flat index from the tree, one task per top-level category.
+# 4- serialize: the tree and the index as indented JSON, one task per top-level category.
+#
+# In-process means the same functions called directly. Pool means submitted to a process pool
+# (CategoryTreePipeline.serialize for the serialization), paying for pickling the arguments and
+# the results between processes.
+# Prints the median time of each and the speedup of the pool (below 1x the pool loses).
+# Run it from the repository root.
+
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import json
+import logging
+import statistics
+import sys
+import time
+
+sys.path.insert(0, ".")
+from app.core.category_tree_pipeline import (CategoryTreePipeline, build_category_node, flatten_subtree,
+                                             join_index_fragments, join_tree_fragments, parse_category_payload,
+                                             serialize_shard)
+from app.core.url_resolution_service import extract_category_anchors
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+LOGGER = logging.getLogger(__name__)
+
+
+def fake_category_info(category_id, parent_path, fan_out):
+    return {
+        "id": category_id,
+        "name": f"Categoría {category_id}",
+        "permalink": f"https://listado.mercadolibre.com.ar/categoria-{category_id.lower()}",
+        "total_items_in_this_category": len(category_id) * 1000,
+        "settings": {"fragile": False, "buying_allowed": True, "currencies": ["ARS"], "max_pictures_per_item": 12},
+        "path_from_root": [*parent_path, {"id": category_id, "name": f"Categoría {category_id}"}],
+        "children_categories": [{"id": f"{category_id}{i}", "name": f"Categoría {category_id}{i}",
+                                 "total_items_in_this_category": 1000} for i in range(fan_out)],
+    }
+
+
+def fake_payloads_and_tree(categories, fan_out, site_id="MLA"):
+    """Raw bodies of every category, and the tree built from them (breadth-first, fan_out children per node)."""
+    payloads = {}
+    tree = {}
+    pending = [(f"{site_id}{1000 + i}", [], tree) for i in range(fan_out)]
+    while pending and len(payloads) < categories:
+        next_pending = []
+        for category_id, parent_path, container in pending:
+            if len(payloads) >= categories:
+                break
+            info = fake_category_info(category_id, parent_path, fan_out)
+            payloads[category_id] = json.dumps(info, ensure_ascii=False)
+            node = build_category_node(category_id, info)
+            container[category_id] = node
+            next_pending.extend((child_id, info["path_from_root"], node["children"]) for child_id in node["children_ids"])
+        pending = next_pending
+    return payloads, tree
+
+
+def fake_listing_page(category_id, anchors=400):
+    links = "".join(f'<li><a href="https://listado.mercadolibre.com.ar/cat-{i}/#CATEGORY_ID={category_id}{i}">'
+                    f'Categoría {i}</a><span class="count">({i * 37})</span></li>' for i in range(anchors))
+    return f"<html><head><title>{category_id}</title></head><body><div class='filler'>{'x' * 50_000}</div>" \
+           f"<ul>{links}</ul></body></html>"
+
+
+def measure(run, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def from_threads(function, items, threads):
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(lambda item: function(*item), items))
+
+
+def submitted(pool, function):
+    """function, but run in pool (waiting for the result)."""
+    return lambda *args: pool.submit(function, *args).result()
+
+
+def aggregate_in_pool(pool, tree):
+    index = {}
+    for index_shard in pool.map(flatten_subtree, tree.values()):
+        index.update(index_shard)
+    return index
+
+
+def serialize_in_process(tree, index):
+    """Same as CategoryTreePipeline.serialize, without the pool."""
+    fragments = [serialize_shard(category_id, subtree, flatten_subtree(subtree))
+                 for category_id, subtree in tree.items()]
+    return (join_tree_fragments([tree_fragment for tree_fragment, _ in fragments]),
+            join_index_fragments([index_fragment for _, index_fragment in fragments]))
+
+
+def main():
+    categories = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+    fan_out = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    runs = 3
+
+    payloads, tree = fake_payloads_and_tree(categories, fan_out)
+    pages = [(fake_listing_page(category_id),) for category_id in list(payloads)[:200]]
+    index = {}
+    for subtree in tree.values():
+        index.update(flatten_subtree(subtree))
+
+    with CategoryTreePipeline(workers) as pipeline, ProcessPoolExecutor(workers) as pool:
+        LOGGER.info(f"{len(payloads)} categories, fan-out {fan_out}, {threads} threads,"
+                    f" {pipeline.max_workers} processes, median of {runs} runs.\n")
+        # Starts the worker processes of both pools, not part of any measure
+        pipeline.serialize(tree, index)
+        aggregate_in_pool(pool, tree)
+
+        stages = [
+            ("parse", lambda: from_threads(parse_category_payload, payloads.items(), threads),
+             lambda: from_threads(submitted(pool, parse_category_payload), payloads.items(), threads)),
+            (f"anchors ({len(pages)} pages)", lambda: from_threads(extract_category_anchors, pages, threads),
+             lambda: from_threads(submitted(pool, extract_category_anchors), pages, threads)),
+            ("aggregate", lambda: [flatten_subtree(subtree) for subtree in tree.values()],
+             lambda: aggregate_in_pool(pool, tree)),
+            ("serialize", lambda: serialize_in_process(tree, index),
+             lambda: pipeline.serialize(tree, index)),
+        ]
+        for name, in_process, in_pool in stages:
+            local = measure(in_process, runs)
+            pooled = measure(in_pool, runs)
+            LOGGER.info(f"{name:22} in-process {local * 1000:9.1f} ms   pool {pooled * 1000:9.1f} ms"
+                        f"   ({local / pooled:.2f}x)")
+
+        if serialize_in_process(tree, index) != pipeline.serialize(tree, index):
+            LOGGER.error("The serialized tree and index are not the same!")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# Benchmark: crawl (and optionally URL resolution) of a site, replayed from a recording of the
+# MeLi responses, so it runs offline and gives the same result every time.
+#
+# Usage: python replay_crawl_benchmark.py record <archive> <site_id> <access_token> [--resolve-urls]
+#        python replay_crawl_benchmark.py replay <archive> <site_id> [--latency-scale 1.0] [--runs 3] [--resolve-urls]
+#
+#        python replay_crawl_benchmark.py record mlu.jsonl.gz MLU $ACCESS_TOKEN --resolve-urls
+#        python replay_crawl_benchmark.py replay mlu.jsonl.gz MLU --latency-scale 0.5 --runs 5
+#
+# 1- record: crawls the site against the real MeLi API through RecordingTransport (see
+#    app/infrastructure/meli_transport.py), every response with its latency, 429s included.
+# 2- replay: crawls it again from the archive through ReplayTransport, runs times. Latencies are
+#    the recorded ones times latency-scale (0 means no waiting, only the crawler's own work).
+#    Each run starts with fresh limiters, retry budget and circuit breakers, and an empty HTML
+#    cache, so runs don't influence each other.
+#
+# Prints the time of the crawl and of the URL resolution per run, requests served, 429s and the
+# final concurrency limits.
+#
+# The service can record too: MELI_TRANSPORT=record MELI_TRANSPORT_ARCHIVE=<archive> (see
+# app/dependencies/singleton_meli_transport.py). Run it from the repository root.
+
+
+import argparse
+import importlib
+import logging
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, ".")
+from app.infrastructure.meli_transport import RecordingTransport, ReplayTransport
+from app.infrastructure.html_page_cache import HtmlPageCache
+import app.dependencies.singleton_concurrency_limiter as singleton_concurrency_limiter
+import app.dependencies.singleton_resilience as singleton_resilience
+import app.dependencies.singleton_html_page_cache as singleton_html_page_cache
+
+logging.basicConfig(level=logging.WARNING, format="%(message)s")
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+
+def fresh_state(html_cache_dir):
+    """New limiters, retry budget, breakers and HTML cache, as in a service that just started."""
+    importlib.reload(singleton_concurrency_limiter)
+    importlib.reload(singleton_resilience)
+    singleton_html_page_cache.singleton_html_page_cache = HtmlPageCache(html_cache_dir)
+
+
+def crawl(transport, site_id, access_token, resolve_urls):
+    # Imported here, after the singletons they use were reset
+    from app.core.category_service import CategoryService
+    from app.infrastructure.meli_api import MeliCategoryClient
+
+    service = CategoryService()
+    service.meli_client = MeliCategoryClient(transport)
+    service.access_token = access_token
+    service.max_workers = service.meli_client.api_limiter.max_limit
+
+    start = time.perf_counter()
+    top_level_categories = service.meli_client.get_top_level_categories(access_token, site_id)
+    category_tree = service.crawl_categories(
+        [cat["id"] for cat in top_level_categories], service.get_category_info_thread_safe)
+    crawl_seconds = time.perf_counter() - start
+
+    resolve_seconds = None
+    if resolve_urls:
+        service.url_resolution_service.meli_client = service.meli_client
+        start = time.perf_counter()
+        service.url_resolution_service.resolve_url_for_categories(category_tree, service.category_index)
+        resolve_seconds = time.perf_counter() - start
+
+    return {
+        "categories": len(service.category_index),
+        "crawl_seconds": crawl_seconds,
+        "resolve_seconds": resolve_seconds,
+        "limits": {name: l.limit for name, l in singleton_concurrency_limiter.get_concurrency_limiters().items()},
+    }
+
+
+def record(args):
+    with tempfile.TemporaryDirectory() as html_cache_dir:
+        fresh_state(html_cache_dir)
+        transport = RecordingTransport(args.archive)
+        try:
+            result = crawl(transport, args.site_id, args.access_token, args.resolve_urls)
+        finally:
+            transport.close()
+    LOGGER.info(f"Recorded {transport.recorded} responses into {transport.part_path}: {result}")
+
+
+def replay(args):
+    transport = ReplayTransport(args.archive, args.latency_scale)
+    LOGGER.info(f"{len(transport)} responses in {args.archive}, latency scale {args.latency_scale}")
+
+    results = []
+    for run in range(args.runs):
+        transport.reset()
+        with tempfile.TemporaryDirectory() as html_cache_dir:
+            fresh_state(html_cache_dir)
+            result = crawl(transport, args.site_id, "replay", args.resolve_urls)
+        results.append(result)
+        LOGGER.info(f"Run {run + 1}: {result['categories']} categories, crawl {result['crawl_seconds']:.3f}s"
+                    + (f", resolution {result['resolve_seconds']:.3f}s" if result["resolve_seconds"] is not None else "")
+                    + f", served {transport.served} (missing {transport.misses}),"
+                    f" status codes {dict(transport.status_counts)}, limits {result['limits']}")
+
+    crawl_times = [r["crawl_seconds"] for r in results]
+    LOGGER.info(f"\nCrawl: median {statistics.median(crawl_times):.3f}s, min {min(crawl_times):.3f}s,"
+                f" max {max(crawl_times):.3f}s")
+    if args.resolve_urls:
+        resolve_times = [r["resolve_seconds"] for r in results]
+        LOGGER.info(f"Resolution: median {statistics.median(resolve_times):.3f}s, min {min(resolve_times):.3f}s,"
+                    f" max {max(resolve_times):.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record/replay benchmark of the category crawl.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    record_parser = subparsers.add_parser("record")
+    record_parser.add_argument("archive")
+    record_parser.add_argument("site_id")
+    record_parser.add_argument("access_token")
+    record_parser.add_argument("--resolve-urls", action="store_true")
+
+    replay_parser = subparsers.add_parser("replay")
+    replay_parser.add_argument("archive")
+    replay_parser.add_argument("site_id")
+    replay_parser.add_argument("--latency-scale", type=float, default=1.0)
+    replay_parser.add_argument("--runs", type=int, default=3)
+    replay_parser.add_argument("--resolve-urls", action="store_true")
+
+    args = parser.parse_args()
+    record(args) if args.mode == "record" else replay(args)
+
+
+if __name__ == "__main__":
+    main()
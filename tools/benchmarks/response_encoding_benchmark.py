@@ -0,0 +1,105 @@
+# Benchmark: encoding time of a whole site tree as a response body, before and after the response
+# model layer (see app/routes/response_models.py and app/infrastructure/fast_json_response.py).
+#
+# Usage: python response_encoding_benchmark.py [categories] [fan_out] [runs]
+#        python response_encoding_benchmark.py 30000 8 5
+#
+# Builds a fake tree shaped like the real ones (build_category_node nodes, nested children) and
+# encodes it:
+# 1- jsonable_encoder + JSONResponse: what FastAPI does with a dict returned by a route (before).
+# 2- CategoryTree model: validating the tree against the response model, then rendering it.
+# 3- FastJSONResponse: the fast path of the category routes (orjson when installed, json otherwise).
+#
+# Prints the median time of each, and checks the three bodies decode to the same tree.
+# Run it from the repository root.
+
+
+import json
+import logging
+import statistics
+import sys
+import time
+
+sys.path.insert(0, ".")
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.core.category_tree_pipeline import build_category_node
+from app.infrastructure import fast_json_response
+from app.infrastructure.fast_json_response import FastJSONResponse
+from app.routes.response_models import CategoryTree
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+LOGGER = logging.getLogger(__name__)
+
+
+def fake_tree(categories, fan_out, site_id="MLA"):
+    """Breadth-first tree of categories nodes, fan_out children per node."""
+    tree = {}
+    level = []
+    for i in range(fan_out):
+        category_id = f"{site_id}{1000 + i}"
+        node = build_category_node(category_id, fake_category_info(category_id, [], fan_out))
+        tree[category_id] = node
+        level.append(node)
+
+    created = fan_out
+    while created < categories:
+        next_level = []
+        for parent in level:
+            for i in range(fan_out):
+                if created >= categories:
+                    break
+                category_id = f"{parent['id']}{i}"
+                node = build_category_node(category_id, fake_category_info(category_id, parent["path_from_root"], fan_out))
+                parent["children"][category_id] = node
+                next_level.append(node)
+                created += 1
+        level = next_level
+    return tree
+
+
+def fake_category_info(category_id, parent_path, fan_out):
+    return {
+        "name": f"Categoría {category_id}",
+        "permalink": f"https://listado.mercadolibre.com.ar/categoria-{category_id.lower()}",
+        "total_items_in_this_category": len(category_id) * 1000,
+        "settings": {"fragile": False},
+        "path_from_root": [*parent_path, {"id": category_id, "name": f"Categoría {category_id}"}],
+        "children_categories": [{"id": f"{category_id}{i}"} for i in range(fan_out)],
+    }
+
+
+def measure(encode, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        body = encode()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), body
+
+
+def main():
+    categories = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+    fan_out = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    tree = fake_tree(categories, fan_out)
+    encoder = "orjson" if fast_json_response.orjson is not None else "json (orjson not installed)"
+    LOGGER.info(f"Tree of {categories} categories, fan-out {fan_out}, {runs} runs. FastJSONResponse uses {encoder}.\n")
+
+    before, before_body = measure(lambda: JSONResponse(jsonable_encoder(tree)).body, runs)
+    validated, validated_body = measure(
+        lambda: JSONResponse(CategoryTree.model_validate(tree).model_dump(mode="json")).body, runs)
+    fast, fast_body = measure(lambda: FastJSONResponse(tree).body, runs)
+
+    LOGGER.info(f"jsonable_encoder + JSONResponse:  {before * 1000:9.1f} ms  ({len(before_body) / 1e6:.1f} MB)")
+    LOGGER.info(f"CategoryTree model + JSONResponse:{validated * 1000:9.1f} ms  ({before / validated:.1f}x)")
+    LOGGER.info(f"FastJSONResponse:                 {fast * 1000:9.1f} ms  ({before / fast:.1f}x)")
+
+    if not json.loads(before_body) == json.loads(validated_body) == json.loads(fast_body):
+        LOGGER.error("The bodies are not the same tree!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
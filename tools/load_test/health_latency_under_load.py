@@ -0,0 +1,89 @@
+# Load test: checks that /health latency stays flat while category lookups are in flight.
+# The category lookups call MeLi (blocking I/O), if they ran on the event loop /health would
+# wait for them.
+#
+# Usage: python health_latency_under_load.py [base_url] [category_id] [concurrency] [seconds]
+#        python health_latency_under_load.py http://localhost:8001 MLU5725 50 20
+#
+# 1- Measures /health alone (baseline).
+# 2- Starts `concurrency` threads calling GET /api/v1/{category_id} in a loop.
+# 3- Measures /health again while the lookups are in flight, and prints both side by side.
+#
+# To run this script you only need requests (already in requirements.txt)
+
+
+import logging
+import statistics
+import sys
+import threading
+import time
+import requests
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+LOGGER = logging.getLogger(__name__)
+
+
+def measure_health(base_url, seconds):
+    """
+    Calls /health sequentially during `seconds` and returns the latencies in milliseconds.
+    """
+    latencies = []
+    session = requests.Session()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        session.get(f"{base_url}/health", timeout=30)
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.05)
+    return latencies
+
+
+def hammer_category(base_url, category_id, stop, counters):
+    session = requests.Session()
+    while not stop.is_set():
+        try:
+            response = session.get(f"{base_url}/api/v1/{category_id}", timeout=60)
+            counters[response.status_code] = counters.get(response.status_code, 0) + 1
+        except requests.exceptions.RequestException:
+            counters["error"] = counters.get("error", 0) + 1
+
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return (f"n={len(latencies):5d}  p50={statistics.median(latencies):8.2f} ms"
+            f"  p99={p99:8.2f} ms  max={latencies[-1]:8.2f} ms")
+
+
+def run(base_url, category_id, concurrency, seconds):
+    LOGGER.info(f"Baseline: /health alone for {seconds} seconds.")
+    baseline = measure_health(base_url, seconds)
+
+    stop = threading.Event()
+    counters = {}
+    workers = [
+        threading.Thread(target=hammer_category, args=(base_url, category_id, stop, counters), daemon=True)
+        for _ in range(concurrency)
+    ]
+    for worker in workers:
+        worker.start()
+
+    LOGGER.info(f"Under load: {concurrency} concurrent lookups of {category_id} for {seconds} seconds.")
+    under_load = measure_health(base_url, seconds)
+    stop.set()
+    for worker in workers:
+        worker.join(timeout=60)
+
+    LOGGER.info(f"/health baseline:   {summarize(baseline)}")
+    LOGGER.info(f"/health under load: {summarize(under_load)}")
+    LOGGER.info(f"Category lookups by status: {counters}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(
+        args[0] if len(args) > 0 else "http://localhost:8001",
+        args[1] if len(args) > 1 else "MLU5725",
+        int(args[2]) if len(args) > 2 else 50,
+        float(args[3]) if len(args) > 3 else 20,
+    )
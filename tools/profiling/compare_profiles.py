@@ -0,0 +1,71 @@
+# Compares two profile snapshots written by app/infrastructure/profiler.py (profiling endpoints,
+# or MELI_PROFILE_INTERVAL_SECONDS during the tree builds), e.g. the start and the end of a build
+# of a big site, to see where the memory went.
+#
+# Usage: python compare_profiles.py <before.json> <after.json> [--top 20]
+#        python compare_profiles.py app/logs/profiles/build_MLB_20260101_100000_000000.json \
+#                                   app/logs/profiles/build_MLB_end_20260101_101500_000000.json
+#
+# Prints:
+# 1- Object counts: the types that grew the most (category nodes, futures and responses included).
+# 2- Allocations: when both snapshots have a tracemalloc dump, the source lines whose allocated
+#    memory grew the most (tracemalloc's compare_to).
+#
+# No dependencies needed.
+
+
+import argparse
+import json
+import logging
+import tracemalloc
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+LOGGER = logging.getLogger(__name__)
+
+
+def compare_objects(before, after, top):
+    LOGGER.info(f"Objects: {before['total']} -> {after['total']} ({after['total'] - before['total']:+d}),"
+                f" category nodes {before['category_nodes']} -> {after['category_nodes']}")
+    for name, count in after["tracked"].items():
+        LOGGER.info(f"    {name:<24}{before['tracked'].get(name, 0):>12} -> {count}")
+
+    types = set(before["types"]) | set(after["types"])
+    growth = sorted(((after["types"].get(name, 0) - before["types"].get(name, 0), name) for name in types), reverse=True)
+    LOGGER.info(f"\nTypes that grew the most:")
+    for delta, name in growth[:top]:
+        LOGGER.info(f"    {name:<24}{delta:>+12}")
+
+
+def compare_allocations(before, after, top):
+    if not (before.get("tracemalloc") and after.get("tracemalloc")):
+        LOGGER.info("\nNo tracemalloc dump in both snapshots, allocations not compared.")
+        return
+    LOGGER.info(f"\nTraced memory: {before['tracemalloc']['current_bytes'] / 1e6:.1f} MB ->"
+                f" {after['tracemalloc']['current_bytes'] / 1e6:.1f} MB"
+                f" (peak {after['tracemalloc']['peak_bytes'] / 1e6:.1f} MB)")
+    snapshot_before = tracemalloc.Snapshot.load(before["tracemalloc"]["dump"])
+    snapshot_after = tracemalloc.Snapshot.load(after["tracemalloc"]["dump"])
+    LOGGER.info("Lines whose allocations grew the most:")
+    for stat in snapshot_after.compare_to(snapshot_before, "lineno")[:top]:
+        frame = stat.traceback[0]
+        LOGGER.info(f"    {stat.size_diff / 1e6:>+9.2f} MB {stat.count_diff:>+9d} blocks  {frame.filename}:{frame.lineno}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares two profile snapshots.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+    LOGGER.info(f"{before['label']} ({before['captured_at']}) -> {after['label']} ({after['captured_at']})\n")
+    compare_objects(before["objects"], after["objects"], args.top)
+    compare_allocations(before, after, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# Turns a trace of a tree build (JSON lines written by app/infrastructure/tracing.py) into a
+# flame/timeline summary.
+#
+# Usage: python summarize_trace.py trace.jsonl [--folded output.folded]
+#
+# Enable tracing by setting MELI_TRACE_DIR (e.g. app/traces) before starting the service, every
+# build writes trace_{site_id}_{timestamp}.jsonl there.
+#
+# Prints:
+# 1- Timeline: the crawl, each BFS level, URL resolution and dumps, with their offset from the
+#    start of the build.
+# 2- Flame summary: for every span name, count, total time, self time (time not spent in child
+#    spans) and p50/p99. e.g. throttle_sleep vs http vs json_parse vs limiter_wait.
+# 3- Queuing: time from the start of a BFS level until each category fetch actually started in
+#    a worker thread.
+#
+# --folded writes folded stacks ("build_category_tree;crawl;bfs_level;... self_microseconds"),
+# which can be opened with speedscope (https://www.speedscope.app) or flamegraph.pl.
+#
+# No dependencies needed.
+
+
+import json
+import logging
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+LOGGER = logging.getLogger(__name__)
+
+TIMELINE_SPANS = {"build_category_tree", "crawl", "bfs_level", "resolve_urls", "url_level",
+                  "dump_tree_json", "dump_index_json"}
+
+
+def load_spans(input_path):
+    spans = {}
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                span["duration_ms"] = (span["endTimeUnixNano"] - span["startTimeUnixNano"]) / 1e6
+                spans[span["spanId"]] = span
+    return spans
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def stack_of(span, spans):
+    names = []
+    while span is not None:
+        names.append(span["name"])
+        span = spans.get(span["parentSpanId"])
+    return ";".join(reversed(names))
+
+
+def summarize(spans, folded_path=None):
+    children_time = defaultdict(float)
+    for span in spans.values():
+        if span["parentSpanId"] in spans:
+            children_time[span["parentSpanId"]] += span["duration_ms"]
+
+    # 1- Timeline
+    for trace_id in sorted({span["traceId"] for span in spans.values()}):
+        trace = [span for span in spans.values() if span["traceId"] == trace_id]
+        trace_start = min(span["startTimeUnixNano"] for span in trace)
+        LOGGER.info(f"\nTimeline of trace {trace_id}")
+        LOGGER.info(f"{'offset (s)':>11} {'duration (s)':>13}  span")
+        for span in sorted(trace, key=lambda s: s["startTimeUnixNano"]):
+            if span["name"] not in TIMELINE_SPANS:
+                continue
+            attributes = {k: v for k, v in span["attributes"].items() if k in ("site_id", "level", "categories")}
+            LOGGER.info(f"{(span['startTimeUnixNano'] - trace_start) / 1e9:11.3f}"
+                        f" {span['duration_ms'] / 1000:13.3f}  {span['name']} {attributes or ''}")
+
+    # 2- Flame summary
+    by_name = defaultdict(list)
+    for span in spans.values():
+        by_name[span["name"]].append(span)
+
+    LOGGER.info(f"\n{'span':<24} {'count':>8} {'total (s)':>11} {'self (s)':>10} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    for name, named_spans in sorted(by_name.items(), key=lambda item: -sum(s["duration_ms"] for s in item[1])):
+        durations = [s["duration_ms"] for s in named_spans]
+        # Children running in parallel threads can add up to more than the parent
+        self_time = sum(max(0.0, s["duration_ms"] - children_time[s["spanId"]]) for s in named_spans)
+        LOGGER.info(f"{name:<24} {len(named_spans):8d} {sum(durations) / 1000:11.3f} {self_time / 1000:10.3f}"
+                    f" {percentile(durations, 0.5):10.2f} {percentile(durations, 0.99):10.2f}")
+
+    # 3- Queuing
+    queue_waits = [
+        (s["startTimeUnixNano"] - spans[s["parentSpanId"]]["startTimeUnixNano"]) / 1e6
+        for s in by_name.get("fetch_category", [])
+        if s["parentSpanId"] in spans and spans[s["parentSpanId"]]["name"] == "bfs_level"
+    ]
+    if queue_waits:
+        LOGGER.info(f"\nQueuing (BFS level start -> fetch start): p50 {percentile(queue_waits, 0.5):.2f} ms,"
+                    f" p99 {percentile(queue_waits, 0.99):.2f} ms")
+
+    if folded_path:
+        folded = defaultdict(float)
+        for span in spans.values():
+            folded[stack_of(span, spans)] += max(0.0, span["duration_ms"] - children_time[span["spanId"]])
+        with open(folded_path, "w", encoding="utf-8") as f:
+            for stack, self_ms in sorted(folded.items()):
+                f.write(f"{stack} {int(self_ms * 1000)}\n")
+        LOGGER.info(f"\nFolded stacks saved to: {folded_path}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 4) or (len(sys.argv) == 4 and sys.argv[2] != "--folded"):
+        print("Usage: python summarize_trace.py trace.jsonl [--folded output.folded]")
+        sys.exit(1)
+
+    summarize(load_spans(Path(sys.argv[1])), Path(sys.argv[3]) if len(sys.argv) == 4 else None)